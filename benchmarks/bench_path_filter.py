@@ -0,0 +1,81 @@
+"""Time the compiled skip-rule filter on a synthetic monorepo-sized tree.
+
+    python benchmarks/bench_path_filter.py [--entries 500000]
+
+Reports the entry filter used while a tree streams in (verdicts cached
+per directory and file name), one regex search per path, and the old
+per-entry PurePosixPath rules for comparison. All three must agree.
+"""
+
+import argparse
+import random
+import time
+from pathlib import PurePosixPath
+
+from repo_summarizer import config, context, pathfilter
+
+_TOP = ["packages", "services", "libs", "apps", "tools", "docs", "node_modules", "vendor", "build", "third_party"]
+_DIRS = ["src", "lib", "core", "utils", "api", "components", "internal", "tests", "fixtures", "assets", "dist"]
+_STEMS = ["index", "main", "utils", "types", "config", "handler", "model", "view", "service", "helpers", "app"]
+_EXTENSIONS = ["py", "ts", "tsx", "js", "go", "rs", "md", "json", "yaml", "png", "svg", "lock", "min.js", "map"]
+
+
+def synthetic_paths(n: int, seed: int = 0, files_per_dir: int = 12) -> list[str]:
+    """Monorepo-shaped paths: ``n`` files spread over roughly ``n / files_per_dir`` directories."""
+    rng = random.Random(seed)
+    directories = []
+    for _ in range(max(1, n // files_per_dir)):
+        parts = [rng.choice(_TOP), f"pkg{rng.randrange(400)}"]
+        parts += [rng.choice(_DIRS) for _ in range(rng.randrange(5))]
+        directories.append("/".join(parts))
+    paths = []
+    for _ in range(n):
+        name = f"{rng.choice(_STEMS)}{rng.randrange(50) if rng.random() < 0.5 else ''}.{rng.choice(_EXTENSIONS)}"
+        if rng.random() < 0.01:
+            name = rng.choice(sorted(config.SKIP_FILENAMES))
+        paths.append(f"{rng.choice(directories)}/{name}")
+    return paths
+
+
+def legacy_keep(path: str) -> bool:
+    """The per-entry rules the compiled filter replaced."""
+    p = PurePosixPath(path)
+    if any(part in config.SKIP_DIRS for part in p.parent.parts):
+        return False
+    if p.name in config.SKIP_FILENAMES or p.suffix.lower() in config.SKIP_EXTENSIONS:
+        return False
+    return not p.name.endswith((".min.js", ".min.css"))
+
+
+def _timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<32} {(time.perf_counter() - start) * 1000:8.1f} ms")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=500_000)
+    args = parser.parse_args()
+
+    paths = synthetic_paths(args.entries)
+    entries = [{"path": p, "type": "blob"} for p in paths]
+    rules = _timed("compile rules", lambda: pathfilter.PathFilter(
+        config.SKIP_DIRS, config.SKIP_EXTENSIONS, config.SKIP_FILENAMES, config.SKIP_PATTERNS,
+    ))
+
+    def streamed() -> list[str]:
+        keep = context.entry_filter(rules)
+        return [e["path"] for e in entries if keep(e)]
+
+    kept_entries = _timed("entry_filter (streamed tree)", streamed)
+    kept_paths = _timed("PathFilter.keep per path", lambda: [p for p in paths if rules.keep(p)])
+    legacy = _timed("PurePosixPath per path (old)", lambda: [p for p in paths if legacy_keep(p)])
+
+    assert kept_entries == kept_paths == legacy, "filters disagree"
+    print(f"{len(paths)} paths, {len(kept_paths)} kept")
+
+
+if __name__ == "__main__":
+    main()
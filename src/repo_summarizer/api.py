@@ -1,16 +1,43 @@
+import asyncio
+import json
 import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
+import httpx
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
 from fastapi.requests import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from repo_summarizer import core, github, llm, models
+from repo_summarizer import config, core, github, jobs, llm, models
 
 logger = logging.getLogger(__name__)
 
 
-app = FastAPI(title="GitHub Repository Summarizer")
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    cfg = config.get_config()
+    # One pooled client for the whole process so GitHub connections and TLS sessions are reused
+    app.state.http_client = github.create_client(cfg.http)
+    app.state.jobs = jobs.JobManager(cfg.jobs, app.state.http_client)
+    await app.state.jobs.start()
+    try:
+        yield
+    finally:
+        await app.state.jobs.stop()
+        await core.drain(cfg.http.shutdown_timeout)
+        await app.state.http_client.aclose()
+        del app.state.http_client
+        del app.state.jobs
+
+
+app = FastAPI(title="GitHub Repository Summarizer", lifespan=lifespan)
+
+
+def _http_client(request: Request) -> httpx.AsyncClient | None:
+    # Absent when the app runs without its lifespan (e.g. a bare TestClient)
+    return getattr(request.app.state, "http_client", None)
 
 
 @app.exception_handler(github.GitHubError)
@@ -31,6 +58,14 @@ async def llm_error_handler(request: Request, exc: llm.LLMError) -> JSONResponse
     )
 
 
+@app.exception_handler(jobs.JobError)
+async def job_error_handler(request: Request, exc: jobs.JobError) -> JSONResponse:
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"status": "error", "message": exc.message},
+    )
+
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(
     request: Request, exc: RequestValidationError
@@ -66,5 +101,94 @@ async def root():
     "/summarize",
     response_model=models.SummaryResponse,
 )
-async def summarize(request: models.SummarizeRequest) -> models.SummaryResponse:
-    return await core.summarize_repo(request.github_url)
+async def summarize(request: models.SummarizeRequest, http_request: Request) -> models.SummaryResponse:
+    return await core.summarize_repo(request.github_url, _http_client(http_request))
+
+
+def _format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _error_body(exc: Exception) -> dict:
+    # Mirrors the exception handlers above, for streams that have already started with a 200
+    status_code, message = core.describe_error(exc)
+    return {"status": "error", "status_code": status_code, "message": message}
+
+
+async def _summary_events(github_url: str, client: httpx.AsyncClient | None) -> AsyncIterator[str]:
+    queue: asyncio.Queue[tuple[str, dict] | None] = asyncio.Queue()
+
+    async def _run() -> None:
+        try:
+            result = await core.summarize_repo(github_url, client, on_event=lambda e, d: queue.put_nowait((e, d)))
+            queue.put_nowait(("result", result.model_dump()))
+        except Exception as exc:
+            if isinstance(exc, (github.GitHubError, llm.LLMError)):
+                logger.error(f"Streaming summary failed: {exc}")
+            else:
+                logger.exception("Unhandled error")
+            queue.put_nowait(("error", _error_body(exc)))
+        finally:
+            queue.put_nowait(None)
+
+    task = asyncio.create_task(_run())
+    try:
+        while (item := await queue.get()) is not None:
+            yield _format_sse(*item)
+    finally:
+        # Client went away — stop waiting; a run other callers share keeps going without this one
+        task.cancel()
+
+
+@app.post("/summarize/stream")
+async def summarize_stream(request: models.SummarizeRequest, http_request: Request) -> StreamingResponse:
+    """Stream progress as Server-Sent Events, ending with a ``result`` or ``error`` event."""
+    # Reject bad URLs with a normal 400 before the stream starts
+    github.parse_github_url(request.github_url)
+    return StreamingResponse(
+        _summary_events(request.github_url, _http_client(http_request)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _batch_lines(github_urls: list[str], client: httpx.AsyncClient | None) -> AsyncIterator[str]:
+    results = core.summarize_batch(github_urls, client)
+    try:
+        async for url, result in results:
+            if isinstance(result, models.SummaryResponse):
+                line = models.BatchItemResult(github_url=url, status="ok", result=result)
+            else:
+                if not isinstance(result, (github.GitHubError, llm.LLMError)):
+                    logger.error(f"Unhandled error summarizing {url}", exc_info=result)
+                line = models.BatchItemResult(github_url=url, **_error_body(result))
+            yield line.model_dump_json(exclude_none=True) + "\n"
+    finally:
+        await results.aclose()
+
+
+@app.post("/summarize/batch")
+async def summarize_batch(request: models.BatchSummarizeRequest, http_request: Request) -> StreamingResponse:
+    """Summarize many repos, streaming one NDJSON ``BatchItemResult`` line per repo as it completes."""
+    return StreamingResponse(
+        _batch_lines(request.github_urls, _http_client(http_request)),
+        media_type="application/x-ndjson",
+    )
+
+
+def _job_manager(request: Request) -> jobs.JobManager:
+    manager = getattr(request.app.state, "jobs", None)
+    if manager is None:
+        raise jobs.JobError("Job workers are not running", status_code=503)
+    return manager
+
+
+@app.post("/jobs", response_model=models.JobStatus, status_code=202)
+async def create_job(request: models.SummarizeRequest, http_request: Request) -> models.JobStatus:
+    """Queue a summary and return immediately; poll ``GET /jobs/{job_id}`` for the result."""
+    return _job_manager(http_request).submit(request.github_url)
+
+
+@app.get("/jobs/{job_id}", response_model=models.JobStatus)
+async def get_job(job_id: str, http_request: Request) -> models.JobStatus:
+    return _job_manager(http_request).get(job_id)
@@ -0,0 +1,82 @@
+import math
+from collections import Counter
+from typing import NamedTuple
+
+from repo_summarizer import config, filetree, skeleton
+
+# With budgets fixed: files asked of the selection LLM, and valid ones kept (some paths are hallucinated)
+FIXED_REQUESTED_FILES = 25
+FIXED_SELECTED_FILES = 15
+
+_LANGUAGE_SAMPLE = 20_000  # file names sampled when measuring the language mix
+_LANGUAGE_SHARE = 0.05  # share of sampled files an extension needs to count as one of the repo's languages
+_TOP_LEVEL_CAP = 16  # top-level directories beyond this add no more files
+
+
+class RepoBudget(NamedTuple):
+    requested_files: int  # paths asked of the selection LLM
+    selected_files: int  # valid paths fetched for the summary
+    max_file_size: int  # tokens per file
+    context_budget: int  # tokens in total
+
+
+class RepoShape(NamedTuple):
+    entries: int
+    total_bytes: int | None
+    top_level_dirs: int
+    languages: int
+
+
+def measure(tree: filetree.CompactTree) -> RepoShape:
+    """What the budget depends on: file count, total size, top-level directories and source languages."""
+    top_level = {d.partition("/")[0] for d in set(tree.directories())} - {""}
+    names = tree.names
+    sample = names[::max(1, len(names) // _LANGUAGE_SAMPLE)]
+    extensions = Counter(name.rpartition(".")[2].lower() for name in sample if "." in name)
+    languages = sum(
+        1 for ext, n in extensions.items()
+        if ext in skeleton.SUPPORTED_EXTENSIONS and n >= _LANGUAGE_SHARE * len(sample)
+    )
+    return RepoShape(len(tree), tree.total_size(), len(top_level), languages)
+
+
+def plan(tree: filetree.CompactTree, cfg: config.Config | None = None, single_pass: bool = False) -> RepoBudget:
+    """File counts and token budgets for summarizing ``tree``, scaled to the repo's size and spread.
+
+    The number of files grows with the log of the file count, the number
+    of top-level directories and the number of source languages, so a
+    ten-file library is summarized from a handful of files and a
+    multi-language monorepo from enough to cover each area. The context
+    budget follows the file count (or, with ``single_pass``, where every
+    file is sent, the whole repo) but stays under what the summary model
+    can read within ``summary_latency_target``, and never exceeds the
+    repo's own size.
+    """
+    cfg = cfg or config.get_config()
+    policy = cfg.budget
+    if not policy.adaptive_budgets:
+        return RepoBudget(
+            FIXED_REQUESTED_FILES, FIXED_SELECTED_FILES, cfg.context.max_file_size, cfg.context.context_budget,
+        )
+
+    shape = measure(tree)
+    files = (
+        2
+        + math.log2(max(shape.entries, 1))
+        + 0.5 * min(shape.top_level_dirs, _TOP_LEVEL_CAP)
+        + max(shape.languages - 1, 0)
+    )
+    selected = max(policy.min_selected_files, min(policy.max_selected_files, round(files)))
+
+    # Summary latency ~ fixed generation time + input tokens at the model's prefill rate
+    latency_cap = (policy.summary_latency_target - policy.summary_base_seconds) * policy.summary_input_tokens_per_second
+    files_sent = shape.entries if single_pass else selected
+    wanted = cfg.context.context_budget if single_pass else selected * policy.context_tokens_per_file
+    context_budget = min(max(wanted, policy.min_context_budget), cfg.context.context_budget, int(latency_cap))
+    if shape.total_bytes is not None:
+        # A repo smaller than the budget can't use all of it: ~3 bytes per token, plus each file's header
+        context_budget = min(context_budget, shape.total_bytes // 3 + 20 * shape.entries)
+
+    max_file_size = min(cfg.context.max_file_size, max(policy.min_file_tokens, 2 * context_budget // max(files_sent, 1)))
+    # Ask for more than we keep, as some selected paths don't exist
+    return RepoBudget(selected + selected * 2 // 3, selected, max_file_size, context_budget)
@@ -0,0 +1,208 @@
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Generic, NamedTuple, TypeVar
+
+from repo_summarizer import config, models
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+_BLOB_SHA = re.compile(r"^[0-9a-f]{40}([0-9a-f]{24})?$")
+
+
+class LRUCache(Generic[V]):
+    """In-memory LRU cache with optional per-entry TTL.
+
+    Entries are evicted least-recently-used first once ``maxsize`` is reached,
+    and expired entries are dropped lazily on lookup. With ``weigh`` set,
+    ``maxsize`` bounds the total weight (e.g. bytes) instead of the entry count.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float | None = None,
+        weigh: Callable[[V], int] | None = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._weigh = weigh
+        self._weight = 0
+        self._data: OrderedDict[Hashable, tuple[float, V, int]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> V | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value, _ = item
+        if expires_at <= time.monotonic():
+            self.pop(key)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        weight = self._weigh(value) if self._weigh else 1
+        if weight > self.maxsize:
+            return
+        self.pop(key)
+        expires_at = time.monotonic() + self.ttl if self.ttl else float("inf")
+        self._data[key] = (expires_at, value, weight)
+        self._weight += weight
+        while self._weight > self.maxsize:
+            _, (_, _, evicted) = self._data.popitem(last=False)
+            self._weight -= evicted
+
+    def pop(self, key: Hashable) -> V | None:
+        item = self._data.pop(key, None)
+        if item is None:
+            return None
+        self._weight -= item[2]
+        return item[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._weight = 0
+
+
+class ValidatedResponse(NamedTuple):
+    """A response stored with the validators needed to revalidate it.
+
+    ``content`` is the raw body, or for streamed responses what the body was
+    parsed into; ``size`` is its approximate size in bytes.
+    """
+
+    etag: str | None
+    last_modified: str | None
+    content_type: str | None
+    content: Any
+    size: int
+
+
+def _utf8_size(content: str) -> int:
+    return len(content.encode("utf-8"))
+
+
+class BlobCache:
+    """Content-addressed cache of decoded file contents, keyed by git blob SHA.
+
+    Blob SHAs are immutable, so entries never need invalidation — only
+    eviction. The memory tier is an LRU bounded by total UTF-8 bytes. The
+    optional disk tier stores one file per blob under ``directory`` and
+    evicts the least recently used files once ``disk_max_bytes`` is exceeded.
+    """
+
+    def __init__(self, memory_max_bytes: int, directory: str | None = None, disk_max_bytes: int = 0):
+        self._memory: LRUCache[str] = LRUCache(memory_max_bytes, weigh=_utf8_size)
+        self.directory = Path(directory) if directory else None
+        self.disk_max_bytes = disk_max_bytes
+        self._disk_bytes = 0
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(f.stat().st_size for f in self.directory.glob("*/*") if f.is_file())
+
+    def get(self, sha: str) -> str | None:
+        content = self._memory.get(sha)
+        if content is not None:
+            return content
+        content = self._disk_get(sha)
+        if content is not None:
+            self._memory.set(sha, content)
+        return content
+
+    def set(self, sha: str, content: str) -> None:
+        self._memory.set(sha, content)
+        self._disk_set(sha, content)
+
+    def clear(self) -> None:
+        self._memory.clear()
+
+    def _disk_path(self, sha: str) -> Path | None:
+        # Only accept real SHAs so a crafted key can never escape the cache directory
+        if self.directory is None or not _BLOB_SHA.match(sha):
+            return None
+        return self.directory / sha[:2] / sha
+
+    def _disk_get(self, sha: str) -> str | None:
+        path = self._disk_path(sha)
+        if path is None:
+            return None
+        try:
+            content = path.read_text(encoding="utf-8")
+            os.utime(path)
+        except (FileNotFoundError, UnicodeDecodeError):
+            return None
+        except OSError as exc:
+            logger.warning(f"Blob cache read failed for {sha}: {exc}")
+            return None
+        return content
+
+    def _disk_set(self, sha: str, content: str) -> None:
+        path = self._disk_path(sha)
+        if path is None or path.exists():
+            return
+        data = content.encode("utf-8")
+        if len(data) > self.disk_max_bytes:
+            return
+        try:
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_suffix(f".tmp{os.getpid()}")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError as exc:
+            logger.warning(f"Blob cache write failed for {sha}: {exc}")
+            return
+        self._disk_bytes += len(data)
+        if self._disk_bytes > self.disk_max_bytes:
+            self._disk_evict()
+
+    def _disk_evict(self) -> None:
+        files = []
+        for f in self.directory.glob("*/*"):
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, st.st_size, f))
+        files.sort()
+        self._disk_bytes = sum(size for _, size, _ in files)
+        # Evict down to 90% so every write past the limit doesn't trigger a full scan
+        target = self.disk_max_bytes * 0.9
+        for _, size, f in files:
+            if self._disk_bytes <= target:
+                break
+            try:
+                f.unlink()
+            except OSError:
+                continue
+            self._disk_bytes -= size
+
+
+@lru_cache
+def get_summary_cache() -> LRUCache[tuple[str, models.SummaryResponse]]:
+    """Summaries keyed by (owner, repo), stored alongside the tree SHA they were built from."""
+    cfg = config.get_config().cache
+    return LRUCache(cfg.summary_cache_size, cfg.summary_cache_ttl)
+
+
+@lru_cache
+def get_blob_cache() -> BlobCache:
+    cfg = config.get_config().cache
+    return BlobCache(cfg.blob_cache_memory_bytes, cfg.blob_cache_dir, cfg.blob_cache_disk_bytes)
+
+
+@lru_cache
+def get_validator_store() -> LRUCache[ValidatedResponse]:
+    """Response bodies keyed by request, bounded by their total size."""
+    cfg = config.get_config().cache
+    return LRUCache(cfg.validator_store_bytes, weigh=lambda r: r.size)
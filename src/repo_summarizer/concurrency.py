@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import weakref
+from collections import deque
+from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Callable, Hashable
+from contextlib import aclosing, asynccontextmanager
+from typing import Generic, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight(Generic[T]):
+    """Coalesce concurrent calls with the same key into one shared task.
+
+    The first caller for a key starts the work; callers arriving while it is
+    running await the same task and receive its result or exception. Waiters
+    are shielded, so cancelling one of them never cancels the shared work.
+    """
+
+    def __init__(self):
+        self._tasks: dict[Hashable, asyncio.Task[T]] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._tasks
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task[T]) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+
+class StageScheduler:
+    """Process-wide concurrency limits for the pipeline's stages.
+
+    Each stage gets its own semaphore, so a run holds a slot only while it
+    is in that stage. Cheap stages (GitHub fetches, file selection) run ahead
+    and queue up work for the slow one (summary generation) instead of all
+    runs competing for a single limit.
+    """
+
+    def __init__(self, limits: dict[str, int]):
+        self.limits = limits
+        # asyncio primitives are bound to one event loop, so keep a set per loop
+        self._semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]
+        ] = weakref.WeakKeyDictionary()
+
+    def _semaphore(self, stage: str) -> asyncio.Semaphore:
+        per_loop = self._semaphores.setdefault(asyncio.get_running_loop(), {})
+        if stage not in per_loop:
+            per_loop[stage] = asyncio.Semaphore(self.limits[stage])
+        return per_loop[stage]
+
+    @asynccontextmanager
+    async def stage(self, stage: str) -> AsyncIterator[None]:
+        async with self._semaphore(stage):
+            yield
+
+
+async def bounded_as_completed(
+    items: list[T],
+    fn: Callable[[T], Awaitable[object]],
+    concurrency: int,
+) -> AsyncIterator[tuple[T, object]]:
+    """Run ``fn`` over ``items`` with at most ``concurrency`` in flight.
+
+    Yields ``(item, result)`` in completion order, where ``result`` is the
+    exception if ``fn`` raised. Closing the iterator cancels remaining work.
+    """
+    queue: asyncio.Queue[tuple[T, object]] = asyncio.Queue()
+    pending = iter(items)
+
+    async def _worker() -> None:
+        for item in pending:
+            try:
+                result = await fn(item)
+            except Exception as exc:
+                result = exc
+            queue.put_nowait((item, result))
+
+    workers = [asyncio.create_task(_worker()) for _ in range(min(concurrency, len(items)))]
+    try:
+        for _ in range(len(items)):
+            yield await queue.get()
+    finally:
+        for w in workers:
+            w.cancel()
+
+
+async def iter_with_deadline(items: AsyncGenerator[T, None], timeout: float) -> AsyncIterator[T]:
+    """Re-yield ``items``, raising ``asyncio.TimeoutError`` once ``timeout`` seconds have passed.
+
+    The deadline covers the whole iteration, not each item, so a source that
+    trickles items slowly still gives up on time. The source is closed on exit.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            try:
+                item = await asyncio.wait_for(items.__anext__(), remaining)
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        await items.aclose()
+
+
+class HedgePolicy:
+    """When to hedge a streamed call, and how many extra calls hedging may cost.
+
+    The hedge delay is a percentile of recent times to first item (the
+    configured initial delay until ``min_samples`` have been seen). Every
+    call earns ``budget_ratio`` of a hedge, up to ``burst`` saved, and each
+    hedge spends one — so over time hedging adds at most ``budget_ratio``
+    extra calls per call, however slow the backend gets.
+    """
+
+    def __init__(
+        self,
+        percentile: float,
+        initial_delay: float,
+        min_delay: float,
+        budget_ratio: float,
+        burst: float,
+        window: int = 200,
+        min_samples: int = 20,
+    ):
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.budget_ratio = budget_ratio
+        self.burst = burst
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+        self._tokens = burst
+
+    def delay(self) -> float:
+        """Seconds to wait for a first item before hedging."""
+        if len(self._samples) < self.min_samples:
+            return self.initial_delay
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[index])
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def started(self) -> None:
+        self._tokens = min(self.burst, self._tokens + self.budget_ratio)
+
+    def try_hedge(self) -> bool:
+        """Spend one hedge from the budget, if there is one."""
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+
+async def hedged(open_stream: Callable[[], AsyncGenerator[T, None]], policy: HedgePolicy | None) -> AsyncIterator[T]:
+    """Re-yield ``open_stream()``, racing a second copy if the first is slow to yield anything.
+
+    If no item arrives within ``policy.delay()`` and the hedge budget
+    allows, the stream is opened again; whichever copy yields first (or
+    ends first) is re-yielded and the other is closed. A copy that fails
+    before its first item drops out of the race. Without a policy the
+    stream is passed through as is.
+    """
+    if policy is None:
+        async with aclosing(open_stream()) as stream:
+            async for item in stream:
+                yield item
+        return
+
+    loop = asyncio.get_running_loop()
+    policy.started()
+    streams: dict[asyncio.Future, tuple[AsyncGenerator[T, None], float]] = {}
+
+    def _open() -> None:
+        stream = open_stream()
+        streams[asyncio.ensure_future(anext(stream))] = (stream, loop.time())
+
+    winner: AsyncGenerator[T, None] | None = None
+    try:
+        _open()
+        delay = policy.delay()
+        done, _ = await asyncio.wait(streams, timeout=delay)
+        if not done and policy.try_hedge():
+            logger.info(f"Nothing after {delay:.1f}s, hedging with a second request")
+            _open()
+        while winner is None:
+            done, _ = await asyncio.wait(streams, return_when=asyncio.FIRST_COMPLETED)
+            for first in done:
+                stream, started = streams.pop(first)
+                exc = first.exception()
+                if exc is None or isinstance(exc, StopAsyncIteration):
+                    winner = stream
+                    break
+                await stream.aclose()
+                if not streams:
+                    raise exc
+        policy.observe(loop.time() - started)
+    finally:
+        # Losers: stop them, let them unwind, then close them
+        for pending in streams:
+            pending.cancel()
+        if streams:
+            await asyncio.wait(streams)
+        for pending, (stream, _) in streams.items():
+            if not pending.cancelled():
+                pending.exception()  # retrieved, so it isn't logged as unhandled
+            await stream.aclose()
+
+    async with aclosing(winner) as stream:
+        if exc is not None:
+            return
+        yield first.result()
+        async for item in stream:
+            yield item
@@ -1,26 +1,128 @@
 from functools import lru_cache
 
+from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class LLMBackend(BaseModel):
+    """One OpenAI-compatible endpoint and the models it serves for each pass."""
+    name: str
+    base_url: str
+    api_key: str | None = None  # defaults to NEBIUS_API_KEY
+    selection_models: list[str] = []
+    summary_models: list[str] = []
+
+
 class LLMConfig(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
     nebius_api_key: str
     nebius_base_url: str = "https://api.studio.nebius.com/v1"
     model_name: str = "moonshotai/Kimi-K2.5"
     file_selection_model: str = "meta-llama/Llama-3.3-70B-Instruct-fast"
+    llm_backends: list[LLMBackend] = []  # JSON list; empty means Nebius with the two models above
+    circuit_failure_threshold: int = 3  # consecutive failures that take a route out of rotation
+    circuit_reset_seconds: float = 30.0  # how long a failing route stays out before one trial call
+    route_stats_window: int = 50  # recent calls per route that latency and error rate are computed over
+    selection_min_valid_paths: int = 5  # fewer valid selected paths than this re-asks with a summary model
+
+
+class HedgeConfig(BaseSettings):
+    hedge_requests: bool = True  # send a duplicate LLM request when the first token is late
+    hedge_percentile: float = 95.0  # recent time-to-first-token percentile after which a call is hedged
+    hedge_initial_delay: float = 10.0  # seconds, used until enough first tokens have been timed
+    hedge_selection_initial_delay: float = 4.0  # the same for file selection, well inside selection_fallback_timeout
+    hedge_min_delay: float = 1.0  # never hedge sooner than this
+    hedge_budget_ratio: float = 0.1  # extra requests per request that hedging may add, over time
+    hedge_burst: float = 3.0  # hedges that can be spent back to back once the budget has built up
 
 
 class ContextConfig(BaseSettings):
-    context_budget: int = 75_000  # chars total for LLM context
-    max_file_size: int = 15_000  # chars per file
-    max_readme_for_selection: int = 10_000  # chars of README sent to file-selection LLM
+    context_budget: int = 20_000  # tokens total for the summary LLM's file context (the cap when budgets adapt)
+    max_file_size: int = 4_000  # tokens per file (the cap when budgets adapt)
+    max_fetch_bytes: int = 64_000  # bytes downloaded per file; larger files are fetched with a Range request
+    skeleton_min_chars: int = 4_000  # source files at least this long are cut down to an outline of their declarations
+    skeleton_extensions: list[str] | None = None  # file types to outline; None means all supported, [] disables
+    max_readme_for_selection: int = 2_500  # tokens of README sent to file-selection LLM
+    max_tree_for_selection: int = 10_000  # tokens of directory tree sent to file-selection LLM
+    tokenizer_dir: str | None = None  # local <model>/tokenizer.json files for exact counts; approximate otherwise
+    prefetch_files: int = 8  # top-ranked files fetched while the selection LLM runs (0 disables)
+    single_pass_max_bytes: int = 60_000  # repos whose files total at most this skip selection and send everything
+    single_pass_max_files: int = 60  # ...as long as that doesn't mean more than this many GitHub fetches
+    tree_max_entries: int = 300_000  # entries collected when rebuilding a tree GitHub truncated
+    tree_max_depth: int = 12  # directory levels expanded when rebuilding a truncated tree
+    tree_expand_concurrency: int = 8  # subtree requests in flight while rebuilding a truncated tree
+    skip_patterns: list[str] = []  # extra gitignore-style globs to skip, on top of the built-in lists
+
+
+class RankingConfig(BaseSettings):
+    heuristic_max_entries: int = 150  # repos with at most this many filtered files skip the selection LLM
+    selection_fallback_timeout: float = 12.0  # seconds before LLM selection gives way to the heuristic ranking
+    manifest_score: float = 100.0
+    entry_point_score: float = 60.0
+    base_score: float = 20.0
+    depth_penalty: float = 12.0  # per directory level
+    fanout_penalty: float = 3.0  # per doubling of files in the same directory
+    low_value_penalty: float = 40.0  # tests, docs, examples
+    size_penalty: float = 20.0  # files outside the useful size band
+    min_useful_bytes: int = 100
+    max_useful_bytes: int = 100_000
+
+
+class BudgetConfig(BaseSettings):
+    adaptive_budgets: bool = True  # size file counts and budgets per repo; False uses 15 files and the fixed caps
+    min_selected_files: int = 6
+    max_selected_files: int = 30
+    context_tokens_per_file: int = 1_300  # context budget per selected file, up to CONTEXT_BUDGET
+    min_context_budget: int = 8_000  # tokens
+    min_file_tokens: int = 1_500  # per-file cap never drops below this
+    summary_latency_target: float = 30.0  # seconds; caps the context budget through the two settings below
+    summary_base_seconds: float = 10.0  # summary time spent regardless of input size (mostly output generation)
+    summary_input_tokens_per_second: float = 1_500.0  # summary model's observed input processing rate
+
+
+class CacheConfig(BaseSettings):
+    summary_cache_size: int = 512  # repos kept in the summary cache
+    summary_cache_ttl: float = 24 * 3600  # seconds before a cached summary expires
+    blob_cache_memory_bytes: int = 64 * 1024 * 1024  # decoded file contents kept in memory
+    blob_cache_dir: str | None = None  # enables the on-disk blob tier when set
+    blob_cache_disk_bytes: int = 1024 * 1024 * 1024  # size cap for the on-disk blob tier
+    validator_store_bytes: int = 256 * 1024 * 1024  # GitHub responses kept for ETag revalidation
+
+
+class HTTPConfig(BaseSettings):
+    http2: bool = True  # multiplex concurrent GitHub requests over one connection
+    max_connections: int = 100  # pooled connections to GitHub
+    max_keepalive_connections: int = 20  # idle connections kept open between requests
+    keepalive_expiry: float = 30.0  # seconds an idle connection stays in the pool
+    request_timeout: float = 30.0  # seconds per GitHub request
+    shutdown_timeout: float = 30.0  # seconds to wait for in-flight summaries on shutdown
+
+
+class SchedulerConfig(BaseSettings):
+    github_concurrency: int = 32  # runs fetching from GitHub at once
+    selection_concurrency: int = 16  # concurrent file-selection LLM calls
+    summary_concurrency: int = 8  # concurrent summary LLM calls
+    batch_concurrency: int = 64  # repos in flight per batch request
+
+
+class JobsConfig(BaseSettings):
+    job_workers: int = 8  # summaries run concurrently by the job pool
+    job_queue_size: int = 1000  # queued jobs before POST /jobs returns 503
+    job_result_store_size: int = 10_000  # finished jobs kept for polling
+    job_result_ttl: float = 3600  # seconds a finished job stays pollable
 
 
 class Config(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
     llm: LLMConfig = LLMConfig()
+    hedge: HedgeConfig = HedgeConfig()
     context: ContextConfig = ContextConfig()
+    ranking: RankingConfig = RankingConfig()
+    budget: BudgetConfig = BudgetConfig()
+    cache: CacheConfig = CacheConfig()
+    http: HTTPConfig = HTTPConfig()
+    scheduler: SchedulerConfig = SchedulerConfig()
+    jobs: JobsConfig = JobsConfig()
     github_token: str | None = None
 
 
@@ -85,3 +187,69 @@ SKIP_FILENAMES = {
     "Gemfile.lock",
     "Cargo.lock",
 }
+
+# Gitignore-style globs for what the sets above can't express
+SKIP_PATTERNS = {
+    "*.min.js",
+    "*.min.css",
+}
+
+# Files that describe a project's dependencies, build or runtime — almost always worth reading
+MANIFEST_FILENAMES = {
+    "pyproject.toml",
+    "setup.py",
+    "setup.cfg",
+    "requirements.txt",
+    "package.json",
+    "tsconfig.json",
+    "Cargo.toml",
+    "go.mod",
+    "pom.xml",
+    "build.gradle",
+    "build.gradle.kts",
+    "Gemfile",
+    "composer.json",
+    "mix.exs",
+    "CMakeLists.txt",
+    "Makefile",
+    "Dockerfile",
+    "docker-compose.yml",
+    "docker-compose.yaml",
+}
+
+# File stems (name without extension) that usually mark an entry point
+ENTRY_POINT_STEMS = {
+    "main",
+    "__main__",
+    "index",
+    "app",
+    "server",
+    "cli",
+    "lib",
+    "mod",
+    "manage",
+}
+
+# Directories whose files rarely explain what a project does
+LOW_VALUE_DIRS = {
+    "test",
+    "tests",
+    "__tests__",
+    "spec",
+    "fixtures",
+    "testdata",
+    "doc",
+    "docs",
+    "example",
+    "examples",
+    "benchmarks",
+    "scripts",
+}
+
+# Prose files — the root README already covers the overview
+DOC_EXTENSIONS = {
+    "md",
+    "rst",
+    "txt",
+    "adoc",
+}
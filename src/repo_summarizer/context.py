@@ -1,131 +1,499 @@
+import math
 import re
-from pathlib import PurePosixPath
+import zlib
+from collections import Counter
+from collections.abc import Callable, Collection
+from itertools import chain, repeat
+from operator import itemgetter
+
+from repo_summarizer import config, filetree, pathfilter, ranking, skeleton, tokens
 
 
 README_NAMES = {"readme", "readme.md", "readme.rst", "readme.txt"}
 
-_LICENSE_BLOCK_COMMENT = re.compile(
-    r"\A\s*/\*.*?(?:license|copyright|spdx|permission is hereby granted|redistribution).*?\*/\s*",
-    re.DOTALL | re.IGNORECASE,
+_LICENSE_KEYWORDS = re.compile(
+    r"license|copyright|spdx|permission is hereby granted|redistribution", re.IGNORECASE
 )
+_LEADING_BLOCK_COMMENT = re.compile(r"\s*/\*(.*?)\*/\s*", re.DOTALL)
+_COMMENT_PREFIXES = ("#", "//", "--", ";", "rem ")
+_NEWLINES = re.compile(r"\n*")
 
 
-def strip_license_header(content: str) -> str:
+def _license_header_end(content: str) -> int:
+    """Offset where content starts once a leading license header is skipped (0 if there is none).
+
+    Only the header itself is scanned, never the rest of the file.
+    """
     # Try block comment first (/* ... */)
-    m = _LICENSE_BLOCK_COMMENT.match(content)
+    m = _LEADING_BLOCK_COMMENT.match(content)
     if m:
-        return content[m.end():]
+        return m.end() if _LICENSE_KEYWORDS.search(content, m.start(1), m.end(1)) else 0
 
     # Try line comments (# or // or -- or ;)
     # Only strip if the comment block contains license/copyright keywords
-    lines = content.split("\n")
-    comment_prefixes = ("#", "//", "--", ";", "rem ")
-    i = 0
-    while i < len(lines) and (
-        lines[i].strip() == "" or any(lines[i].lstrip().startswith(p) for p in comment_prefixes)
-    ):
-        i += 1
-
-    if i == 0:
-        return content
-
-    header = "\n".join(lines[:i]).lower()
-    if any(kw in header for kw in ("license", "copyright", "spdx", "permission is hereby granted", "redistribution")):
-        return "\n".join(lines[i:]).lstrip("\n")
-
-    return content
-
-
-def filter_tree(
-    tree: list[dict],
-    skip_dirs: set[str],
-    skip_extensions: set[str],
-    skip_filenames: set[str],
-) -> list[dict]:
-    result = []
-    for entry in tree:
-        if entry.get("type") != "blob":
-            continue
+    pos = 0
+    while pos <= len(content):
+        end = content.find("\n", pos)
+        if end == -1:
+            end = len(content)
+        line = content[pos:end].lstrip()
+        if line and not line.startswith(_COMMENT_PREFIXES):
+            break
+        pos = end + 1
 
-        parts = PurePosixPath(entry["path"]).parts
+    if pos == 0 or not _LICENSE_KEYWORDS.search(content, 0, pos):
+        return 0
+    if pos > len(content):
+        return len(content)
+    return _NEWLINES.match(content, pos).end()
 
-        if any(part in skip_dirs for part in parts[:-1]):
-            continue
 
-        filename = parts[-1]
-        if filename in skip_filenames:
-            continue
+def strip_license_header(content: str) -> str:
+    return content[_license_header_end(content):]
 
-        if PurePosixPath(filename).suffix.lower() in skip_extensions:
-            continue
 
-        # Handle compound extensions like .min.js
-        if filename.endswith((".min.js", ".min.css")):
-            continue
+def entry_filter(rules: pathfilter.PathFilter) -> Callable[[dict], bool]:
+    """The skip rules as a check on GitHub tree entries, applied one at a time as they arrive.
+
+    Directory ("tree") entries pass unless they are or sit inside a skipped
+    directory, so callers can prune whole subtrees. Verdicts are cached per
+    directory and per file name, so a large tree costs one regex search per
+    distinct directory and name rather than one per entry.
+    """
+    dir_verdicts: dict[str, bool] = {}
+    name_verdicts: dict[str, bool] = {}
+    anchored = rules.has_anchored
+
+    def keep_dir(directory: str) -> bool:
+        verdict = dir_verdicts.get(directory)
+        if verdict is None:
+            verdict = dir_verdicts[directory] = rules.keep_dir(directory)
+        return verdict
+
+    def keep(entry: dict) -> bool:
+        entry_type = entry.get("type")
+        if entry_type == "tree":
+            return keep_dir(entry["path"])
+        if entry_type != "blob":
+            return False
+        path = entry["path"]
+        directory, _, name = path.rpartition("/")
+        verdict = name_verdicts.get(name)
+        if verdict is None:
+            verdict = name_verdicts[name] = rules.keep_name(name)
+        return verdict and keep_dir(directory) and (not anchored or rules.keep_anchored(path))
+
+    return keep
+
+
+_DOT_EXTENSION = itemgetter(1, 2)
+
+
+class _TreeNode:
+    """One directory of the tree being formatted."""
+
+    __slots__ = ("path", "depth", "files", "dirs", "pending", "lines", "summary")
+
+    def __init__(self, path: str, depth: int):
+        self.path = path
+        self.depth = depth
+        self.files: list[str] = []
+        self.dirs: dict[str, _TreeNode] = {}
+        self.pending: list[tuple[str, list[str]]] = []  # (path, files) of every directory below this one
+        self.lines: list[str] | None = None  # the directory's own lines when expanded, built on first use
+        self.summary: str | None = None  # its one line when collapsed, built on first use
 
-        result.append(entry)
-    return result
 
+def _extensions(filenames: list[str]) -> Counter[tuple[str, str]]:
+    # Counted as rpartition's (dot, extension) so the whole count runs in C; an empty dot means none
+    return Counter(map(_DOT_EXTENSION, map(str.rpartition, filenames, repeat("."))))
 
-def format_directory_tree(tree: list[dict], max_size: int = 100_000) -> str:
-    lines = ["Directory structure:", ""]
-    paths = sorted(
-        (entry["path"] for entry in tree),
-        key=lambda p: (p.count("/"), p),
+
+def _histogram(extensions: Counter[tuple[str, str]], top: int = 3) -> str:
+    labels: Counter[str] = Counter()
+    for (dot, ext), n in extensions.items():
+        labels[f".{ext}" if dot else "other"] += n
+    common = [(label, n) for label, n in labels.most_common(top + 1) if label != "other"][:top]
+    rest = sum(labels.values()) - sum(n for _, n in common)
+    parts = [f"{label} {n:,}" for label, n in common]
+    if rest:
+        parts.append(f"other {rest:,}")
+    return ", ".join(parts)
+
+
+def _sample_key(filename: str) -> tuple[bool, bool, str]:
+    # Manifests and entry points first — they're what file selection looks for
+    return (
+        filename not in config.MANIFEST_FILENAMES,
+        filename.split(".", 1)[0].lower() not in config.ENTRY_POINT_STEMS,
+        filename,
     )
-    used = 0
-    included = 0
-    for path in paths:
-        if used + len(path) + 1 > max_size:
-            lines.append(f"... ({len(paths) - included} more files)")
+
+
+def _chars(lines: list[str]) -> int:
+    return sum(map(len, lines)) + len(lines)
+
+
+class _TreeLayout:
+    """The directory tree, built one depth level at a time as far down as it's looked at.
+
+    Each directory keeps the files of its whole subtree, so a collapsed
+    directory's count and histogram come from one pass over them, and
+    levels below the deepest one shown are never built. Each directory's
+    lines are built at most once, however many times the tree is sized or
+    rendered.
+    """
+
+    def __init__(self, tree: filetree.CompactTree, max_files_per_dir: int, sample_files: int):
+        self.max_files_per_dir = max_files_per_dir
+        self.sample_files = sample_files
+        root = _TreeNode("", 0)
+        for directory, filenames in tree.by_directory().items():
+            if directory:
+                root.pending.append((directory, filenames))
+            else:
+                root.files = filenames
+        self.levels: list[list[_TreeNode]] = [[root]]
+
+    @property
+    def root(self) -> _TreeNode:
+        return self.levels[0][0]
+
+    def level(self, depth: int) -> list[_TreeNode]:
+        """The directories at ``depth``, building the levels above it first if needed."""
+        while len(self.levels) <= depth and self.levels[-1]:
+            self.levels.append([child for node in self.levels[-1] for child in self._expand(node)])
+        return self.levels[depth] if depth < len(self.levels) else []
+
+    @staticmethod
+    def _expand(node: _TreeNode) -> list[_TreeNode]:
+        """Place the directories below ``node`` under its immediate subdirectories, and return those."""
+        start = len(node.path) + 1 if node.path else 0
+        for path, filenames in node.pending:
+            name, _, rest = path[start:].partition("/")
+            child = node.dirs.get(name)
+            if child is None:
+                child = node.dirs[name] = _TreeNode(path[:start + len(name)], node.depth + 1)
+            if rest:
+                child.pending.append((path, filenames))
+            else:
+                child.files = filenames
+        return list(node.dirs.values())
+
+    def expanded(self, node: _TreeNode) -> list[str]:
+        """The directory's own line and its files (sampled when crowded), without its subdirectories."""
+        if node.lines is None:
+            indent = "  " * max(node.depth - 1, 0)
+            child_indent = "  " * node.depth
+            lines = [f"{indent}{node.path}/"] if node.path else []
+            files = sorted(node.files)
+            if len(files) > self.max_files_per_dir:
+                shown = sorted(files, key=_sample_key)[:self.sample_files]
+                rest = _extensions(files)
+                rest.subtract(_extensions(shown))
+                lines.extend(f"{child_indent}{f}" for f in sorted(shown))
+                lines.append(f"{child_indent}... {len(files) - len(shown):,} more files ({_histogram(rest)})")
+            else:
+                lines.extend(f"{child_indent}{f}" for f in files)
+            node.lines = lines
+        return node.lines
+
+    def collapsed(self, node: _TreeNode) -> str:
+        """One line for the whole subtree: its file count and extension histogram."""
+        if node.summary is None:
+            files = [*node.files, *chain.from_iterable(filenames for _, filenames in node.pending)]
+            indent = "  " * max(node.depth - 1, 0)
+            node.summary = f"{indent}{node.path}/ ({len(files):,} files: {_histogram(_extensions(files))})"
+        return node.summary
+
+    def level_chars(self, depth: int, collapsed: bool, limit: int) -> int:
+        """Characters the directories at ``depth`` take up, expanded or collapsed; counting stops past ``limit``."""
+        used = 0
+        for node in self.level(depth):
+            used += len(self.collapsed(node)) + 1 if collapsed else _chars(self.expanded(node))
+            if used > limit:
+                break
+        return used
+
+    def render(self, max_depth: int) -> list[str]:
+        """Lines for the tree with directories deeper than ``max_depth`` collapsed."""
+        # Every directory shown expanded has its subdirectories placed
+        self.level(max_depth + 1)
+        lines: list[str] = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.depth > max_depth:
+                lines.append(self.collapsed(node))
+                continue
+            lines.extend(self.expanded(node))
+            stack.extend(child for _, child in sorted(node.dirs.items(), reverse=True))
+        return lines
+
+
+def format_directory_tree(
+    tree: filetree.CompactTree,
+    max_tokens: int = 10_000,
+    max_files_per_dir: int = 20,
+    sample_files: int = 5,
+    tokenizer: tokens.Tokenizer = tokens.APPROXIMATE,
+) -> str:
+    """Compact, indented rendering of the tree for the file-selection prompt.
+
+    Each directory appears once as its full path ending in "/", with its files
+    listed beneath it by name, so shared path prefixes are written once instead
+    of on every line. Directories with more than ``max_files_per_dir`` files
+    show a sample and an extension histogram of the rest. If the tree doesn't
+    fit in ``max_tokens``, directories below the deepest level that does fit are
+    collapsed into one summary line each, so every top-level area stays visible.
+
+    Each depth level is sized from its directories' lines, which are built
+    once, so finding the level to collapse below costs about one rendering
+    rather than one per level.
+    """
+    header = ["Directory structure:", ""]
+    if not tree:
+        return "\n".join(header)
+    layout = _TreeLayout(tree, max_files_per_dir, sample_files)
+    max_chars = max_tokens * tokens.MAX_CHARS_PER_TOKEN
+
+    def fits(lines: list[str]) -> bool:
+        # Renderings too long to possibly fit aren't worth tokenizing
+        return _chars(lines) <= max_chars and tokenizer.count("\n".join(lines)) <= max_tokens
+
+    # Characters with every level down to ``depth`` expanded; the top level is always shown
+    expanded = layout.level_chars(0, False, max_chars) + layout.level_chars(1, False, max_chars)
+    depth = 1
+    while layout.level(depth + 1):
+        deeper = expanded + layout.level_chars(depth + 1, False, max_chars)
+        if deeper + layout.level_chars(depth + 2, True, max_chars) > max_chars:
             break
-        lines.append(path)
-        used += len(path) + 1
-        included += 1
-    return "\n".join(lines)
+        expanded = deeper
+        depth += 1
+
+    # The character bound is loose for dense text, so step back until the tokens fit too
+    lines = layout.render(depth)
+    while depth > 1 and not fits(lines):
+        depth -= 1
+        lines = layout.render(depth)
+
+    # Even the top level alone is too big — fall back to cutting it off
+    if not fits(lines):
+        kept = tokenizer.truncate("\n".join(lines), max_tokens).count("\n")
+        lines = lines[:kept] + [f"... ({len(lines) - kept:,} more lines)"]
+    return "\n".join(header + lines)
 
 
-_CONSECUTIVE_BLANK_LINES = re.compile(r"\n{3,}")
 # HTML blocks with images (contributor grids, badge sections, avatar lists)
-_HTML_IMG_BLOCKS = re.compile(r"<a[^>]*>\s*<img[^>]*>\s*</a>", re.IGNORECASE)
+_HTML_IMG_BLOCKS = r"(?i:<a[^>]*>\s*<img[^>]*>\s*</a>)"
 # Markdown badge images: [![alt](badge-url)](link-url) or ![alt](badge-url)
-_MARKDOWN_BADGES = re.compile(r"!?\[!\[[^\]]*\]\([^)]*\)\]\([^)]*\)|!\[[^\]]*\]\(https?://img\.shields\.io[^)]*\)")
+_MARKDOWN_BADGES = r"!?\[!\[[^\]]*\]\([^)]*\)\]\([^)]*\)|!\[[^\]]*\]\(https?://img\.shields\.io[^)]*\)"
+# What the cleaner acts on: blocks to drop, and whitespace runs that end a line
+_CLEAN_TOKENS = re.compile(rf"(?P<drop>{_HTML_IMG_BLOCKS}|{_MARKDOWN_BADGES})|(?P<space>[^\S\n]*\n\s*)")
+_NEWLINE_RUNS = re.compile(r"\n+")
+
+
+def _normalize_space(run: str) -> str:
+    """A whitespace run between two pieces of text, with trailing whitespace stripped from each line
+    and 3+ consecutive newlines collapsed to 2."""
+    last = run.rfind("\n")
+    if last == -1:
+        return run
+    newlines = sum(min(len(r), 2) for r in _NEWLINE_RUNS.findall(run))
+    return "\n" * newlines + run[last + 1:]
+
+
+def clean_content(content: str, max_chars: int | None = None) -> str:
+    """Strip the license header, image blocks and badges, trailing whitespace and extra blank lines.
+
+    Works in one pass over the content, copying only the text it keeps.
+    With ``max_chars``, the result is cut to that many characters plus a
+    truncation marker, and the pass stops as soon as it's known to be too
+    long — a multi-MB file costs no more than its first ``max_chars`` of
+    output.
+    """
+    parts: list[str] = []
+    used = 0
+    # Whitespace isn't written until text follows it, so leading and trailing whitespace disappears
+    pending = ""
+    pos = _license_header_end(content)
+    for m in _CLEAN_TOKENS.finditer(content, pos):
+        pending, used = _emit(content[pos:m.start()], pending, parts, used)
+        if max_chars is not None and used > max_chars:
+            break
+        if m.lastgroup == "space":
+            pending += m.group()
+        pos = m.end()
+    else:
+        _emit(content[pos:], pending, parts, used)
+
+    result = "".join(parts)
+    if max_chars is not None and len(result) > max_chars:
+        return result[:max_chars] + "\n... (truncated)"
+    return result
+
+
+def _emit(text: str, pending: str, parts: list[str], used: int) -> tuple[str, int]:
+    """Append ``text`` (a stretch with no newlines) after the pending whitespace; returns the new pending and used."""
+    core = text.strip()
+    if not core:
+        return pending + text, used
+    start = len(text) - len(text.lstrip())
+    if parts:
+        space = _normalize_space(pending + text[:start])
+        parts.append(space)
+        used += len(space)
+    parts.append(core)
+    return text[start + len(core):], used + len(core)
+
+
+# Lines worth keeping from the part of a file an excerpt can't include whole
+_KEY_LINE = re.compile(
+    r"[ \t]*(?:export|import|from\s+\S+\s+import|def|async\s+def|class|interface|struct|enum|trait|impl|type|fn"
+    r"|pub|func|function|module|package|namespace)\b|#{1,3} "
+)
+_EXCERPT_TOKENS = (1_000, 400)  # cuts offered to the packer besides the whole (cleaned) file
+_NEAR_DUPLICATE = 0.9  # line-set similarity at which the later of two files is dropped
+_PACK_UNITS = 1_000  # knapsack resolution: the budget is split into this many units
+
+
+def _excerpt(content: str, max_tokens: int, tokenizer: tokens.Tokenizer) -> str:
+    """About ``max_tokens`` tokens of ``content``: its head, then its declaration and heading lines from further down."""
+    marker = "\n... (truncated)"
+    max_tokens -= tokenizer.count(marker)
+    head = tokenizer.truncate(content, max_tokens // 2)
+    head_end = head.rfind("\n")
+    if head_end <= 0:
+        head_end = len(head)
+    parts = [content[:head_end]]
+    used = tokenizer.count(parts[0])
+    for line in content[head_end + 1:].split("\n"):
+        if _KEY_LINE.match(line):
+            cost = tokenizer.count(line) + 1  # and its newline
+            if used + cost <= max_tokens:
+                parts.append(line)
+                used += cost
+    return "\n".join(parts) + marker
+
+
+def truncate(text: str, max_tokens: int, tokenizer: tokens.Tokenizer = tokens.APPROXIMATE) -> str:
+    """``text`` cut to ``max_tokens`` tokens, with a truncation marker if anything was cut."""
+    kept = tokenizer.truncate(text, max_tokens)
+    return text if len(kept) == len(text) else kept + "\n... (truncated)"
+
+
+def _importance(path: str, position: int) -> float:
+    """How much a file matters to the summary, from its path and its place in the selection order."""
+    if path.rpartition("/")[2].lower() in README_NAMES:
+        score = config.get_config().ranking.manifest_score
+    else:
+        score = ranking.score_path(path)
+    # Path scores run from about -60 to 100; shift them positive and let earlier picks count for more
+    return (max(score, 0.0) + 20.0) / (1.0 + position / 10.0)
+
+
+def _information(text: str) -> float:
+    # Compressed size estimates information content, so repetitive and generated text counts for little.
+    # The square root gives diminishing returns: a file's first chars are worth more than its last
+    return math.sqrt(len(zlib.compress(text.encode("utf-8"), 1)))
+
 
+def _dedupe(files: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    """Drop files whose content repeats (exactly, or nearly by line set) a file earlier in the list."""
+    seen: set[str] = set()
+    kept: list[tuple[str, str]] = []
+    kept_lines: list[set[str]] = []
+    for path, content in files:
+        normalized = " ".join(content.split())
+        if normalized in seen:
+            continue
+        lines = {stripped for line in content.split("\n") if (stripped := line.strip())}
+        if any(
+            min(len(lines), len(other)) >= _NEAR_DUPLICATE * max(len(lines), len(other))
+            and len(lines & other) >= _NEAR_DUPLICATE * len(lines | other)
+            for other in kept_lines
+        ):
+            continue
+        seen.add(normalized)
+        kept.append((path, content))
+        kept_lines.append(lines)
+    return kept
+
+
+def _knapsack(items: list[list[tuple[int, float]]], capacity: int) -> list[int | None]:
+    """Choose at most one (weight, value) option per item, maximizing total value within ``capacity``.
+
+    Weights are rounded up to ``capacity / _PACK_UNITS``, so the choice
+    never overflows. Returns the chosen option's index per item, or None.
+    """
+    unit = max(1, capacity // _PACK_UNITS)
+    slots = capacity // unit
+    best = [0.0] * (slots + 1)  # best[c]: top value using at most c units
+    choices: list[list[int]] = []
+    for options in items:
+        sized = [(i, -(-weight // unit), value) for i, (weight, value) in enumerate(options)]
+        new = best[:]
+        choice = [-1] * (slots + 1)
+        for c in range(slots + 1):
+            for i, w, value in sized:
+                if w <= c and best[c - w] + value > new[c]:
+                    new[c] = best[c - w] + value
+                    choice[c] = i
+        best = new
+        choices.append(choice)
 
-def clean_content(content: str) -> str:
-    content = strip_license_header(content)
-    # Remove HTML image/avatar blocks (contributor grids etc.)
-    content = _HTML_IMG_BLOCKS.sub("", content)
-    # Remove shield.io badges
-    content = _MARKDOWN_BADGES.sub("", content)
-    # Collapse 3+ consecutive blank lines into 1
-    content = _CONSECUTIVE_BLANK_LINES.sub("\n\n", content)
-    # Strip trailing whitespace from each line
-    lines = [line.rstrip() for line in content.split("\n")]
-    return "\n".join(lines).strip()
+    picked: list[int | None] = [None] * len(items)
+    c = slots
+    for n in range(len(items) - 1, -1, -1):
+        i = choices[n][c]
+        if i >= 0:
+            picked[n] = i
+            c -= -(-items[n][i][0] // unit)
+    return picked
 
 
 def build_context(
     file_contents: dict[str, str],
     budget: int,
     max_file_size: int,
+    skeleton_min_chars: int | None = None,
+    skeleton_extensions: Collection[str] | None = None,
+    tokenizer: tokens.Tokenizer = tokens.APPROXIMATE,
 ) -> str:
-    parts: list[str] = []
-    used = 0
+    """Pack cleaned files into ``budget`` tokens, choosing what to include by information value per token.
 
+    ``file_contents`` is in priority order. Each file is cleaned and cut to
+    ``max_file_size`` tokens (with ``skeleton_min_chars`` set, long source
+    files are outlined first — see skeleton.skeletonize), duplicates and
+    near-duplicates of earlier files are dropped, and each remaining file
+    may go in whole, as a shorter excerpt, or not at all. The choice
+    maximizes total value (importance times estimated information) as a
+    knapsack, so one long file can't crowd out several small high-value
+    ones. Files keep their priority order in the output.
+    """
+    files = []
     for path, content in file_contents.items():
-        content = clean_content(content)
-        if len(content) > max_file_size:
-            content = content[:max_file_size] + "\n... (truncated)"
-
-        file_block = f"--- {path} ---\n{content}"
-        if parts:
-            file_block = "\n\n" + file_block
-
-        if used + len(file_block) > budget:
-            continue
+        label = path
+        if skeleton_min_chars is not None and len(content) >= skeleton_min_chars:
+            outline = skeleton.skeletonize(path, content, skeleton_extensions)
+            if outline is not content:
+                content, label = outline, f"{path} (outline)"
+        cleaned = clean_content(content, max_file_size * tokens.MAX_CHARS_PER_TOKEN)
+        files.append((label, truncate(cleaned, max_file_size, tokenizer)))
+    files = _dedupe(files)
 
-        parts.append(file_block)
-        used += len(file_block)
+    blocks: list[list[str]] = []
+    options: list[list[tuple[int, float]]] = []
+    for position, (label, content) in enumerate(files):
+        importance = _importance(label.removesuffix(" (outline)"), position)
+        size = tokenizer.count(content)
+        texts = [content] + [_excerpt(content, cut, tokenizer) for cut in _EXCERPT_TOKENS if cut < size]
+        # Every block but the first is preceded by a blank line; counting it for all is the safe side
+        file_blocks = [f"\n\n--- {label} ---\n{text}" for text in texts]
+        blocks.append(file_blocks)
+        options.append([
+            (tokenizer.count(block), importance * _information(text)) for block, text in zip(file_blocks, texts)
+        ])
 
-    return "".join(parts)
+    picked = _knapsack(options, budget + tokenizer.count("\n\n"))
+    return "".join(blocks[n][i] for n, i in enumerate(picked) if i is not None)[2:]
@@ -1,101 +1,428 @@
+import asyncio
 import logging
 import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import aclosing
+from functools import lru_cache
 from typing import NamedTuple
 
 import httpx
 
-from repo_summarizer import config, context, github, llm, models
+from repo_summarizer import (
+    budget, cache, concurrency, config, context, filetree, github, llm, models, pathfilter, ranking, tokens,
+)
+
+
+# Receives (event, data) as pipeline stages finish; see summarize_repo
+ProgressCallback = Callable[[str, dict], None]
 
 
 class RepoData(NamedTuple):
-    filtered_tree: list[dict]
+    filtered_tree: filetree.CompactTree
     readme_content: str | None
     readme_path: str | None
 
 logger = logging.getLogger(__name__)
 
+# Tasks currently running the pipeline, so shutdown can wait for them
+_inflight: set[asyncio.Task] = set()
+
+# Concurrent requests for the same repo share one pipeline run, and its progress events
+_flights: concurrency.SingleFlight[models.SummaryResponse] = concurrency.SingleFlight()
+
+
+class _Progress:
+    """Fans the progress events of a shared run out to every caller awaiting it.
+
+    A caller that joins late is first sent the events it missed, so each one
+    sees the whole sequence: its token events add up to the full summary,
+    and its stage events arrive no later than the stage finished.
+    """
+
+    def __init__(self):
+        self._events: list[tuple[str, dict]] = []
+        self._listeners: list[ProgressCallback] = []
+
+    def __call__(self, event: str, data: dict) -> None:
+        self._events.append((event, data))
+        for listener in self._listeners:
+            listener(event, data)
+
+    def subscribe(self, listener: ProgressCallback) -> None:
+        for event, data in self._events:
+            listener(event, data)
+        self._listeners.append(listener)
 
-async def _fetch_tree_and_readme(
+    def unsubscribe(self, listener: ProgressCallback) -> None:
+        self._listeners.remove(listener)
+
+
+_progress: dict[tuple[str, str], _Progress] = {}
+
+
+async def _fetch_tree(
     client: httpx.AsyncClient,
     owner: str,
     repo: str,
     token: str | None,
-) -> RepoData:
+    known_sha: str | None = None,
+) -> github.RepoTree:
+    """The repo's filtered tree. A truncated tree whose root SHA is ``known_sha`` isn't expanded."""
+    cfg = config.get_config().context
     branch = await github.fetch_default_branch(client, owner, repo, token)
-    tree = await github.fetch_repo_tree(client, owner, repo, branch, token)
+    # Skipped directories and files are dropped while the tree streams in, and never expanded
+    rules = pathfilter.get_path_filter()
+    tree = await github.fetch_repo_tree(
+        client, owner, repo, branch, token,
+        cfg.tree_max_entries, cfg.tree_max_depth, cfg.tree_expand_concurrency,
+        context.entry_filter(rules), known_sha, keep_key=rules,
+    )
 
-    if not tree:
+    if not tree.total:
         raise github.GitHubError("Repository is empty", status_code=400)
 
-    filtered = context.filter_tree(tree, config.SKIP_DIRS, config.SKIP_EXTENSIONS, config.SKIP_FILENAMES)
-    logger.info(f"Tree: {len(tree)} entries, {len(filtered)} after filtering")
+    return tree
+
 
-    readme_path = next(
-        (e["path"] for e in filtered if e["path"].lower() in context.README_NAMES),
+async def _fetch_readme(
+    client: httpx.AsyncClient,
+    owner: str,
+    repo: str,
+    tree: github.RepoTree,
+    token: str | None,
+) -> RepoData:
+    # The skip rules were applied while the tree streamed in
+    filtered = tree.files
+    logger.info(f"Tree: {tree.total} entries, {len(filtered)} after filtering")
+
+    readme = next(
+        (i for i, name in enumerate(filtered.names) if filtered.depth(i) == 0 and name.lower() in context.README_NAMES),
         None,
     )
-    readme_content = (
-        await github.fetch_file_content(client, owner, repo, readme_path, token)
-        if readme_path else None
-    )
+    if readme is None:
+        return RepoData(filtered, None, None)
+
+    readme_path = filtered.path(readme)
+    readme_sha = filtered.sha(readme)
+    if readme_sha:
+        readme_content = await github.fetch_blob(
+            client, owner, repo, readme_sha, token, path=readme_path,
+            max_bytes=config.get_config().context.max_fetch_bytes, size=filtered.size(readme),
+        )
+    else:
+        readme_content = await github.fetch_file_content(client, owner, repo, readme_path, token)
 
     return RepoData(filtered, readme_content, readme_path)
 
 
-async def _select_files(
-    filtered: list[dict],
+async def _iter_selected_files(
+    filtered: filetree.CompactTree,
     root_readme_content: str | None,
     max_readme_for_selection: int,
-) -> list[str]:
-    dir_tree = context.format_directory_tree(filtered)
+    max_tree_for_selection: int,
+    requested_files: int,
+    selected_files: int,
+) -> AsyncIterator[str]:
+    """Yield valid selected paths as the LLM streams them, stopping once enough are found."""
+    tokenizer = tokens.get_tokenizer(config.get_config().llm.file_selection_model)
+    dir_tree = context.format_directory_tree(filtered, max_tree_for_selection, tokenizer=tokenizer)
     # Cap README for file selection — the LLM only needs the overview, not the full doc
     readme_for_selection = ""
     if root_readme_content:
-        readme_for_selection = root_readme_content[:max_readme_for_selection]
-        if len(root_readme_content) > max_readme_for_selection:
-            readme_for_selection += "\n... (truncated)"
+        readme_for_selection = context.truncate(root_readme_content, max_readme_for_selection, tokenizer)
 
-    logger.info(f"File selection input: dir_tree={len(dir_tree)} chars, readme={len(readme_for_selection)} chars")
+    logger.info(
+        f"File selection input: dir_tree={tokenizer.count(dir_tree)} tokens, "
+        f"readme={tokenizer.count(readme_for_selection)} tokens"
+    )
     t0 = time.monotonic()
-    selected_paths = await llm.select_files(dir_tree, readme_for_selection)
-    logger.info(f"File selection completed in {time.monotonic() - t0:.1f}s")
 
-    tree_paths = {entry["path"] for entry in filtered}
-    all_valid = [p for p in selected_paths if p in tree_paths]
-    valid_paths = all_valid[:15]
-    logger.info(f"LLM selected {len(selected_paths)} files, {len(all_valid)} valid (using top {len(valid_paths)}):")
-    for p in selected_paths:
-        status = "ok" if p in tree_paths else "INVALID"
-        logger.debug(f"  [{status}] {p}")
+    selected = 0
+    valid: set[str] = set()
+    min_valid = min(config.get_config().llm.selection_min_valid_paths, selected_files)
+    for fallback in (False, True):
+        if fallback:
+            # Too many hallucinated paths: ask a summary model, which names real paths more reliably
+            if len(valid) >= min_valid or selected == len(valid):
+                break
+            logger.warning(f"Only {len(valid)}/{selected} selected paths are valid, asking a summary model")
+        async with aclosing(
+            llm.iter_selected_files(dir_tree, readme_for_selection, requested_files, fallback)
+        ) as paths:
+            async for p in paths:
+                selected += 1
+                if p not in filtered or p in valid:
+                    logger.debug(f"  [INVALID] {p}")
+                    continue
+                logger.debug(f"  [ok] {p}")
+                valid.add(p)
+                yield p
+                # Closing the stream here also stops the LLM generating paths we'd discard
+                if len(valid) >= selected_files:
+                    break
+        if len(valid) >= selected_files:
+            break
 
-    return valid_paths
+    logger.info(
+        f"File selection completed in {time.monotonic() - t0:.1f}s: "
+        f"LLM selected {selected} files, using {len(valid)} valid"
+    )
 
 
-async def summarize_repo(github_url: str) -> models.SummaryResponse:
+def _fits_single_pass(filtered: filetree.CompactTree, cfg: config.ContextConfig) -> bool:
+    """Whether every filtered file can go straight into the summary context."""
+    if len(filtered) > cfg.single_pass_max_files:
+        return False
+    total = filtered.total_size()
+    # Without a size for every entry we can't tell, so take the normal path
+    return total is not None and total <= cfg.single_pass_max_bytes
+
+
+@lru_cache
+def _get_scheduler() -> concurrency.StageScheduler:
+    cfg = config.get_config().scheduler
+    return concurrency.StageScheduler({
+        "github": cfg.github_concurrency,
+        "selection": cfg.selection_concurrency,
+        "summary": cfg.summary_concurrency,
+    })
+
+
+async def _run_pipeline(
+    client: httpx.AsyncClient,
+    owner: str,
+    repo: str,
+    on_event: ProgressCallback,
+) -> models.SummaryResponse:
     cfg = config.get_config()
-    owner, repo = github.parse_github_url(github_url)
-    logger.info(f"Summarizing {owner}/{repo}")
+    scheduler = _get_scheduler()
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        repo_data = await _fetch_tree_and_readme(
-            client, owner, repo, cfg.github_token,
-        )
-        valid_paths = await _select_files(
-            repo_data.filtered_tree, repo_data.readme_content, cfg.context.max_readme_for_selection,
+    # Keyed per repo so a new tree SHA replaces the stale summary instead of sitting beside it
+    summary_cache = cache.get_summary_cache()
+    cache_key = (owner.lower(), repo.lower())
+
+    async with scheduler.stage("github"):
+        # Checked against the root SHA of the first listing, so a cached repo's truncated tree isn't expanded
+        cached = summary_cache.get(cache_key)
+        tree = await _fetch_tree(client, owner, repo, cfg.github_token, cached[0] if cached else None)
+        if cached and tree.sha and cached[0] == tree.sha:
+            logger.info(f"Summary cache hit for {owner}/{repo} @ {tree.sha[:12]}")
+            return cached[1]
+
+        repo_data = await _fetch_readme(
+            client, owner, repo, tree, cfg.github_token,
         )
+    on_event("tree_fetched", {"entries": tree.total, "filtered": len(repo_data.filtered_tree)})
+
+    blob_shas = repo_data.filtered_tree.shas()
+    sizes = repo_data.filtered_tree.file_sizes()
+    max_bytes = cfg.context.max_fetch_bytes
+
+    async def _fetch(paths: list[str]) -> dict[str, str]:
+        if not paths:
+            return {}
+        async with scheduler.stage("github"):
+            return await github.fetch_files(
+                client, owner, repo, paths, cfg.github_token, blob_shas, sizes, max_bytes,
+            )
+
+    single_pass = _fits_single_pass(repo_data.filtered_tree, cfg.context)
+    plan = budget.plan(repo_data.filtered_tree, cfg, single_pass)
+    logger.info(
+        f"Budget: {plan.selected_files} files ({plan.requested_files} requested), "
+        f"{plan.context_budget} tokens total, {plan.max_file_size} per file"
+    )
+    # Ranked once and reused for prefetching, the small-repo fast paths and the fallback
+    limit = len(repo_data.filtered_tree) if single_pass else max(plan.selected_files, cfg.context.prefetch_files)
+    ranked = [
+        p for p in ranking.rank_files(repo_data.filtered_tree, limit, cfg.ranking)
+        if p != repo_data.readme_path
+    ]
+
+    if single_pass:
+        # Everything fits in the context budget, so there is nothing to select
+        valid_paths = ranked
+        logger.info(f"Single-pass mode: fetching all {len(valid_paths)} files")
+        fetched = await _fetch(valid_paths)
+        prefetch_paths: list[str] = []
+        prefetch = None
+    elif len(repo_data.filtered_tree) <= cfg.ranking.heuristic_max_entries:
+        # Small enough that the heuristic picks what the LLM would — skip the selection call
+        valid_paths = ranked[:plan.selected_files]
+        logger.info(f"Heuristic selection: {len(valid_paths)} files from {len(repo_data.filtered_tree)} entries")
+        fetched = await _fetch(valid_paths)
+        prefetch_paths = []
+        prefetch = None
+    else:
+        # Speculatively fetch files the LLM almost always picks while it is still deciding
+        prefetch_paths = ranked[:cfg.context.prefetch_files]
+        prefetch = asyncio.ensure_future(_fetch(prefetch_paths))
+
+        # Selected paths stream straight into the fetcher, so fetching overlaps LLM generation
+        valid_paths = []
 
-        # Fetch selected files, reusing already-fetched README
-        paths_to_fetch = [p for p in valid_paths if p != repo_data.readme_path]
-        file_contents = await github.fetch_files(
-            client, owner, repo, paths_to_fetch, cfg.github_token,
+        async def _paths_to_fetch() -> AsyncIterator[str]:
+            selected = _iter_selected_files(
+                repo_data.filtered_tree, repo_data.readme_content,
+                cfg.context.max_readme_for_selection, cfg.context.max_tree_for_selection,
+                plan.requested_files, plan.selected_files,
+            )
+            try:
+                async for p in concurrency.iter_with_deadline(selected, cfg.ranking.selection_fallback_timeout):
+                    valid_paths.append(p)
+                    # README is already fetched; prefetched files are collected below
+                    if p != repo_data.readme_path and p not in prefetch_paths:
+                        yield p
+            except (llm.LLMError, asyncio.TimeoutError) as exc:
+                reason = str(exc) or "timed out"
+                logger.warning(f"File selection failed ({reason}), filling from heuristic ranking")
+                for p in ranked:
+                    if len(valid_paths) >= plan.selected_files:
+                        break
+                    if p not in valid_paths:
+                        valid_paths.append(p)
+                        if p not in prefetch_paths:
+                            yield p
+
+        try:
+            async with scheduler.stage("selection"), scheduler.stage("github"):
+                fetched = await github.fetch_files(
+                    client, owner, repo, _paths_to_fetch(), cfg.github_token, blob_shas, sizes, max_bytes,
+                )
+        except BaseException:
+            prefetch.cancel()
+            raise
+    on_event("files_selected", {"paths": valid_paths})
+
+    prefetched: dict[str, str] = {}
+    if prefetch is not None:
+        if any(p in prefetch_paths for p in valid_paths):
+            prefetched = await prefetch
+        else:
+            prefetch.cancel()
+        logger.info(
+            f"Prefetch: {sum(p in prefetched for p in valid_paths)}/{len(prefetch_paths)} prefetched files used"
         )
-        if repo_data.readme_content and repo_data.readme_path:
-            file_contents[repo_data.readme_path] = repo_data.readme_content
 
-    ctx = context.build_context(file_contents, cfg.context.context_budget, cfg.context.max_file_size)
-    logger.info(f"Built context: {len(ctx)} chars")
+    # Keep the selection's priority order — build_context fills the budget in this order
+    file_contents = {
+        p: prefetched[p] if p in prefetched else fetched[p]
+        for p in valid_paths
+        if p in prefetched or p in fetched
+    }
+    if repo_data.readme_content and repo_data.readme_path:
+        file_contents[repo_data.readme_path] = repo_data.readme_content
+    on_event("files_fetched", {"paths": list(file_contents)})
+
+    tokenizer = tokens.get_tokenizer(cfg.llm.model_name)
+    ctx = context.build_context(
+        file_contents, plan.context_budget, plan.max_file_size,
+        cfg.context.skeleton_min_chars, cfg.context.skeleton_extensions, tokenizer,
+    )
+    logger.info(f"Built context: {len(ctx)} chars, {tokenizer.count(ctx)} tokens")
 
     t0 = time.monotonic()
-    result = await llm.generate_summary(ctx)
+
+    def on_token(text: str, attempt: int) -> None:
+        on_event("token", {"text": text, "attempt": attempt})
+
+    async with scheduler.stage("summary"):
+        result = await llm.generate_summary(ctx, on_token)
     logger.info(f"Summary generated in {time.monotonic() - t0:.1f}s")
+
+    if tree.sha:
+        summary_cache.set(cache_key, (tree.sha, result))
     return result
+
+
+async def _summarize(
+    owner: str,
+    repo: str,
+    client: httpx.AsyncClient | None,
+    on_event: ProgressCallback,
+) -> models.SummaryResponse:
+    task = asyncio.current_task()
+    _inflight.add(task)
+    try:
+        if client is None:
+            async with github.create_client(config.get_config().http) as client:
+                return await _run_pipeline(client, owner, repo, on_event)
+        return await _run_pipeline(client, owner, repo, on_event)
+    finally:
+        _inflight.discard(task)
+
+
+async def summarize_repo(
+    github_url: str,
+    client: httpx.AsyncClient | None = None,
+    on_event: ProgressCallback | None = None,
+) -> models.SummaryResponse:
+    """Summarize a GitHub repository.
+
+    Pass the application's shared ``client`` to reuse pooled connections;
+    without one, a short-lived client is created for this call. Concurrent
+    calls for the same repo await a single pipeline run.
+
+    ``on_event`` is called as stages finish with ``tree_fetched``,
+    ``files_selected``, ``files_fetched`` and one ``token`` event per
+    streamed summary delta. When the call joins a run already under way,
+    the events so far are replayed to it first.
+    """
+    owner, repo = github.parse_github_url(github_url)
+    key = (owner.lower(), repo.lower())
+    if key in _flights:
+        logger.info(f"Joining in-flight summary for {owner}/{repo}")
+    else:
+        logger.info(f"Summarizing {owner}/{repo}")
+        _progress[key] = _Progress()
+    progress = _progress.setdefault(key, _Progress())
+
+    async def _run() -> models.SummaryResponse:
+        try:
+            return await _summarize(owner, repo, client, progress)
+        finally:
+            if _progress.get(key) is progress:
+                del _progress[key]
+
+    if on_event is None:
+        return await _flights.do(key, _run)
+    progress.subscribe(on_event)
+    try:
+        return await _flights.do(key, _run)
+    finally:
+        progress.unsubscribe(on_event)
+
+
+def describe_error(exc: Exception) -> tuple[int, str]:
+    """The HTTP status and client-facing message for a pipeline failure."""
+    if isinstance(exc, github.GitHubError):
+        return exc.status_code, exc.message
+    if isinstance(exc, llm.LLMError):
+        return 502, f"Failed to generate summary: {exc}"
+    return 500, "Internal server error"
+
+
+def summarize_batch(
+    github_urls: list[str],
+    client: httpx.AsyncClient | None = None,
+) -> AsyncIterator[tuple[str, models.SummaryResponse | Exception]]:
+    """Summarize many repositories, yielding ``(url, result or error)`` as each finishes.
+
+    At most ``batch_concurrency`` repos are in flight; within that, the
+    global stage limits decide how GitHub, selection and summary work
+    interleave across this batch and all other requests.
+    """
+    limit = config.get_config().scheduler.batch_concurrency
+    logger.info(f"Batch of {len(github_urls)} repos (up to {limit} in flight)")
+    return concurrency.bounded_as_completed(github_urls, lambda url: summarize_repo(url, client), limit)
+
+
+async def drain(timeout: float) -> None:
+    """Wait for in-flight summaries to finish, e.g. before closing the shared client."""
+    pending = {t for t in _inflight if not t.done() and t is not asyncio.current_task()}
+    if not pending:
+        return
+    logger.info(f"Waiting up to {timeout:.0f}s for {len(pending)} in-flight summaries")
+    _, still_pending = await asyncio.wait(pending, timeout=timeout)
+    if still_pending:
+        logger.warning(f"Shutting down with {len(still_pending)} summaries still running")
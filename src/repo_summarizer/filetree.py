@@ -0,0 +1,212 @@
+import sys
+from array import array
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from typing import TypeVar
+
+V = TypeVar("V")
+
+# A 20-byte git SHA-1 is split over three integer columns (8 + 8 + 4 bytes) so column passes stay in C
+_SHA_SPLITS = ((0, 8, "Q"), (8, 16, "Q"), (16, 20, "I"))
+
+
+class CompactTree:
+    """The blob entries of a repository tree, stored column-wise.
+
+    Directory paths are interned into a table, so each entry holds a
+    directory id, an interned file name, its depth, size and SHA in
+    parallel arrays — a fraction of the memory of one dict per entry.
+    Per-directory work (grouping) runs once per directory rather
+    than once per file, and whole-tree operations are C-level passes over
+    the columns. Full paths are only built on demand; the path-to-index
+    lookup behind ``in`` is built on first use.
+    """
+
+    __slots__ = ("_dirs", "_dir_ids", "_dir_depths", "_dir_col", "_names", "_depths", "_sizes", "_shas",
+                 "_odd_shas", "_index")
+
+    def __init__(self):
+        self._dirs: list[str] = [""]  # directory id -> path; "" is the root
+        self._dir_ids: dict[str, int] = {"": 0}
+        self._dir_depths: list[int] = [0]  # directory id -> depth of the files in it
+        self._dir_col = array("I")
+        self._names: list[str] = []
+        self._depths = array("H")
+        self._sizes = array("q")  # -1 when unknown
+        self._shas = tuple(array(typecode) for _, _, typecode in _SHA_SPLITS)  # all zero when unknown
+        self._odd_shas: dict[int, str] = {}  # SHAs that aren't 40 hex chars
+        self._index: dict[str, int] | None = None
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[dict]) -> "CompactTree":
+        """Build from GitHub tree entries, keeping only blobs."""
+        tree = cls()
+        for entry in entries:
+            if entry.get("type") == "blob":
+                tree.append(entry["path"], entry.get("sha"), entry.get("size"))
+        return tree
+
+    def _dir_id(self, directory: str) -> int:
+        dir_id = self._dir_ids.get(directory)
+        if dir_id is None:
+            dir_id = self._dir_ids[directory] = len(self._dirs)
+            self._dirs.append(sys.intern(directory))
+            self._dir_depths.append(directory.count("/") + 1 if directory else 0)
+        return dir_id
+
+    def append(self, path: str, sha: str | None = None, size: int | None = None) -> None:
+        directory, _, name = path.rpartition("/")
+        dir_id = self._dir_id(directory)
+        self._dir_col.append(dir_id)
+        self._names.append(sys.intern(name))
+        self._depths.append(self._dir_depths[dir_id])
+        self._sizes.append(size if size is not None else -1)
+        self._index = None
+        if sha and len(sha) == 40:
+            try:
+                raw = bytes.fromhex(sha)
+            except ValueError:
+                pass
+            else:
+                for column, (start, end, _) in zip(self._shas, _SHA_SPLITS):
+                    column.frombytes(raw[start:end])
+                return
+        for column in self._shas:
+            column.append(0)
+        if sha:
+            self._odd_shas[len(self._names) - 1] = sha
+
+    def extend(self, other: "CompactTree") -> None:
+        """Append all of ``other``'s entries."""
+        offset = len(self._names)
+        remap = {dir_id: self._dir_id(other._dirs[dir_id]) for dir_id in set(other._dir_col)}
+        self._dir_col.extend(array("I", map(remap.__getitem__, other._dir_col)))
+        self._names.extend(other._names)
+        self._depths.extend(other._depths)
+        self._sizes.extend(other._sizes)
+        for column, theirs in zip(self._shas, other._shas):
+            column.extend(theirs)
+        self._odd_shas.update((offset + i, sha) for i, sha in other._odd_shas.items())
+        self._index = None
+
+    def truncate(self, size: int) -> None:
+        """Drop every entry after the first ``size``."""
+        del self._dir_col[size:], self._names[size:], self._depths[size:], self._sizes[size:]
+        for column in self._shas:
+            del column[size:]
+        self._odd_shas = {i: sha for i, sha in self._odd_shas.items() if i < size}
+        self._index = None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def nbytes(self) -> int:
+        """Approximate memory held, for weighing the tree in caches.
+
+        Interned names are counted as one pointer per entry, so a tree of
+        mostly distinct names holds somewhat more.
+        """
+        columns = (self._dir_col, self._depths, self._sizes, *self._shas)
+        return (
+            sum(column.itemsize * len(column) for column in columns)
+            + 8 * len(self._names)
+            + sum(map(sys.getsizeof, self._dirs))
+            + sum(map(sys.getsizeof, self._odd_shas.values()))
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.paths())
+
+    def __contains__(self, path: object) -> bool:
+        return isinstance(path, str) and self.index(path) is not None
+
+    def index(self, path: str) -> int | None:
+        if self._index is None:
+            self._index = {p: i for i, p in enumerate(self.paths())}
+        return self._index.get(path)
+
+    def paths(self) -> list[str]:
+        dirs = map(self._dirs.__getitem__, self._dir_col)
+        return [f"{d}/{n}" if d else n for d, n in zip(dirs, self._names)]
+
+    def path(self, i: int) -> str:
+        directory = self._dirs[self._dir_col[i]]
+        return f"{directory}/{self._names[i]}" if directory else self._names[i]
+
+    def name(self, i: int) -> str:
+        return self._names[i]
+
+    def directory(self, i: int) -> str:
+        return self._dirs[self._dir_col[i]]
+
+    def depth(self, i: int) -> int:
+        return self._depths[i]
+
+    def size(self, i: int) -> int | None:
+        size = self._sizes[i]
+        return size if size >= 0 else None
+
+    def sha(self, i: int) -> str | None:
+        if i in self._odd_shas:
+            return self._odd_shas[i]
+        if not any(column[i] for column in self._shas):
+            return None
+        return b"".join(column[i:i + 1].tobytes() for column in self._shas).hex()
+
+    @property
+    def names(self) -> list[str]:
+        """File name of each entry, by index."""
+        return self._names
+
+    @property
+    def depths(self) -> array:
+        """Depth of each entry (slashes in its path), by index."""
+        return self._depths
+
+    @property
+    def sizes(self) -> array:
+        """Size of each entry by index, -1 when unknown."""
+        return self._sizes
+
+    def directories(self) -> list[str]:
+        """Directory path of each entry, by index."""
+        return list(map(self._dirs.__getitem__, self._dir_col))
+
+    def total_size(self) -> int | None:
+        """Combined size of all entries, or None if any size is unknown."""
+        if -1 in self._sizes:
+            return None
+        return sum(self._sizes)
+
+    def by_directory(self) -> dict[str, list[str]]:
+        """File names grouped by directory path, in tree order."""
+        groups: dict[int, list[str]] = {dir_id: [] for dir_id in self._dir_col}
+        for dir_id, name in zip(self._dir_col, self._names):
+            groups[dir_id].append(name)
+        return {self._dirs[dir_id]: names for dir_id, names in groups.items()}
+
+    def shas(self) -> Mapping[str, str]:
+        """Read-only path -> blob SHA view, for entries with a known SHA."""
+        return _ColumnView(self, self.sha)
+
+    def file_sizes(self) -> Mapping[str, int]:
+        """Read-only path -> size view, for entries with a known size."""
+        return _ColumnView(self, self.size)
+
+
+class _ColumnView(Mapping[str, V]):
+    def __init__(self, tree: CompactTree, column: Callable[[int], V | None]):
+        self._tree = tree
+        self._column = column
+
+    def __getitem__(self, path: str) -> V:
+        i = self._tree.index(path)
+        value = self._column(i) if i is not None else None
+        if value is None:
+            raise KeyError(path)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return (p for i, p in enumerate(self._tree.paths()) if self._column(i) is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
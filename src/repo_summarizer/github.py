@@ -1,10 +1,22 @@
 import asyncio
 import base64
+import codecs
+import hashlib
+import json
+import logging
 import re
+from collections.abc import AsyncIterable, Callable, Hashable, Iterable, Mapping
+from typing import Any, NamedTuple, TypeVar
 from urllib.parse import urlparse
 
 import httpx
 
+from repo_summarizer import cache, config, filetree
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
 
 class GitHubError(Exception):
     def __init__(self, message: str, status_code: int = 502):
@@ -13,6 +25,29 @@ class GitHubError(Exception):
         super().__init__(message)
 
 
+class RepoTree(NamedTuple):
+    sha: str | None
+    files: filetree.CompactTree
+    total: int  # entries in the repo, including any the filter dropped
+
+
+def create_client(cfg: config.HTTPConfig) -> httpx.AsyncClient:
+    """Build the pooled client used for all GitHub requests.
+
+    Meant to be long-lived: keep-alive and HTTP/2 multiplexing only pay off
+    when the same client is shared across summaries.
+    """
+    return httpx.AsyncClient(
+        http2=cfg.http2,
+        timeout=cfg.request_timeout,
+        limits=httpx.Limits(
+            max_connections=cfg.max_connections,
+            max_keepalive_connections=cfg.max_keepalive_connections,
+            keepalive_expiry=cfg.keepalive_expiry,
+        ),
+    )
+
+
 def parse_github_url(url: str) -> tuple[str, str]:
     url = url.strip().rstrip("/")
     if url.endswith(".git"):
@@ -33,19 +68,120 @@ def parse_github_url(url: str) -> tuple[str, str]:
     return owner, repo
 
 
-def _make_headers(token: str | None) -> dict[str, str]:
-    headers = {"Accept": "application/vnd.github.v3+json"}
+_JSON_MEDIA_TYPE = "application/vnd.github.v3+json"
+# File contents as raw bytes instead of base64 inside JSON
+_RAW_MEDIA_TYPE = "application/vnd.github.raw+json"
+
+
+def _make_headers(token: str | None, accept: str = _JSON_MEDIA_TYPE) -> dict[str, str]:
+    headers = {"Accept": accept}
     if token:
         headers["Authorization"] = f"Bearer {token}"
     return headers
 
 
-async def _get(client: httpx.AsyncClient, url: str, token: str | None, **kwargs) -> httpx.Response:
+def _validator_key(url: str, token: str | None, params: dict | None) -> tuple:
+    # Responses differ by credentials (private repos), so the token is part of the key
+    token_id = hashlib.sha256(token.encode()).hexdigest()[:16] if token else None
+    return url, tuple(sorted((params or {}).items())), token_id
+
+
+def _conditional_headers(
+    token: str | None,
+    cached: cache.ValidatedResponse | None,
+    accept: str = _JSON_MEDIA_TYPE,
+) -> dict[str, str]:
+    headers = _make_headers(token, accept)
+    if cached:
+        if cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+    return headers
+
+
+def _store_validated(key: tuple, resp: httpx.Response, content: Any, size: int) -> None:
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    if resp.status_code == 200 and (etag or last_modified):
+        cache.get_validator_store().set(
+            key, cache.ValidatedResponse(etag, last_modified, resp.headers.get("Content-Type"), content, size),
+        )
+
+
+async def _get(
+    client: httpx.AsyncClient,
+    url: str,
+    token: str | None,
+    revalidate: bool = True,
+    accept: str = _JSON_MEDIA_TYPE,
+    **kwargs,
+) -> httpx.Response:
+    """GET from the GitHub API, revalidating previously seen responses.
+
+    Successful responses carrying an ETag or Last-Modified are stored, and
+    later requests send If-None-Match / If-Modified-Since. A 304 (which
+    GitHub doesn't count against the rate limit) is turned back into a 200
+    with the stored body, so callers never see the difference.
+    """
+    key = _validator_key(url, token, kwargs.get("params")) if revalidate else None
+    cached = cache.get_validator_store().get(key) if key else None
+    headers = _conditional_headers(token, cached, accept)
+
     try:
-        return await client.get(url, headers=_make_headers(token), **kwargs)
+        resp = await client.get(url, headers=headers, **kwargs)
     except httpx.HTTPError as exc:
         raise GitHubError(f"Failed to connect to GitHub: {exc}") from exc
 
+    if cached and resp.status_code == 304:
+        content_headers = {"Content-Type": cached.content_type} if cached.content_type else {}
+        return httpx.Response(200, content=cached.content, headers=content_headers, request=resp.request)
+
+    if key:
+        _store_validated(key, resp, resp.content, len(resp.content))
+    return resp
+
+
+async def _get_streamed(
+    client: httpx.AsyncClient,
+    url: str,
+    token: str | None,
+    consume: Callable[[bytes], None],
+    parsed: Callable[[], tuple[T, int]],
+    revalidate: bool = True,
+    variant: Hashable = None,
+    **kwargs,
+) -> tuple[httpx.Response, T | None]:
+    """Like _get, but hands a successful body to ``consume`` chunk by chunk.
+
+    The body is never held in full. Once it has been consumed, ``parsed``
+    returns the result and its approximate size in bytes, and that result is
+    what gets stored for revalidation; a 304 returns the stored result
+    without calling ``consume``. ``variant`` tells apart different parses of
+    the same response. The returned response has no body, and the result is
+    None unless the status is 200.
+    """
+    key = (*_validator_key(url, token, kwargs.get("params")), variant) if revalidate else None
+    cached = cache.get_validator_store().get(key) if key else None
+    headers = _conditional_headers(token, cached)
+
+    try:
+        async with client.stream("GET", url, headers=headers, **kwargs) as resp:
+            if cached and resp.status_code == 304:
+                return httpx.Response(200, request=resp.request), cached.content
+            if resp.status_code != 200:
+                await resp.aread()
+                return resp, None
+            async for chunk in resp.aiter_bytes():
+                consume(chunk)
+    except httpx.HTTPError as exc:
+        raise GitHubError(f"Failed to connect to GitHub: {exc}") from exc
+
+    result, size = parsed()
+    if key:
+        _store_validated(key, resp, result, size)
+    return resp, result
+
 
 def _handle_error(resp: httpx.Response, context: str) -> None:
     if resp.status_code == 404:
@@ -70,17 +206,290 @@ async def fetch_default_branch(
     return branch
 
 
+# Tree entry fields the pipeline uses; mode and url are dropped as entries are parsed
+_TREE_FIELDS = ("path", "type", "sha", "size")
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class TreeParser:
+    """Incremental parser for a git trees API response body.
+
+    Fed the body chunk by chunk, it returns each entry of the ``tree`` array
+    as soon as the entry is complete, keeping only ``_TREE_FIELDS``, and
+    records the top-level ``sha`` and ``truncated``. Only the unparsed tail of
+    the body is held, so memory stays flat however large the tree is.
+    """
+
+    def __init__(self):
+        self.sha: str | None = None
+        self.truncated = False
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._state = "start"
+        self._key = ""
+
+    def feed(self, chunk: bytes) -> list[dict]:
+        self._buf += self._decoder.decode(chunk)
+        entries: list[dict] = []
+        pos = self._parse(entries)
+        self._buf = self._buf[pos:]
+        return entries
+
+    def close(self) -> None:
+        self._buf += self._decoder.decode(b"", final=True)
+        if self._state != "done":
+            raise ValueError("Incomplete or malformed tree response")
+
+    def _parse(self, entries: list[dict]) -> int:
+        """Consume as much of the buffer as possible; return where parsing stopped."""
+        buf = self._buf
+        pos = 0
+        while True:
+            pos = _JSON_WHITESPACE.match(buf, pos).end()
+            if pos >= len(buf) or self._state == "done":
+                return pos
+            char = buf[pos]
+
+            if self._state == "start":
+                if char != "{":
+                    raise ValueError("Tree response is not a JSON object")
+                self._state = "key"
+                pos += 1
+            elif self._state == "key":
+                if char == ",":
+                    pos += 1
+                    continue
+                if char == "}":
+                    self._state = "done"
+                    continue
+                # Incomplete tokens raise JSONDecodeError; wait for more data and retry from here
+                try:
+                    key, end = json.decoder.scanstring(buf, pos + 1)
+                except json.JSONDecodeError:
+                    return pos
+                colon = _JSON_WHITESPACE.match(buf, end).end()
+                if colon >= len(buf):
+                    return pos
+                if buf[colon] != ":":
+                    raise ValueError("Malformed tree response")
+                self._key = key
+                self._state = "array" if key == "tree" else "value"
+                pos = colon + 1
+            elif self._state == "value":
+                try:
+                    value, end = self._json.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    return pos
+                # A number or literal at the very end of the buffer may continue in the next chunk
+                if end >= len(buf):
+                    return pos
+                if self._key == "sha":
+                    self.sha = value
+                elif self._key == "truncated":
+                    self.truncated = bool(value)
+                self._state = "key"
+                pos = end
+            elif self._state == "array":
+                if char != "[":
+                    raise ValueError("Malformed tree response")
+                self._state = "entries"
+                pos += 1
+            else:
+                if char == ",":
+                    pos += 1
+                    continue
+                if char == "]":
+                    self._state = "key"
+                    pos += 1
+                    continue
+                try:
+                    entry, end = self._json.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    return pos
+                entries.append({f: entry[f] for f in _TREE_FIELDS if f in entry})
+                pos = end
+
+
+# Rough bytes held per queued subtree, besides its path: the tuple and a 40-char SHA
+_SUBTREE_OVERHEAD = 150
+
+
+class _TreeListing(NamedTuple):
+    sha: str | None
+    truncated: bool
+    files: filetree.CompactTree  # blobs that passed the filter
+    subtrees: list[tuple[str, str]]  # (path, sha) of directories that passed the filter
+    total: int  # entries in the response
+
+
+async def _fetch_tree_listing(
+    client: httpx.AsyncClient,
+    owner: str,
+    repo: str,
+    ref: str,
+    token: str | None,
+    recursive: bool,
+    prefix: str = "",
+    keep: Callable[[dict], bool] | None = None,
+    keep_key: Hashable = None,
+) -> _TreeListing:
+    """Stream one trees API response, keeping the entries ``keep`` accepts.
+
+    Entry paths are prefixed with ``prefix`` (a subtree's own path) before
+    filtering, so filters always see full repository paths. The filtered
+    listing is what's stored for revalidation, so a tree of any size is
+    answered from the store on a 304. ``keep_key`` identifies the filter;
+    without one, a ``keep`` listing isn't stored.
+    """
+    parser = TreeParser()
+    files = filetree.CompactTree()
+    subtrees: list[tuple[str, str]] = []
+    total = 0
+
+    def _consume(chunk: bytes) -> None:
+        nonlocal total
+        for entry in parser.feed(chunk):
+            total += 1
+            if prefix:
+                entry["path"] = f"{prefix}/{entry['path']}"
+            if keep is not None and not keep(entry):
+                continue
+            if entry.get("type") == "blob":
+                files.append(entry["path"], entry.get("sha"), entry.get("size"))
+            elif entry.get("type") == "tree":
+                subtrees.append((entry["path"], entry["sha"]))
+
+    def _parsed() -> tuple[_TreeListing, int]:
+        parser.close()
+        size = files.nbytes() + sum(len(path) + _SUBTREE_OVERHEAD for path, _ in subtrees)
+        return _TreeListing(parser.sha, parser.truncated, files, subtrees, total), size
+
+    params = {"recursive": "1"} if recursive else {}
+    url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{ref}"
+    try:
+        resp, listing = await _get_streamed(
+            client, url, token, _consume, _parsed,
+            revalidate=keep is None or keep_key is not None, variant=(prefix, keep_key), params=params,
+        )
+        _handle_error(resp, "Repository tree")
+        if listing is None:
+            raise ValueError(f"unexpected status {resp.status_code}")
+    except ValueError as exc:
+        raise GitHubError(f"Failed to parse repository tree: {exc}", status_code=502) from exc
+    # Callers extend and truncate the files, so the stored listing is never handed out itself
+    replayed = filetree.CompactTree()
+    replayed.extend(listing.files)
+    return listing._replace(files=replayed, subtrees=list(listing.subtrees))
+
+
+async def _expand_truncated_tree(
+    client: httpx.AsyncClient,
+    owner: str,
+    repo: str,
+    root_sha: str,
+    token: str | None,
+    max_entries: int,
+    max_depth: int,
+    concurrency: int,
+    keep: Callable[[dict], bool] | None,
+    keep_key: Hashable = None,
+) -> tuple[filetree.CompactTree, int]:
+    """Rebuild a tree GitHub truncated by walking it breadth-first.
+
+    Each subtree is first requested recursively, which usually fits under
+    GitHub's limit and costs one request. Subtrees that are truncated again
+    are listed one level deep and their directories queued for the next
+    level. Expansion stops below ``max_depth`` or once ``max_entries`` files
+    are collected: files are counted as each listing arrives, no new
+    request starts once the budget is spent, and the result is cut to
+    ``max_entries``, so deep levels are dropped first. Directories ``keep``
+    rejects are never expanded.
+
+    Returns the kept files and the number of entries seen.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    files = filetree.CompactTree()
+    total = 0
+
+    async def _list(prefix: str, sha: str, recursive: bool) -> list[tuple[str, str]]:
+        """Add the subtree's files, and return the directories still to expand."""
+        nonlocal total
+        async with semaphore:
+            # Checked once a slot frees up, so queued subtrees are skipped when the budget is spent
+            if len(files) >= max_entries:
+                return []
+            listing = await _fetch_tree_listing(client, owner, repo, sha, token, recursive, prefix, keep, keep_key)
+            if recursive and listing.truncated:
+                listing = await _fetch_tree_listing(client, owner, repo, sha, token, False, prefix, keep, keep_key)
+                recursive = False
+            files.extend(listing.files)
+            total += listing.total
+        # A complete recursive listing leaves nothing below it
+        return [] if recursive else listing.subtrees
+
+    level = [("", root_sha)]
+    depth = 0
+    while level and depth < max_depth and len(files) < max_entries:
+        # The root is known to be truncated, so it's listed one level deep straight away
+        results = await asyncio.gather(*[_list(prefix, sha, recursive=depth > 0) for prefix, sha in level])
+        level = [subtree for subtrees in results for subtree in subtrees]
+        depth += 1
+
+    if level or len(files) >= max_entries:
+        logger.warning(f"Tree for {owner}/{repo} stopped at depth {depth} with {min(len(files), max_entries)} files")
+    files.truncate(max_entries)
+    return files, total
+
+
 async def fetch_repo_tree(
     client: httpx.AsyncClient,
     owner: str,
     repo: str,
     branch: str,
     token: str | None = None,
-) -> list[dict]:
-    resp = await _get(client, f"https://api.github.com/repos/{owner}/{repo}/git/trees/{branch}", token, params={"recursive": "1"})
-    _handle_error(resp, "Repository tree")
-    data = resp.json()
-    return data.get("tree", [])
+    max_entries: int = 300_000,
+    max_depth: int = 12,
+    concurrency: int = 8,
+    keep: Callable[[dict], bool] | None = None,
+    known_sha: str | None = None,
+    keep_key: Hashable = None,
+) -> RepoTree:
+    """The branch's full recursive tree.
+
+    The response is parsed as it streams in, and only the blobs ``keep``
+    accepts are retained, in a CompactTree — a huge tree never sits in
+    memory as decoded JSON. GitHub truncates recursive listings of very
+    large trees; those are rebuilt subtree by subtree, within
+    ``max_entries`` and ``max_depth`` — unless the root SHA is
+    ``known_sha`` (the caller already has what it needs for this tree), in
+    which case the truncated first listing is returned as it is.
+
+    Listings are revalidated with their ETags, and a 304 replays the stored
+    listing. ``keep_key`` identifies the filter for that; listings filtered
+    by a ``keep`` without one are fetched in full every time.
+    """
+    listing = await _fetch_tree_listing(
+        client, owner, repo, branch, token, recursive=True, keep=keep, keep_key=keep_key,
+    )
+    if not listing.truncated or not listing.sha or listing.sha == known_sha:
+        return RepoTree(listing.sha, listing.files, listing.total)
+
+    logger.info(f"Tree for {owner}/{repo} is truncated at {listing.total} entries, expanding subtrees")
+    files, total = await _expand_truncated_tree(
+        client, owner, repo, listing.sha, token, max_entries, max_depth, concurrency, keep, keep_key,
+    )
+    return RepoTree(listing.sha, files, total)
+
+
+def _decode_content(data: dict, label: str) -> str:
+    if data.get("encoding") != "base64" or "content" not in data:
+        raise GitHubError(f"Unexpected content format for '{label}'", status_code=502)
+
+    try:
+        return base64.b64decode(data["content"]).decode("utf-8", errors="replace")
+    except Exception as exc:
+        raise GitHubError(f"Failed to decode '{label}': {exc}", status_code=502)
 
 
 async def fetch_file_content(
@@ -92,33 +501,148 @@ async def fetch_file_content(
 ) -> str:
     resp = await _get(client, f"https://api.github.com/repos/{owner}/{repo}/contents/{path}", token)
     _handle_error(resp, f"File '{path}'")
-    data = resp.json()
+    return _decode_content(resp.json(), path)
 
-    if data.get("encoding") != "base64" or "content" not in data:
-        raise GitHubError(f"Unexpected content format for '{path}'", status_code=502)
 
+def _decode_head(body: bytes, truncated: bool) -> str:
+    # A body cut mid-character just loses the incomplete tail
+    content = codecs.getincrementaldecoder("utf-8")(errors="replace").decode(body, final=not truncated)
+    return content + "\n... (truncated)" if truncated else content
+
+
+async def _get_head(
+    client: httpx.AsyncClient,
+    url: str,
+    token: str | None,
+    max_bytes: int,
+    label: str,
+) -> tuple[bytes, bool]:
+    """The first ``max_bytes`` of a raw file body, and whether the file is longer.
+
+    Asks for just that range; if GitHub answers with the whole body anyway,
+    the download is cut off once enough has arrived.
+    """
+    headers = _make_headers(token, _RAW_MEDIA_TYPE)
+    headers["Range"] = f"bytes=0-{max_bytes - 1}"
+    chunks: list[bytes] = []
+    size = 0
     try:
-        return base64.b64decode(data["content"]).decode("utf-8", errors="replace")
-    except Exception as exc:
-        raise GitHubError(f"Failed to decode '{path}': {exc}", status_code=502)
+        async with client.stream("GET", url, headers=headers) as resp:
+            if resp.status_code not in (200, 206):
+                await resp.aread()
+                _handle_error(resp, f"File '{label}'")
+            async for chunk in resp.aiter_bytes():
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > max_bytes:
+                    break
+    except httpx.HTTPError as exc:
+        raise GitHubError(f"Failed to connect to GitHub: {exc}") from exc
+
+    truncated = size > max_bytes
+    if resp.status_code == 206:
+        # Content-Range: bytes 0-<last>/<total>
+        total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+        truncated = total.isdigit() and int(total) > max_bytes
+    return b"".join(chunks)[:max_bytes], truncated
+
+
+async def fetch_blob(
+    client: httpx.AsyncClient,
+    owner: str,
+    repo: str,
+    sha: str,
+    token: str | None = None,
+    path: str | None = None,
+    max_bytes: int | None = None,
+    size: int | None = None,
+) -> str:
+    """A file's content by blob SHA.
+
+    With ``max_bytes``, files larger than that (or of unknown ``size``) are
+    fetched with a Range request for just their first ``max_bytes``; a cut
+    file ends with a truncation marker. Content is requested raw either
+    way, skipping the base64 JSON envelope.
+    """
+    limited = max_bytes is not None and (size is None or size > max_bytes)
+    blob_cache = cache.get_blob_cache()
+    content = blob_cache.get(sha)
+    if content is None and limited:
+        content = blob_cache.get(_head_key(sha, max_bytes))
+    if content is not None:
+        return content
+
+    label = path or sha
+    url = f"https://api.github.com/repos/{owner}/{repo}/git/blobs/{sha}"
+    if limited:
+        body, truncated = await _get_head(client, url, token, max_bytes, label)
+        content = _decode_head(body, truncated)
+        # A cut file isn't the blob, so it's only cached under a key that records the cut
+        blob_cache.set(_head_key(sha, max_bytes) if truncated else sha, content)
+        return content
+
+    # Blobs are immutable and already cached by SHA, so there is nothing to revalidate
+    resp = await _get(client, url, token, revalidate=False, accept=_RAW_MEDIA_TYPE)
+    _handle_error(resp, f"File '{label}'")
+    if resp.headers.get("Content-Type", "").startswith("application/json"):
+        content = _decode_content(resp.json(), label)
+    else:
+        content = resp.content.decode("utf-8", errors="replace")
+    blob_cache.set(sha, content)
+    return content
+
+
+def _head_key(sha: str, max_bytes: int) -> str:
+    return f"{sha}:{max_bytes}"
 
 
 async def fetch_files(
     client: httpx.AsyncClient,
     owner: str,
     repo: str,
-    paths: list[str],
+    paths: Iterable[str] | AsyncIterable[str],
     token: str | None = None,
+    blob_shas: Mapping[str, str] | None = None,
+    sizes: Mapping[str, int] | None = None,
+    max_bytes: int | None = None,
 ) -> dict[str, str]:
+    """Fetch files concurrently, skipping any that fail.
+
+    ``paths`` may be an async iterable (e.g. paths streamed from the
+    selection LLM); each fetch then starts as soon as its path arrives.
+    Files with a known blob SHA download at most ``max_bytes`` (see fetch_blob).
+    """
     semaphore = asyncio.Semaphore(10)
+    blob_shas = {} if blob_shas is None else blob_shas
+    sizes = {} if sizes is None else sizes
 
     async def _fetch_one(path: str) -> tuple[str, str | None]:
+        sha = blob_shas.get(path)
+        # Cache hits never touch the network, so don't make them wait for a slot
+        if sha and (content := cache.get_blob_cache().get(sha)) is not None:
+            return path, content
         async with semaphore:
             try:
-                content = await fetch_file_content(client, owner, repo, path, token)
+                if sha:
+                    content = await fetch_blob(
+                        client, owner, repo, sha, token, path=path, max_bytes=max_bytes, size=sizes.get(path),
+                    )
+                else:
+                    content = await fetch_file_content(client, owner, repo, path, token)
                 return path, content
             except GitHubError:
                 return path, None
 
-    results = await asyncio.gather(*[_fetch_one(p) for p in paths])
+    if isinstance(paths, AsyncIterable):
+        tasks: list[asyncio.Task] = []
+        try:
+            async for path in paths:
+                tasks.append(asyncio.ensure_future(_fetch_one(path)))
+        except BaseException:
+            for t in tasks:
+                t.cancel()
+            raise
+        results = await asyncio.gather(*tasks)
+    else:
+        results = await asyncio.gather(*[_fetch_one(p) for p in paths])
     return {path: content for path, content in results if content is not None}
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+import uuid
+
+import httpx
+
+from repo_summarizer import cache, config, core, github, llm, models
+
+logger = logging.getLogger(__name__)
+
+# Pipeline events that close a stage, mapped to the stage they close
+_STAGE_EVENTS = {
+    "tree_fetched": "tree",
+    "files_selected": "selection",
+    "files_fetched": "fetch",
+}
+
+
+class JobError(Exception):
+    def __init__(self, message: str, status_code: int):
+        self.message = message
+        self.status_code = status_code
+        super().__init__(message)
+
+
+class JobManager:
+    """Runs summaries in the background on a bounded worker pool.
+
+    Submitted jobs wait in a bounded queue; when it is full, ``submit``
+    fails fast instead of letting work pile up. Queued and running jobs are
+    tracked until they finish, then move to an LRU/TTL store so finished
+    results can be polled without growing memory without bound.
+    """
+
+    def __init__(self, cfg: config.JobsConfig, client: httpx.AsyncClient | None = None):
+        self.cfg = cfg
+        self.client = client
+        self._active: dict[str, models.JobStatus] = {}
+        self._finished: cache.LRUCache[models.JobStatus] = cache.LRUCache(cfg.job_result_store_size, cfg.job_result_ttl)
+        self._queue: asyncio.Queue[models.JobStatus] | None = None
+        self._workers: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(self.cfg.job_queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.cfg.job_workers)]
+        logger.info(f"Started {len(self._workers)} job workers")
+
+    async def stop(self) -> None:
+        """Stop taking new work. Running jobs keep going until ``core.drain``."""
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        dropped = self._queue.qsize() if self._queue else 0
+        if dropped:
+            logger.warning(f"Dropping {dropped} queued jobs on shutdown")
+        self._queue = None
+
+    def submit(self, github_url: str) -> models.JobStatus:
+        if self._queue is None:
+            raise JobError("Job workers are not running", status_code=503)
+        # Reject bad URLs now rather than after the job has waited in the queue
+        github.parse_github_url(github_url)
+        job = models.JobStatus(
+            job_id=uuid.uuid4().hex,
+            github_url=github_url,
+            status="queued",
+            created_at=time.time(),
+        )
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobError("Job queue is full, try again later", status_code=503)
+        self._active[job.job_id] = job
+        return job
+
+    def get(self, job_id: str) -> models.JobStatus:
+        job = self._active.get(job_id) or self._finished.get(job_id)
+        if job is None:
+            raise JobError(f"Job '{job_id}' not found (or expired)", status_code=404)
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            # Shielded so stopping the pool lets the running job finish and record its result
+            await asyncio.shield(asyncio.ensure_future(self._run(job)))
+
+    async def _run(self, job: models.JobStatus) -> None:
+        job.status = "running"
+        job.started_at = time.time()
+        stage_start = time.monotonic()
+
+        def on_event(event: str, data: dict) -> None:
+            nonlocal stage_start
+            if event in _STAGE_EVENTS:
+                now = time.monotonic()
+                job.stage_timings[_STAGE_EVENTS[event]] = round(now - stage_start, 3)
+                stage_start = now
+
+        try:
+            job.result = await core.summarize_repo(job.github_url, self.client, on_event=on_event)
+            job.stage_timings["summary"] = round(time.monotonic() - stage_start, 3)
+            job.status = "succeeded"
+        except Exception as exc:
+            if not isinstance(exc, (github.GitHubError, llm.LLMError)):
+                logger.exception(f"Unhandled error in job {job.job_id}")
+            job.error_status_code, job.error = core.describe_error(exc)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            self._active.pop(job.job_id, None)
+            self._finished.set(job.job_id, job)
+        logger.info(f"Job {job.job_id} {job.status} in {job.finished_at - job.started_at:.1f}s")
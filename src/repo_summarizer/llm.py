@@ -1,10 +1,14 @@
+import asyncio
 import json
 import logging
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from contextlib import aclosing
 from functools import lru_cache
 
 from openai import AsyncOpenAI
 
-from repo_summarizer import config, models, prompts
+from repo_summarizer import concurrency, config, models, prompts, router
 
 logger = logging.getLogger(__name__)
 
@@ -19,53 +23,243 @@ class LLMError(Exception):
 
 @lru_cache
 def _get_client(api_key: str, base_url: str) -> AsyncOpenAI:
-    return AsyncOpenAI(api_key=api_key, base_url=base_url)
+    # No client-side retries: a failed call is retried on whichever route the router picks next
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
 
 
-async def select_files(
+@lru_cache
+def _get_hedge_policy(call: str) -> concurrency.HedgePolicy | None:
+    """Hedging state for one kind of call ("selection" or "summary"), or None with hedging off."""
+    cfg = config.get_config().hedge
+    if not cfg.hedge_requests:
+        return None
+    # Selection is abandoned for the heuristic ranking after selection_fallback_timeout, so its hedge has to come sooner
+    initial_delay = cfg.hedge_initial_delay if call == router.SUMMARY else cfg.hedge_selection_initial_delay
+    return concurrency.HedgePolicy(
+        cfg.hedge_percentile, initial_delay, cfg.hedge_min_delay, cfg.hedge_budget_ratio, cfg.hedge_burst,
+    )
+
+
+async def _iter_deltas(route: router.Route, **kwargs) -> AsyncIterator[str]:
+    """The text deltas of a streamed chat completion on ``route``, with its outcome reported to the router."""
+    routes = router.get_router()
+    client = _get_client(route.api_key, route.base_url)
+    started = time.monotonic()
+    timed = False
+    try:
+        stream = await client.chat.completions.create(model=route.model, stream=True, **kwargs)
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if not timed:
+                        routes.success(route, time.monotonic() - started)
+                        timed = True
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+    except Exception:
+        routes.failure(route)
+        raise
+    except BaseException:
+        if timed:
+            # Closed or cancelled once streaming, which says nothing new about the route
+            routes.abandon(route)
+        else:
+            # Timed out, or lost a hedge, with no first token yet: the route is stalling
+            routes.stalled(route, time.monotonic() - started)
+        raise
+    if not timed:
+        routes.success(route, time.monotonic() - started)
+
+
+def _opener(call: str, **kwargs) -> Callable[[], AsyncGenerator[str, None]]:
+    """Stream opener for concurrency.hedged: the first stream goes to the best route, a hedge to the next.
+
+    Each route is claimed as its stream is opened rather than on the
+    stream's first read, so a half-open route's single trial can't also be
+    handed to calls that arrive in between. A route another call has
+    claimed the trial of is passed over while any other route is left.
+    """
+    routes = router.get_router()
+    candidates = routes.candidates(call)
+    if not candidates:
+        raise LLMError(f"No LLM backend configured for {call}")
+    opened = 0
+
+    def open_stream() -> AsyncGenerator[str, None]:
+        nonlocal opened
+        order = [candidates[(opened + i) % len(candidates)] for i in range(len(candidates))]
+        route = next((r for r in order if routes.begin(r)), order[0])
+        opened += 1
+        logger.debug(f"LLM {call} call #{opened}: {route.model} on {route.backend}")
+        return _iter_deltas(route, **kwargs)
+
+    return open_stream
+
+
+class FilesArrayParser:
+    """Incrementally extracts the string elements of a top-level ``"files"`` array.
+
+    Fed the JSON text chunk by chunk, it returns each path as soon as its
+    closing quote arrives, without waiting for the document to complete.
+    Anything outside ``{"files": [...]}`` (other keys, nested values) is
+    tracked only far enough to be skipped.
+    """
+
+    def __init__(self):
+        # One frame per open container: [kind, expecting_key, key]
+        self._stack: list[list] = []
+        self._in_string = False
+        self._escape = False
+        self._chars: list[str] = []
+
+    def feed(self, text: str) -> list[str]:
+        found: list[str] = []
+        for ch in text:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._close_string(found)
+                    continue
+                self._chars.append(ch)
+            elif ch == '"':
+                self._in_string = True
+                self._chars = []
+            elif ch in "{[":
+                parent = self._stack[-1] if self._stack else None
+                key = parent[2] if parent and parent[0] == "{" and len(self._stack) == 1 else None
+                self._stack.append([ch, ch == "{", key if ch == "[" else None])
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+            elif ch == "," and self._stack and self._stack[-1][0] == "{":
+                self._stack[-1][1] = True
+                self._stack[-1][2] = None
+        return found
+
+    def _close_string(self, found: list[str]) -> None:
+        if not self._stack:
+            return
+        frame = self._stack[-1]
+        if frame[0] == "{" and frame[1]:
+            frame[1] = False
+            frame[2] = self._decode()
+        elif frame[0] == "[" and frame[2] == "files" and len(self._stack) == 2:
+            found.append(self._decode())
+
+    def _decode(self) -> str:
+        raw = "".join(self._chars)
+        if "\\" not in raw:
+            return raw
+        try:
+            return json.loads(f'"{raw}"')
+        except json.JSONDecodeError:
+            return raw
+
+
+async def iter_selected_files(
     directory_tree: str,
     readme_content: str,
     max_files: int = 25,
-) -> list[str]:
-    cfg = config.get_config()
-    client = _get_client(cfg.llm.nebius_api_key, cfg.llm.nebius_base_url)
+    fallback: bool = False,
+) -> AsyncIterator[str]:
+    """Stream the file-selection call, yielding each path as soon as the LLM has written it.
 
+    With ``fallback``, the call goes to the summary models instead — slower,
+    but better at naming paths that exist. Callers may stop iterating
+    early; the underlying stream is closed, which ends generation on the
+    server side too.
+    """
+    call = router.SELECTION_FALLBACK if fallback else router.SELECTION
     system_prompt = prompts.FILE_SELECTION_SYSTEM_PROMPT.format(max_files=max_files)
     user_prompt = prompts.build_file_selection_prompt(directory_tree, readme_content)
+    request = _opener(
+        call,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        response_format={"type": "json_object"},
+        temperature=0.0,
+        timeout=FILE_SELECTION_TIMEOUT,
+    )
+
+    parser = FilesArrayParser()
+    parts: list[str] = []
+    yielded = 0
+    # The client timeout applies per read when streaming, so enforce the overall one here
+    deadline = time.monotonic() + FILE_SELECTION_TIMEOUT
     try:
-        response = await client.chat.completions.create(
-            model=cfg.llm.file_selection_model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.0,
-            timeout=FILE_SELECTION_TIMEOUT,
-        )
+        async with aclosing(concurrency.hedged(request, _get_hedge_policy(call))) as deltas:
+            async for delta in deltas:
+                if time.monotonic() > deadline:
+                    raise LLMError(f"LLM file selection timed out after {FILE_SELECTION_TIMEOUT:.0f}s")
+                parts.append(delta)
+                for path in parser.feed(delta):
+                    if yielded < max_files:
+                        yielded += 1
+                        yield path
+    except LLMError:
+        raise
     except Exception as exc:
         raise LLMError(f"LLM file selection request failed: {exc}") from exc
 
-    text = response.choices[0].message.content
+    # Paths were already streamed; the full text is only checked to report malformed output
+    text = "".join(parts)
     if not text:
         raise LLMError("LLM returned empty response for file selection")
-
     try:
         data = json.loads(text)
     except json.JSONDecodeError as exc:
+        if yielded:
+            logger.warning(f"File selection output was not valid JSON after {yielded} paths: {exc}")
+            return
         raise LLMError(f"LLM returned invalid JSON for file selection: {exc}") from exc
-
-    files = data.get("files", [])
-    if not isinstance(files, list):
+    if not isinstance(data.get("files", []), list):
         raise LLMError("LLM did not return a 'files' list")
 
-    return [f for f in files if isinstance(f, str)][:max_files]
+
+async def select_files(
+    directory_tree: str,
+    readme_content: str,
+    max_files: int = 25,
+    fallback: bool = False,
+) -> list[str]:
+    return [path async for path in iter_selected_files(directory_tree, readme_content, max_files, fallback)]
+
+
+async def _stream_text(on_delta: Callable[[str], None], **kwargs) -> str:
+    """Run a streamed, routed (and possibly hedged) summary completion, reporting each text delta as it arrives."""
+    parts: list[str] = []
+    request = _opener(router.SUMMARY, **kwargs)
+    async with aclosing(concurrency.hedged(request, _get_hedge_policy(router.SUMMARY))) as deltas:
+        async for delta in deltas:
+            parts.append(delta)
+            on_delta(delta)
+    return "".join(parts)
 
 
-async def generate_summary(context: str) -> models.SummaryResponse:
-    cfg = config.get_config()
-    client = _get_client(cfg.llm.nebius_api_key, cfg.llm.nebius_base_url)
+def _ignore_delta(delta: str) -> None:
+    pass
+
+
+async def generate_summary(
+    context: str,
+    on_token: Callable[[str, int], None] | None = None,
+) -> models.SummaryResponse:
+    """Generate the structured summary, retrying once on failure or invalid output.
 
+    Each attempt goes to the best summary route (see router.Router), and is
+    streamed and hedged with a duplicate request on the next-best route
+    when its first token is late (see concurrency.hedged). With ``on_token``,
+    each text delta of the winning stream is passed to it together with the
+    attempt number, so consumers can discard partial output from an attempt
+    that gets retried.
+    """
     messages = [
         {"role": "system", "content": prompts.SUMMARY_SYSTEM_PROMPT},
         {"role": "user", "content": prompts.build_summary_prompt(context)},
@@ -73,20 +267,22 @@ async def generate_summary(context: str) -> models.SummaryResponse:
 
     last_exc: Exception | None = None
     for attempt in range(1, MAX_RETRIES + 1):
+        request = dict(
+            messages=messages,
+            response_format={"type": "json_object"},
+            temperature=0.2,
+            timeout=SUMMARY_TIMEOUT,
+        )
+        on_delta = (lambda delta, n=attempt: on_token(delta, n)) if on_token else _ignore_delta
         try:
-            response = await client.chat.completions.create(
-                model=cfg.llm.model_name,
-                messages=messages,
-                response_format={"type": "json_object"},
-                temperature=0.2,
-                timeout=SUMMARY_TIMEOUT,
-            )
+            # Always streamed, so a late first token can be hedged. The client timeout is per read
+            # when streaming, so bound the whole stream here
+            text = await asyncio.wait_for(_stream_text(on_delta, **request), SUMMARY_TIMEOUT)
         except Exception as exc:
             last_exc = exc
             logger.warning(f"LLM summary attempt {attempt}/{MAX_RETRIES} failed: {exc}")
             continue
 
-        text = response.choices[0].message.content
         if not text:
             last_exc = LLMError("LLM returned empty response")
             logger.warning(f"LLM summary attempt {attempt}/{MAX_RETRIES}: empty response")
@@ -1,6 +1,6 @@
 from typing import Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class SummarizeRequest(BaseModel):
@@ -13,6 +13,31 @@ class SummaryResponse(BaseModel):
     structure: str
 
 
+class BatchSummarizeRequest(BaseModel):
+    github_urls: list[str] = Field(min_length=1, max_length=1000)
+
+
+class BatchItemResult(BaseModel):
+    github_url: str
+    status: Literal["ok", "error"]
+    result: SummaryResponse | None = None
+    status_code: int | None = None
+    message: str | None = None
+
+
+class JobStatus(BaseModel):
+    job_id: str
+    github_url: str
+    status: Literal["queued", "running", "succeeded", "failed"]
+    created_at: float
+    started_at: float | None = None
+    finished_at: float | None = None
+    stage_timings: dict[str, float] = {}  # seconds per stage: tree, selection, fetch, summary
+    result: SummaryResponse | None = None
+    error: str | None = None
+    error_status_code: int | None = None
+
+
 class ErrorResponse(BaseModel):
     status: Literal["error"] = "error"
     message: str
@@ -0,0 +1,154 @@
+import re
+from collections.abc import Iterable
+from functools import lru_cache
+
+from repo_summarizer import config
+
+
+def _alternation(items: Iterable[str], flags: str = "") -> str:
+    # Longest first, so no alternative is shadowed by a prefix of it
+    body = "|".join(map(re.escape, sorted(items, key=len, reverse=True)))
+    return f"(?{flags}:{body})" if flags else f"(?:{body})"
+
+
+def _glob_body(glob: str) -> str:
+    """Regex for a gitignore-style glob: ``*`` and ``?`` stay within one path component, ``**`` crosses them."""
+    out = []
+    i, n = 0, len(glob)
+    while i < n:
+        c = glob[i]
+        if glob.startswith("**/", i) and (i == 0 or glob[i - 1] == "/"):
+            out.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("**", i) and (i == 0 or glob[i - 1] == "/") and i + 2 == n:
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            while i + 1 < n and glob[i + 1] == "*":
+                i += 1
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[" and (end := glob.find("]", i + 2)) != -1:
+            body = glob[i + 1:end]
+            if body[0] in "!^":
+                body = "^" + body[1:]
+            out.append(f"(?![/])[{body.replace(chr(92), chr(92) * 2)}]")
+            i = end + 1
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(glob[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+class PathFilter:
+    """The skip rules compiled into regular expressions, built once and reused for every path.
+
+    Rules are the skipped directory names, extensions and file names, plus
+    gitignore-style glob ``patterns``. As in ``.gitignore``, a pattern
+    without a slash matches a file or directory name at any depth, a pattern
+    containing one is anchored at the repository root, a trailing slash
+    restricts it to directories, and ``**`` spans directories. Negation
+    (``!``) isn't supported.
+
+    ``keep`` classifies a full path with a single regex search. The same
+    rules are also split into directory (``keep_dir``), file name
+    (``keep_name``) and root-anchored full-path (``keep_anchored``) checks,
+    so callers can decide each distinct directory and name once and reuse
+    the verdict.
+    """
+
+    def __init__(
+        self,
+        skip_dirs: Iterable[str],
+        skip_extensions: Iterable[str],
+        skip_filenames: Iterable[str],
+        patterns: Iterable[str] = (),
+    ):
+        # Each rule in up to three forms: on a full path, on a directory path, on a bare file name
+        path_rules, dir_rules, name_rules, anchored_rules = [], [], [], []
+
+        skip_dirs, skip_extensions, skip_filenames = set(skip_dirs), set(skip_extensions), set(skip_filenames)
+        if skip_dirs:
+            dirs = _alternation(skip_dirs)
+            path_rules.append(f"(?:^|/){dirs}/")
+            dir_rules.append(f"(?:^|/){dirs}(?:/|\\Z)")
+        if skip_extensions:
+            # Same as PurePosixPath.suffix: the last dot, not leading the name, with something after it
+            extensions = _alternation((e.lstrip(".") for e in skip_extensions), "i")
+            path_rules.append(f"[^/]\\.{extensions}\\Z")
+            name_rules.append(f"[^/]\\.{extensions}\\Z")
+        if skip_filenames:
+            names = _alternation(skip_filenames)
+            path_rules.append(f"(?:^|/){names}\\Z")
+            name_rules.append(f"^{names}\\Z")
+
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith("#"):
+                continue
+            if pattern.startswith("!"):
+                raise ValueError(f"Negated skip patterns are not supported: {pattern!r}")
+            dir_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            if "/" in pattern:
+                body = _glob_body(pattern.lstrip("/"))
+                path_rules.append(f"^{body}/" if dir_only else f"^{body}(?:/|\\Z)")
+                dir_rules.append(f"^{body}(?:/|\\Z)")
+                if not dir_only:
+                    anchored_rules.append(f"^{body}\\Z")
+            else:
+                body = _glob_body(pattern)
+                path_rules.append(f"(?:^|/){body}/" if dir_only else f"(?:^|/){body}(?:/|\\Z)")
+                dir_rules.append(f"(?:^|/){body}(?:/|\\Z)")
+                if not dir_only:
+                    name_rules.append(f"^{body}\\Z")
+
+        self._path = _compile(path_rules)
+        self._dir = _compile(dir_rules)
+        self._name = _compile(name_rules)
+        self._anchored = _compile(anchored_rules) if anchored_rules else None
+
+    def keep(self, path: str) -> bool:
+        """Whether a file path survives every rule."""
+        return self._path.search(path) is None
+
+    def keep_dir(self, directory: str) -> bool:
+        """Whether files under ``directory`` can survive, i.e. neither it nor any parent is skipped."""
+        return self._dir.search(directory) is None
+
+    def keep_name(self, name: str) -> bool:
+        """Whether a file name survives the rules that look only at names: extensions, file names and
+        patterns without a slash."""
+        return self._name.search(name) is None
+
+    @property
+    def has_anchored(self) -> bool:
+        """Whether any file rule needs the full path, i.e. a root-anchored pattern that isn't directory-only."""
+        return self._anchored is not None
+
+    def keep_anchored(self, path: str) -> bool:
+        """Whether a file path survives the root-anchored patterns. A file survives every rule exactly
+        when its directory passes ``keep_dir``, its name ``keep_name`` and its path this."""
+        return self._anchored is None or self._anchored.search(path) is None
+
+
+def _compile(rules: list[str]) -> re.Pattern:
+    # An empty rule list compiles to a pattern that never matches
+    return re.compile("|".join(rules) or "(?!)")
+
+
+@lru_cache
+def get_path_filter() -> PathFilter:
+    """The configured skip rules: the built-in lists plus ``SKIP_PATTERNS`` from the environment."""
+    return PathFilter(
+        config.SKIP_DIRS,
+        config.SKIP_EXTENSIONS,
+        config.SKIP_FILENAMES,
+        [*config.SKIP_PATTERNS, *config.get_config().context.skip_patterns],
+    )
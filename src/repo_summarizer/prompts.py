@@ -3,11 +3,18 @@ You are a senior software engineer. Given a GitHub repository's directory tree \
 and README, select the files most useful for understanding the project's \
 purpose, technologies, and structure.
 
+The directory tree is indented. Each directory line is that directory's full \
+path ending in "/", and the files listed under it are given by name only. A \
+file's path is its directory's path followed by its name, e.g. the file \
+"main.py" under "src/app/" is "src/app/main.py". Files at the top of the tree \
+are at the repository root. Lines in parentheses or starting with "..." \
+summarize files that are not listed individually.
+
 Respond with a JSON object containing exactly one field:
-- "files": A list of file paths (strings) copied exactly from the directory tree.
+- "files": A list of full file paths (strings) built from the directory tree.
 
-IMPORTANT: Only use paths that appear EXACTLY in the directory tree above. \
-Do NOT guess or invent file names. Copy the paths character-for-character.
+IMPORTANT: Only use files that are listed by name in the directory tree. \
+Do NOT guess or invent file names. Copy names and directory paths character-for-character.
 
 Select up to {max_files} files. Prioritize:
 1. Configuration/manifest files (pyproject.toml, package.json, Dockerfile, etc.)
@@ -30,7 +37,9 @@ Only output valid JSON. No markdown fences, no extra text.\
 
 SUMMARY_SYSTEM_PROMPT = """\
 You are a senior software engineer. Given the contents of a GitHub repository \
-(directory tree and selected file contents), produce a structured summary.
+(directory tree and selected file contents), produce a structured summary. \
+Files marked "(outline)" are large source files cut down to their imports, \
+declarations and docstrings, with bodies replaced by "...".
 
 Respond with a JSON object containing exactly these fields:
 - "summary": A concise 2-4 sentence description of what the project does, \
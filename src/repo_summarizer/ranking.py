@@ -0,0 +1,128 @@
+import heapq
+import math
+from collections import Counter
+from itertools import compress, repeat
+from operator import eq
+
+from repo_summarizer import config, filetree
+
+
+def score_path(
+    path: str,
+    size: int | None = None,
+    siblings: int = 1,
+    policy: config.RankingConfig | None = None,
+) -> float:
+    """Usefulness score for one file: higher is more worth reading for a summary.
+
+    ``siblings`` is the number of files in the same directory — files in
+    crowded directories are individually less representative.
+    """
+    policy = policy or config.get_config().ranking
+    directory, _, filename = path.rpartition("/")
+    depth = path.count("/")
+
+    if filename in config.MANIFEST_FILENAMES:
+        score = policy.manifest_score
+    elif filename.split(".", 1)[0].lower() in config.ENTRY_POINT_STEMS:
+        score = policy.entry_point_score
+    else:
+        score = policy.base_score
+
+    score -= policy.depth_penalty * depth
+    if siblings > 1:
+        score -= policy.fanout_penalty * math.log2(siblings)
+    if _is_low_value(directory, filename):
+        score -= policy.low_value_penalty
+    if size is not None and not policy.min_useful_bytes <= size <= policy.max_useful_bytes:
+        score -= policy.size_penalty
+    return score
+
+
+def _is_low_value(directory: str, filename: str) -> bool:
+    if any(part in config.LOW_VALUE_DIRS for part in directory.split("/")):
+        return True
+    return _is_doc(filename)
+
+
+def _is_doc(filename: str) -> bool:
+    # Manifests such as requirements.txt and CMakeLists.txt share a doc extension but aren't docs
+    return filename not in config.MANIFEST_FILENAMES and filename.rpartition(".")[2].lower() in config.DOC_EXTENSIONS
+
+
+def rank_files(
+    tree: filetree.CompactTree,
+    limit: int,
+    policy: config.RankingConfig | None = None,
+) -> list[str]:
+    """The ``limit`` highest-scoring paths, best first; ties go to the shallower, then alphabetical path.
+
+    Scores only fall with depth, so entries are scored one depth level at a
+    time, starting at the root, and deeper levels are skipped once even the
+    best possible file there can't beat the current top ``limit``. Levels are
+    picked out of the tree's depth column with C-level iterators, so a huge
+    tree costs a few passes at C speed plus full scoring of only its shallow
+    levels.
+    """
+    if limit <= 0 or not tree:
+        return []
+    policy = policy or config.get_config().ranking
+
+    depths = tree.depths
+    best_possible = max(policy.manifest_score, policy.entry_point_score, policy.base_score)
+
+    keys: list[tuple[float, int, str]] = []
+    for depth in sorted(set(depths)):
+        if len(keys) >= limit and policy.depth_penalty > 0:
+            kth_score = -heapq.nsmallest(limit, keys)[-1][0]
+            if best_possible - policy.depth_penalty * depth <= kth_score:
+                break
+        level = list(compress(range(len(tree)), map(eq, depths, repeat(depth))))
+        keys.extend(_score_level(tree, level, depth, policy))
+
+    return [path for _, _, path in heapq.nsmallest(limit, keys)]
+
+
+def _score_level(
+    tree: filetree.CompactTree,
+    level: list[int],
+    depth: int,
+    policy: config.RankingConfig,
+) -> list[tuple[float, int, str]]:
+    """Sort keys for entries that all sit at the same ``depth`` — the inlined equivalent of score_path."""
+    lo, hi = policy.min_useful_bytes, policy.max_useful_bytes
+
+    # A directory's files all share its depth, so fan-out can be counted within the level
+    directories = list(map(tree.directory, level))
+    names = list(map(tree.names.__getitem__, level))
+    sizes = list(map(tree.sizes.__getitem__, level))
+    fanout = Counter(directories)
+    penalty = {
+        d: policy.depth_penalty * depth + (policy.fanout_penalty * math.log2(n) if n > 1 else 0)
+        for d, n in fanout.items()
+    }
+    low_value = {d: any(part in config.LOW_VALUE_DIRS for part in d.split("/")) for d in fanout}
+    # File names repeat heavily across directories, so their part of the score is worked out once per name
+    name_score = {n: _name_score(n, policy) for n in set(names)}
+
+    keys = []
+    for directory, filename, size in zip(directories, names, sizes):
+        score, is_doc = name_score[filename]
+        score -= penalty[directory]
+        if low_value[directory] or is_doc:
+            score -= policy.low_value_penalty
+        if size >= 0 and not lo <= size <= hi:
+            score -= policy.size_penalty
+        keys.append((-score, depth, f"{directory}/{filename}" if directory else filename))
+    return keys
+
+
+def _name_score(filename: str, policy: config.RankingConfig) -> tuple[float, bool]:
+    """The base score a file name earns, and whether it looks like documentation."""
+    if filename in config.MANIFEST_FILENAMES:
+        score = policy.manifest_score
+    elif filename.split(".", 1)[0].lower() in config.ENTRY_POINT_STEMS:
+        score = policy.entry_point_score
+    else:
+        score = policy.base_score
+    return score, _is_doc(filename)
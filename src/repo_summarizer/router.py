@@ -0,0 +1,203 @@
+import logging
+import math
+import time
+from collections import deque
+from collections.abc import Callable
+from functools import lru_cache
+from typing import NamedTuple
+
+from repo_summarizer import config
+
+logger = logging.getLogger(__name__)
+
+# Call kinds a route can serve. "selection_fallback" re-runs file selection on the summary models
+SELECTION = "selection"
+SELECTION_FALLBACK = "selection_fallback"
+SUMMARY = "summary"
+
+_LATENCY_SMOOTHING = 0.3  # weight of the newest sample in a route's latency average
+_ERROR_WEIGHT = 4.0  # a route with error rate r ranks as if (1 + 4r) times slower
+
+
+class Route(NamedTuple):
+    backend: str
+    base_url: str
+    api_key: str
+    model: str
+
+
+class RouteStats:
+    """Rolling health of one route: smoothed latency, recent error rate and circuit state.
+
+    The circuit opens after ``failure_threshold`` consecutive failures.
+    While open the route is skipped; after ``reset_seconds`` it is half
+    open and gets one trial call, which closes the circuit on success and
+    reopens it on failure. The trial belongs to whichever call claims it
+    first with ``begin``; a claim whose call never reports back lapses
+    after another ``reset_seconds``, so it can't hold the route for good.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float, window: int, clock: Callable[[], float]):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self.latency: float | None = None
+        self.consecutive_failures = 0
+        self.opened_at: float | None = None
+        self._trial_started: float | None = None
+
+    @property
+    def error_rate(self) -> float:
+        return self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0
+
+    def _trial_running(self) -> bool:
+        return self._trial_started is not None and self._clock() - self._trial_started < self.reset_seconds
+
+    def available(self) -> bool:
+        if self.opened_at is None:
+            return True
+        return not self._trial_running() and self._clock() - self.opened_at >= self.reset_seconds
+
+    def score(self) -> float:
+        """Expected latency, inflated by the error rate. A route that hasn't been timed yet scores 0,
+        unless it has only ever failed."""
+        if self.latency is None:
+            return math.inf if self._outcomes else 0.0
+        return self.latency * (1 + _ERROR_WEIGHT * self.error_rate)
+
+    def begin(self) -> bool:
+        """Claim the route for a call; False if its circuit is open and another call holds the trial."""
+        if self.opened_at is None:
+            return True
+        if self._trial_running():
+            return False
+        self._trial_started = self._clock()
+        return True
+
+    def _observe(self, latency: float) -> None:
+        self.latency = latency if self.latency is None else (
+            _LATENCY_SMOOTHING * latency + (1 - _LATENCY_SMOOTHING) * self.latency
+        )
+
+    def success(self, latency: float) -> None:
+        self._outcomes.append(True)
+        self._observe(latency)
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_started = None
+
+    def stalled(self, elapsed: float) -> None:
+        """The call was given up (timed out, or lost a hedge) after ``elapsed`` seconds without a first token.
+
+        Counts as a failure, and ``elapsed`` — a lower bound on the route's
+        latency — goes into the latency average.
+        """
+        self._observe(elapsed)
+        self.failure()
+
+    def abandon(self) -> None:
+        """The call was cancelled after its first token, so its outcome is already recorded."""
+        self._trial_started = None
+
+    def failure(self) -> None:
+        self._outcomes.append(False)
+        self.consecutive_failures += 1
+        if self._trial_started is not None or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = self._clock()
+        self._trial_started = None
+
+
+class Router:
+    """Picks the route for each LLM call from a pool of backends and models.
+
+    Routes are ranked by expected latency (time to first token) weighted by
+    recent error rate. Routes that haven't been timed yet rank first, so
+    each one gets measured, and ties keep the configured order. Routes with
+    an open circuit are left out, unless that would leave none.
+    """
+
+    def __init__(
+        self,
+        routes: dict[str, list[Route]],
+        failure_threshold: int = 3,
+        reset_seconds: float = 30.0,
+        window: int = 50,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.routes = routes
+        self._stats = {
+            route: RouteStats(failure_threshold, reset_seconds, window, clock)
+            for candidates in routes.values()
+            for route in candidates
+        }
+
+    def stats(self, route: Route) -> RouteStats:
+        return self._stats[route]
+
+    def candidates(self, call: str) -> list[Route]:
+        """Routes for ``call``, best first, without those whose circuit is open.
+
+        When every circuit is open, the route whose circuit opened longest
+        ago is returned on its own. With a single backend, failing every
+        call until the circuit resets would be a certain outage, while the
+        backend may already have recovered.
+        """
+        routes = self.routes.get(call, [])
+        available = [r for r in routes if self._stats[r].available()]
+        if not available and routes:
+            oldest = min(routes, key=lambda r: self._stats[r].opened_at)
+            logger.info(f"Every {call} circuit is open, falling back to {oldest.model} on {oldest.backend}")
+            return [oldest]
+        return sorted(available, key=lambda r: self._stats[r].score())
+
+    def begin(self, route: Route) -> bool:
+        return self._stats[route].begin()
+
+    def success(self, route: Route, latency: float) -> None:
+        self._stats[route].success(latency)
+
+    def abandon(self, route: Route) -> None:
+        self._stats[route].abandon()
+
+    def stalled(self, route: Route, elapsed: float) -> None:
+        self._failed(route, lambda stats: stats.stalled(elapsed))
+
+    def failure(self, route: Route) -> None:
+        self._failed(route, RouteStats.failure)
+
+    def _failed(self, route: Route, record: Callable[[RouteStats], None]) -> None:
+        stats = self._stats[route]
+        was_open = stats.opened_at is not None
+        record(stats)
+        if stats.opened_at is not None and not was_open:
+            logger.warning(
+                f"Circuit opened for {route.model} on {route.backend} after {stats.consecutive_failures} failures"
+            )
+
+
+def routes_from_config(cfg: config.LLMConfig) -> dict[str, list[Route]]:
+    """Routes per call kind from ``LLM_BACKENDS``, or Nebius with the configured models when that's empty."""
+    backends = cfg.llm_backends or [
+        config.LLMBackend(
+            name="nebius",
+            base_url=cfg.nebius_base_url,
+            selection_models=[cfg.file_selection_model],
+            summary_models=[cfg.model_name],
+        )
+    ]
+    routes: dict[str, list[Route]] = {SELECTION: [], SUMMARY: []}
+    for backend in backends:
+        api_key = backend.api_key or cfg.nebius_api_key
+        routes[SELECTION] += [Route(backend.name, backend.base_url, api_key, m) for m in backend.selection_models]
+        routes[SUMMARY] += [Route(backend.name, backend.base_url, api_key, m) for m in backend.summary_models]
+    routes[SELECTION_FALLBACK] = routes[SUMMARY]
+    return routes
+
+
+@lru_cache
+def get_router() -> Router:
+    cfg = config.get_config().llm
+    return Router(
+        routes_from_config(cfg), cfg.circuit_failure_threshold, cfg.circuit_reset_seconds, cfg.route_stats_window,
+    )
@@ -0,0 +1,182 @@
+import ast
+import re
+from collections.abc import Callable, Collection
+from functools import partial
+
+# Placeholder for dropped bodies
+ELLIPSIS = "..."
+
+# Brace-language blocks whose members are kept; any other block (functions, control flow) is dropped
+_CONTAINER_BLOCK = re.compile(
+    r"\b(?:class|interface|struct|enum|trait|impl|namespace|extension|protocol|record|union)\b"
+    r"|\b(?:module|mod|object)\s+[\w\"']|\bcompanion\s+object\b|\btype\s+\w+(?:<[^>]*>)?\s*=|\bextern\s+\"C\""
+)
+# Tokens that can hide braces, plus braces and newlines. Comments and strings are matched whole so
+# braces inside them are skipped; single quotes are char literals only, so Rust lifetimes don't open strings
+_C_TOKENS = r"//[^\n]*|/\*.*?\*/|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])'|[{}\n]"
+_BRACE_TOKENS = re.compile(_C_TOKENS, re.DOTALL)
+# A regex literal: a "/" where an expression starts (after an operator, an opening bracket or "return"),
+# up to its closing "/" — skipping escapes and character classes, where "/" doesn't close it
+_JS_REGEX = r"(?:(?<=[(,=:\[!&|?{};])|(?<=\breturn))[ \t]*/(?![/*])(?:\\.|\[(?:\\.|[^\]\\\n])*\]|[^/\\\n\[])+/"
+# JavaScript family: single-quoted strings, regex literals, and template literals that can span lines
+_JS_TOKENS = re.compile(
+    r"//[^\n]*|/\*.*?\*/|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`|"
+    + _JS_REGEX + r"|[{}\n]",
+    re.DOTALL,
+)
+# Go raw strings use backticks too
+_GO_TOKENS = re.compile(_C_TOKENS + r"|`[^`]*`", re.DOTALL)
+
+_PYTHON_DECLARATION = re.compile(r"[ \t]*(?:@|def |async def |class |import |from \S+ import )")
+_LONG_STATEMENT_LINES = 4  # module-level statements longer than this keep only their first line
+
+
+def _indent(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _python(source: str) -> str:
+    """Imports, signatures, decorators, docstrings and short module/class-level statements, via ``ast``."""
+    try:
+        module = ast.parse(source)
+    except (SyntaxError, ValueError, MemoryError, RecursionError):
+        # Truncated, too deeply nested for the parser, or otherwise unparsable: keep the lines that
+        # look like declarations
+        lines = [line for line in source.split("\n") if _PYTHON_DECLARATION.match(line)]
+        return "\n".join(lines)
+
+    lines = source.split("\n")
+    out: list[str] = []
+
+    def emit(first: int, last: int) -> None:
+        out.extend(line.rstrip("\r") for line in lines[first - 1:last])
+
+    def docstring(body: list[ast.stmt]) -> ast.stmt | None:
+        first = body[0] if body else None
+        if isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant) and isinstance(first.value.value, str):
+            return first
+        return None
+
+    def visit(body: list[ast.stmt], top_level: bool) -> None:
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                if top_level and out and out[-1]:
+                    out.append("")
+                first = min([d.lineno for d in node.decorator_list] + [node.lineno])
+                body_start = node.body[0].lineno
+                if body_start == node.lineno:
+                    emit(first, node.lineno)  # one-liner
+                    continue
+                emit(first, body_start - 1)
+                doc = docstring(node.body)
+                if doc is not None:
+                    emit(doc.lineno, doc.end_lineno)
+                rest = node.body[1:] if doc is not None else node.body
+                if isinstance(node, ast.ClassDef):
+                    visit(rest, top_level=False)
+                elif rest:
+                    out.append(" " * node.body[0].col_offset + ELLIPSIS)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                emit(node.lineno, node.end_lineno)
+            elif top_level or isinstance(node, (ast.Assign, ast.AnnAssign)):
+                # Module-level code and class attributes, cut short if long
+                if node.end_lineno - node.lineno < _LONG_STATEMENT_LINES:
+                    emit(node.lineno, node.end_lineno)
+                else:
+                    emit(node.lineno, node.lineno)
+                    out.append(" " * (node.col_offset + 4) + ELLIPSIS)
+
+    if doc := docstring(module.body):
+        emit(doc.lineno, doc.end_lineno)
+        visit(module.body[1:], top_level=True)
+    else:
+        visit(module.body, top_level=True)
+    return "\n".join(out)
+
+
+def _braces(source: str, tokens: re.Pattern) -> str:
+    """Brace-language skeleton: every line outside function and control-flow bodies.
+
+    Type-like blocks (classes, structs, interfaces, impls, namespaces, ...)
+    keep their members; any other block is cut down to its opening and
+    closing lines around an ellipsis.
+    """
+    lines = source.split("\n")
+    hidden = [False] * len(lines)
+    placeholder_after: dict[int, int] = {}  # opening line -> first body line, for the placeholder's indent
+    depth = 0
+    drop_depth: int | None = None  # depth at which the current dropped block was opened
+    drop_start = 0
+    line = 0
+    line_start = 0
+    for m in tokens.finditer(source):
+        tok = m.group()
+        if tok == "{":
+            if drop_depth is None:
+                header = source[line_start:m.start()]
+                if not header.strip():
+                    # Brace on its own line: the declaration is on the previous non-blank line
+                    header = next((lines[i] for i in range(line - 1, -1, -1) if lines[i].strip()), "")
+                if not _CONTAINER_BLOCK.search(header):
+                    drop_depth, drop_start = depth, line
+            depth += 1
+        elif tok == "}":
+            depth = max(depth - 1, 0)
+            if drop_depth is not None and depth == drop_depth:
+                drop_depth = None
+                hidden[line] = False  # the closing line stays
+                if line > drop_start + 1:
+                    placeholder_after[drop_start] = drop_start + 1
+        else:
+            newlines = tok.count("\n")
+            if not newlines:
+                continue
+            # Lines that start inside a dropped block are hidden, except the one that closes it
+            for i in range(line + 1, min(line + newlines, len(lines) - 1) + 1):
+                hidden[i] = drop_depth is not None
+            line += newlines
+            line_start = m.start() + tok.rfind("\n") + 1
+    if drop_depth is not None:
+        # A block that never closes (a truncated file, or braces the scanner misread) would hide
+        # everything after it, so leave the file as it is
+        return source
+
+    out = []
+    for i, text in enumerate(lines):
+        if not hidden[i]:
+            out.append(text.rstrip("\r"))
+        if i in placeholder_after:
+            body = lines[placeholder_after[i]]
+            indent = _indent(body) if body.strip() and len(_indent(body)) > len(_indent(text)) else _indent(text) + "    "
+            out.append(indent + ELLIPSIS)
+    return "\n".join(out)
+
+
+_LANGUAGES: dict[str, Callable[[str], str]] = {
+    "py": _python,
+    "pyi": _python,
+    **dict.fromkeys(("js", "jsx", "mjs", "cjs", "ts", "tsx", "mts", "cts"), partial(_braces, tokens=_JS_TOKENS)),
+    "go": partial(_braces, tokens=_GO_TOKENS),
+    **dict.fromkeys(
+        ("java", "kt", "kts", "scala", "cs", "swift", "rs", "c", "h", "cc", "cpp", "cxx", "hpp", "hh", "m", "php"),
+        partial(_braces, tokens=_BRACE_TOKENS),
+    ),
+}
+
+# Extensions with a skeletonizer, in the form ContextConfig.skeleton_extensions uses
+SUPPORTED_EXTENSIONS = frozenset(_LANGUAGES)
+
+
+def skeletonize(path: str, content: str, extensions: Collection[str] | None = None) -> str:
+    """A shorter outline of a source file: imports, declarations and docs with bodies replaced by "...".
+
+    Only files whose extension is in ``extensions`` (default: every
+    supported one) are outlined. Other files, and files the outline
+    wouldn't shrink, come back unchanged.
+    """
+    extension = path.rpartition("/")[2].rpartition(".")[2].lower()
+    language = _LANGUAGES.get(extension)
+    if language is None or (extensions is not None and extension not in extensions):
+        return content
+    skeleton = language(content)
+    return skeleton if len(skeleton) < len(content) else content
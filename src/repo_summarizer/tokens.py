@@ -0,0 +1,92 @@
+import logging
+import re
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+
+from repo_summarizer import config
+
+logger = logging.getLogger(__name__)
+
+# Pieces that each cost about one token in the BPE vocabularies the supported models use: words split at
+# camel-case humps and every 8 letters, digits in groups of three, non-ASCII chars (CJK is roughly one
+# token each), ASCII punctuation in pairs, and whitespace runs. A single space is free, as BPE folds it
+# into the next word.
+_APPROXIMATE_PIECES = re.compile(
+    r"[A-Z]?[a-z]{1,7}|[A-Z]{1,8}(?![a-z])|\d{1,3}|[^\x00-\x7f]|[!-/:-@\[-`{-~]{1,2}|\s{2,}|[^\S ]"
+)
+
+# No tokenizer here averages more chars per token than this on real text, so cutting text to
+# max_tokens * MAX_CHARS_PER_TOKEN chars before counting never loses anything that would have fit
+MAX_CHARS_PER_TOKEN = 8
+
+
+class Tokenizer:
+    """Counts tokens, and cuts text to a token budget."""
+
+    name = "approximate"
+
+    def count(self, text: str) -> int:
+        return len(_APPROXIMATE_PIECES.findall(text))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """The longest prefix of ``text`` that is at most ``max_tokens`` tokens."""
+        cut = next(islice(_APPROXIMATE_PIECES.finditer(text), max_tokens, None), None)
+        return text if cut is None else text[:cut.start()]
+
+
+class HFTokenizer(Tokenizer):
+    """Exact counts from a local Hugging Face ``tokenizer.json`` (needs the ``tokenizers`` package)."""
+
+    def __init__(self, path: str | Path):
+        from tokenizers import Tokenizer as _Tokenizer
+
+        self.name = str(path)
+        self._tokenizer = _Tokenizer.from_file(str(path))
+
+    def count(self, text: str) -> int:
+        return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        encoding = self._tokenizer.encode(text, add_special_tokens=False)
+        if len(encoding.ids) <= max_tokens:
+            return text
+        return text[:encoding.offsets[max_tokens][0]]
+
+
+APPROXIMATE = Tokenizer()
+
+_registered: dict[str, Tokenizer] = {}
+
+
+def register_tokenizer(model: str, tokenizer: Tokenizer) -> None:
+    """Use ``tokenizer`` for ``model`` from now on, in place of whatever get_tokenizer would load."""
+    _registered[model] = tokenizer
+    get_tokenizer.cache_clear()
+
+
+@lru_cache
+def get_tokenizer(model: str | None = None) -> Tokenizer:
+    """The tokenizer for ``model``: a registered one, else ``<TOKENIZER_DIR>/<model>/tokenizer.json``, else approximate.
+
+    Loaded tokenizers are cached per model. Nothing is downloaded — without
+    a local tokenizer file, counts come from the approximate estimator.
+    """
+    if model is None:
+        return APPROXIMATE
+    if model in _registered:
+        return _registered[model]
+    directory = config.get_config().context.tokenizer_dir
+    if directory is None:
+        return APPROXIMATE
+    path = Path(directory) / model / "tokenizer.json"
+    if not path.is_file():
+        logger.warning(f"No tokenizer for {model} at {path}, using approximate token counts")
+        return APPROXIMATE
+    try:
+        tokenizer = HFTokenizer(path)
+    except ImportError:
+        logger.warning(f"The tokenizers package isn't installed, using approximate token counts for {model}")
+        return APPROXIMATE
+    logger.info(f"Loaded tokenizer for {model} from {path}")
+    return tokenizer
@@ -1,5 +1,7 @@
 import pytest
 
+from repo_summarizer import cache, filetree, llm, router
+
 SMALL_TREE = [
     {"path": "README.md", "type": "blob", "size": 500},
     {"path": "pyproject.toml", "type": "blob", "size": 300},
@@ -23,7 +25,7 @@ LARGE_TREE_WITH_JUNK = [
     {"path": "assets/logo.svg", "type": "blob", "size": 5000},
     {"path": ".github/workflows/ci.yml", "type": "blob", "size": 800},
     {"path": "Dockerfile", "type": "blob", "size": 300},
-    # Tree entry (directory) — should be skipped by filter_tree
+    # Tree entry (directory) — not a file, so never part of the CompactTree
     {"path": "src/components", "type": "tree", "size": 0},
 ]
 
@@ -38,14 +40,32 @@ SAMPLE_FILE_CONTENTS = {
 
 @pytest.fixture
 def small_tree():
-    return [dict(e) for e in SMALL_TREE]
+    return filetree.CompactTree.from_entries(SMALL_TREE)
 
 
 @pytest.fixture
 def large_tree():
-    return [dict(e) for e in LARGE_TREE_WITH_JUNK]
+    return filetree.CompactTree.from_entries(LARGE_TREE_WITH_JUNK)
+
+
+@pytest.fixture
+def large_tree_entries():
+    return [dict(entry) for entry in LARGE_TREE_WITH_JUNK]
 
 
 @pytest.fixture
 def sample_contents():
     return dict(SAMPLE_FILE_CONTENTS)
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    caches = (cache.get_summary_cache(), cache.get_blob_cache(), cache.get_validator_store())
+    for c in caches:
+        c.clear()
+    # Route health and hedge budgets carry over between calls, so start every test fresh
+    router.get_router.cache_clear()
+    llm._get_hedge_policy.cache_clear()
+    yield
+    for c in caches:
+        c.clear()
@@ -0,0 +1,64 @@
+import pytest
+
+from repo_summarizer import budget, config, filetree
+
+
+def _tree(paths: list[str], size: int = 2_000) -> filetree.CompactTree:
+    tree = filetree.CompactTree()
+    for p in paths:
+        tree.append(p, size=size)
+    return tree
+
+
+@pytest.fixture
+def cfg():
+    return config.get_config().model_copy(deep=True)
+
+
+SMALL = _tree(["README.md", "pyproject.toml", "src/lib/__init__.py", "src/lib/core.py", "tests/test_core.py"])
+
+MONOREPO = _tree([
+    f"{area}/pkg_{i}/src/module_{j}.{ext}"
+    for area, ext in [("services", "go"), ("web", "ts"), ("ml", "py"), ("mobile", "kt"), ("infra", "yaml"),
+                      ("tools", "py"), ("docs", "md"), ("libs", "rs")]
+    for i in range(40)
+    for j in range(30)
+])
+
+
+class TestPlan:
+    def test_measure(self):
+        shape = budget.measure(MONOREPO)
+        assert shape.entries == 8 * 40 * 30
+        assert shape.top_level_dirs == 8
+        assert shape.languages == 5  # go, ts, py, kt, rs; yaml and md aren't source
+
+    def test_small_repo_gets_fewer_files_and_tokens(self, cfg):
+        small = budget.plan(SMALL, cfg)
+        large = budget.plan(MONOREPO, cfg)
+        assert small.selected_files == cfg.budget.min_selected_files
+        assert large.selected_files > budget.FIXED_SELECTED_FILES
+        assert small.context_budget < large.context_budget
+        assert large.requested_files > large.selected_files
+
+    def test_small_repo_budget_bounded_by_its_size(self, cfg):
+        plan = budget.plan(SMALL, cfg)
+        assert plan.context_budget <= 5 * 2_000 // 3 + 5 * 20
+
+    def test_latency_target_caps_context(self, cfg):
+        cfg.budget.summary_latency_target = 15.0
+        plan = budget.plan(MONOREPO, cfg)
+        assert plan.context_budget == int((15.0 - cfg.budget.summary_base_seconds)
+                                          * cfg.budget.summary_input_tokens_per_second)
+        assert plan.max_file_size <= cfg.context.max_file_size
+
+    def test_single_pass_budget_covers_the_repo(self, cfg):
+        tree = _tree([f"src/mod_{i}.py" for i in range(40)], size=1_500)
+        assert budget.plan(tree, cfg, single_pass=True).context_budget > budget.plan(tree, cfg).context_budget
+
+    def test_fixed_budgets(self, cfg):
+        cfg.budget.adaptive_budgets = False
+        assert budget.plan(MONOREPO, cfg) == budget.RepoBudget(
+            budget.FIXED_REQUESTED_FILES, budget.FIXED_SELECTED_FILES,
+            cfg.context.max_file_size, cfg.context.context_budget,
+        )
@@ -0,0 +1,85 @@
+import os
+
+from repo_summarizer import cache
+
+
+class TestLRUCache:
+    def test_get_missing(self):
+        c = cache.LRUCache(maxsize=2)
+        assert c.get("a") is None
+
+    def test_set_and_get(self):
+        c = cache.LRUCache(maxsize=2)
+        c.set("a", 1)
+        assert c.get("a") == 1
+
+    def test_evicts_least_recently_used(self):
+        c = cache.LRUCache(maxsize=2)
+        c.set("a", 1)
+        c.set("b", 2)
+        c.get("a")
+        c.set("c", 3)
+        assert c.get("a") == 1
+        assert c.get("b") is None
+        assert c.get("c") == 3
+
+    def test_expires_after_ttl(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+        c = cache.LRUCache(maxsize=2, ttl=10)
+        c.set("a", 1)
+        now[0] += 5
+        assert c.get("a") == 1
+        now[0] += 10
+        assert c.get("a") is None
+        assert len(c) == 0
+
+    def test_zero_size_disables(self):
+        c = cache.LRUCache(maxsize=0)
+        c.set("a", 1)
+        assert c.get("a") is None
+
+
+SHA_A = "a" * 40
+SHA_B = "b" * 40
+SHA_C = "c" * 40
+
+
+class TestBlobCache:
+    def test_memory_roundtrip(self):
+        c = cache.BlobCache(memory_max_bytes=1000)
+        c.set(SHA_A, "hello")
+        assert c.get(SHA_A) == "hello"
+
+    def test_memory_evicts_by_bytes(self):
+        c = cache.BlobCache(memory_max_bytes=10)
+        c.set(SHA_A, "x" * 6)
+        c.set(SHA_B, "y" * 6)
+        assert c.get(SHA_A) is None
+        assert c.get(SHA_B) == "y" * 6
+
+    def test_oversized_blob_not_kept_in_memory(self):
+        c = cache.BlobCache(memory_max_bytes=4)
+        c.set(SHA_A, "too large")
+        assert c.get(SHA_A) is None
+
+    def test_disk_tier_survives_new_instance(self, tmp_path):
+        cache.BlobCache(memory_max_bytes=1000, directory=str(tmp_path), disk_max_bytes=1000).set(SHA_A, "ünïcode")
+        c = cache.BlobCache(memory_max_bytes=1000, directory=str(tmp_path), disk_max_bytes=1000)
+        assert c.get(SHA_A) == "ünïcode"
+
+    def test_disk_tier_evicts_oldest(self, tmp_path):
+        c = cache.BlobCache(memory_max_bytes=0, directory=str(tmp_path), disk_max_bytes=20)
+        c.set(SHA_A, "a" * 8)
+        (tmp_path / SHA_A[:2] / SHA_A).touch()
+        os.utime(tmp_path / SHA_A[:2] / SHA_A, (1, 1))
+        c.set(SHA_B, "b" * 8)
+        c.set(SHA_C, "c" * 8)
+        assert c.get(SHA_A) is None
+        assert c.get(SHA_B) == "b" * 8
+        assert c.get(SHA_C) == "c" * 8
+
+    def test_disk_tier_rejects_non_sha_keys(self, tmp_path):
+        c = cache.BlobCache(memory_max_bytes=0, directory=str(tmp_path), disk_max_bytes=1000)
+        c.set("../escape", "x")
+        assert list(tmp_path.iterdir()) == []
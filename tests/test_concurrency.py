@@ -0,0 +1,261 @@
+import asyncio
+
+import pytest
+
+from repo_summarizer import concurrency
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_coalesces_concurrent_calls(self):
+        flights = concurrency.SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "done"
+
+        results = await asyncio.gather(*[flights.do("key", work) for _ in range(5)])
+        assert results == ["done"] * 5
+        assert calls == 1
+        assert "key" not in flights
+
+    @pytest.mark.asyncio
+    async def test_different_keys_run_separately(self):
+        flights = concurrency.SingleFlight()
+
+        async def work(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(flights.do("a", lambda: work(1)), flights.do("b", lambda: work(2)))
+        assert results == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_shares_errors(self):
+        flights = concurrency.SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*[flights.do("key", work) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelling_waiter_keeps_shared_work(self):
+        flights = concurrency.SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "done"
+
+        first = asyncio.create_task(flights.do("key", work))
+        second = asyncio.create_task(flights.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await second == "done"
+        assert first.cancelled()
+
+    @pytest.mark.asyncio
+    async def test_new_call_after_completion_reruns(self):
+        flights = concurrency.SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        assert await flights.do("key", work) == 1
+        assert await flights.do("key", work) == 2
+
+
+class TestStageScheduler:
+    @pytest.mark.asyncio
+    async def test_limits_each_stage_independently(self):
+        scheduler = concurrency.StageScheduler({"fast": 3, "slow": 1})
+        active = {"fast": 0, "slow": 0}
+        peak = {"fast": 0, "slow": 0}
+
+        async def run(stage):
+            async with scheduler.stage(stage):
+                active[stage] += 1
+                peak[stage] = max(peak[stage], active[stage])
+                await asyncio.sleep(0.01)
+                active[stage] -= 1
+
+        await asyncio.gather(*[run("fast") for _ in range(6)], *[run("slow") for _ in range(3)])
+        assert peak == {"fast": 3, "slow": 1}
+
+
+class TestBoundedAsCompleted:
+    @pytest.mark.asyncio
+    async def test_yields_in_completion_order(self):
+        async def work(delay):
+            await asyncio.sleep(delay)
+            return delay
+
+        results = [r async for r in concurrency.bounded_as_completed([0.03, 0.01, 0.02], work, 3)]
+        assert results == [(0.01, 0.01), (0.02, 0.02), (0.03, 0.03)]
+
+    @pytest.mark.asyncio
+    async def test_caps_concurrency(self):
+        active = 0
+        peak = 0
+
+        async def work(item):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return item
+
+        results = [r async for r in concurrency.bounded_as_completed(list(range(10)), work, 2)]
+        assert sorted(item for item, _ in results) == list(range(10))
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_returns_exceptions_as_results(self):
+        async def work(item):
+            if item == "bad":
+                raise ValueError(item)
+            return item
+
+        results = dict([r async for r in concurrency.bounded_as_completed(["ok", "bad"], work, 2)])
+        assert results["ok"] == "ok"
+        assert isinstance(results["bad"], ValueError)
+
+
+class TestIterWithDeadline:
+    @pytest.mark.asyncio
+    async def test_passes_items_through(self):
+        async def source():
+            for i in range(3):
+                yield i
+
+        assert [i async for i in concurrency.iter_with_deadline(source(), 1)] == [0, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_deadline_covers_whole_iteration(self):
+        closed = False
+
+        async def source():
+            nonlocal closed
+            try:
+                for i in range(10):
+                    await asyncio.sleep(0.02)
+                    yield i
+            finally:
+                closed = True
+
+        seen = []
+        with pytest.raises(asyncio.TimeoutError):
+            async for i in concurrency.iter_with_deadline(source(), 0.05):
+                seen.append(i)
+        assert seen == [0, 1]
+        assert closed
+
+
+def _policy(delay: float = 0.05, burst: float = 1.0) -> concurrency.HedgePolicy:
+    return concurrency.HedgePolicy(95.0, delay, 0.0, 0.1, burst)
+
+
+class TestHedged:
+    @staticmethod
+    def _streams(*first_delays: float, fail: tuple[int, ...] = ()):
+        """A stream opener whose n-th stream waits first_delays[n] before yielding its items."""
+        opened: list[int] = []
+        closed: list[int] = []
+
+        def open_stream():
+            n = len(opened)
+            opened.append(n)
+
+            async def stream():
+                try:
+                    await asyncio.sleep(first_delays[n])
+                    if n in fail:
+                        raise RuntimeError(f"stream {n} failed")
+                    for i in range(3):
+                        yield f"{n}:{i}"
+                finally:
+                    closed.append(n)
+
+            return stream()
+
+        return open_stream, opened, closed
+
+    @staticmethod
+    async def _collect(items) -> list:
+        return [item async for item in items]
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_when_first_item_is_prompt(self):
+        open_stream, opened, _ = self._streams(0.0)
+        assert await self._collect(concurrency.hedged(open_stream, _policy())) == ["0:0", "0:1", "0:2"]
+        assert opened == [0]
+
+    @pytest.mark.asyncio
+    async def test_slow_first_item_is_hedged_and_loser_closed(self):
+        open_stream, opened, closed = self._streams(5.0, 0.0)
+        assert await self._collect(concurrency.hedged(open_stream, _policy())) == ["1:0", "1:1", "1:2"]
+        assert opened == [0, 1]
+        assert sorted(closed) == [0, 1]
+
+    @pytest.mark.asyncio
+    async def test_original_can_still_win(self):
+        open_stream, opened, _ = self._streams(0.1, 5.0)
+        assert await self._collect(concurrency.hedged(open_stream, _policy())) == ["0:0", "0:1", "0:2"]
+        assert opened == [0, 1]
+
+    @pytest.mark.asyncio
+    async def test_failed_copy_drops_out(self):
+        open_stream, _, _ = self._streams(0.1, 0.2, fail=(0,))
+        assert await self._collect(concurrency.hedged(open_stream, _policy())) == ["1:0", "1:1", "1:2"]
+
+        open_stream, _, _ = self._streams(0.1, 0.2, fail=(0, 1))
+        with pytest.raises(RuntimeError, match="stream 1 failed"):
+            await self._collect(concurrency.hedged(open_stream, _policy()))
+
+    @pytest.mark.asyncio
+    async def test_budget_limits_hedges(self):
+        policy = _policy(delay=0.01, burst=1.0)
+        open_stream, opened, _ = self._streams(0.05, 0.05, 0.05)
+        await self._collect(concurrency.hedged(open_stream, policy))
+        await self._collect(concurrency.hedged(open_stream, policy))
+        # The second call found the budget spent and waited out its only stream
+        assert opened == [0, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_without_policy_passes_through(self):
+        open_stream, opened, closed = self._streams(0.05)
+        assert await self._collect(concurrency.hedged(open_stream, None)) == ["0:0", "0:1", "0:2"]
+        assert opened == closed == [0]
+
+
+class TestHedgePolicy:
+    def test_delay_follows_percentile_after_warmup(self):
+        policy = concurrency.HedgePolicy(90.0, 10.0, 0.5, 0.1, 3.0, min_samples=10)
+        assert policy.delay() == 10.0
+        for i in range(1, 11):
+            policy.observe(float(i))
+        assert policy.delay() == 10.0  # 90th percentile of 1..10
+        for _ in range(10):
+            policy.observe(0.1)
+        assert policy.delay() == 9.0
+
+    def test_budget_refills_by_ratio(self):
+        policy = concurrency.HedgePolicy(95.0, 1.0, 0.0, 0.5, 1.0)
+        assert policy.try_hedge()
+        assert not policy.try_hedge()
+        policy.started()
+        assert not policy.try_hedge()
+        policy.started()
+        assert policy.try_hedge()
@@ -1,48 +1,37 @@
 import pytest
 
-from repo_summarizer import config, context
+from repo_summarizer import config, context, filetree, pathfilter, tokens
 
 
-class TestFilterTree:
-    def test_removes_node_modules(self, large_tree):
-        result = context.filter_tree(large_tree, config.SKIP_DIRS, config.SKIP_EXTENSIONS, config.SKIP_FILENAMES)
-        paths = [e["path"] for e in result]
+class TestEntryFilter:
+    @pytest.fixture
+    def keep(self):
+        return context.entry_filter(pathfilter.get_path_filter())
+
+    @pytest.fixture
+    def paths(self, keep, large_tree_entries):
+        return [entry["path"] for entry in large_tree_entries if entry["type"] == "blob" and keep(entry)]
+
+    def test_removes_node_modules(self, paths):
         assert "node_modules/lodash/index.js" not in paths
 
-    def test_removes_git_dir(self, large_tree):
-        result = context.filter_tree(large_tree, config.SKIP_DIRS, config.SKIP_EXTENSIONS, config.SKIP_FILENAMES)
-        paths = [e["path"] for e in result]
+    def test_removes_git_dir(self, paths):
         assert ".git/config" not in paths
 
-    def test_removes_pycache(self, large_tree):
-        result = context.filter_tree(large_tree, config.SKIP_DIRS, config.SKIP_EXTENSIONS, config.SKIP_FILENAMES)
-        paths = [e["path"] for e in result]
+    def test_removes_pycache(self, paths):
         assert "__pycache__/cache.pyc" not in paths
 
-    def test_removes_lock_files(self, large_tree):
-        result = context.filter_tree(large_tree, config.SKIP_DIRS, config.SKIP_EXTENSIONS, config.SKIP_FILENAMES)
-        paths = [e["path"] for e in result]
+    def test_removes_lock_files(self, paths):
         assert "package-lock.json" not in paths
 
-    def test_removes_binary_files(self, large_tree):
-        result = context.filter_tree(large_tree, config.SKIP_DIRS, config.SKIP_EXTENSIONS, config.SKIP_FILENAMES)
-        paths = [e["path"] for e in result]
+    def test_removes_binary_files(self, paths):
         assert "assets/logo.png" not in paths
         assert "assets/logo.svg" not in paths
 
-    def test_removes_min_js(self, large_tree):
-        result = context.filter_tree(large_tree, config.SKIP_DIRS, config.SKIP_EXTENSIONS, config.SKIP_FILENAMES)
-        paths = [e["path"] for e in result]
+    def test_removes_min_js(self, paths):
         assert "dist/bundle.min.js" not in paths
 
-    def test_removes_tree_entries(self, large_tree):
-        result = context.filter_tree(large_tree, config.SKIP_DIRS, config.SKIP_EXTENSIONS, config.SKIP_FILENAMES)
-        paths = [e["path"] for e in result]
-        assert "src/components" not in paths
-
-    def test_keeps_source_files(self, large_tree):
-        result = context.filter_tree(large_tree, config.SKIP_DIRS, config.SKIP_EXTENSIONS, config.SKIP_FILENAMES)
-        paths = [e["path"] for e in result]
+    def test_keeps_source_files(self, paths):
         assert "README.md" in paths
         assert "package.json" in paths
         assert "src/index.ts" in paths
@@ -50,22 +39,96 @@ class TestFilterTree:
         assert ".github/workflows/ci.yml" in paths
         assert "Dockerfile" in paths
 
+    def test_directories_pass_unless_skipped(self, keep):
+        assert keep({"path": "src/components", "type": "tree"})
+        assert not keep({"path": "packages/web/node_modules", "type": "tree"})
+        assert not keep({"path": "vendored", "type": "commit"})
+
+    def test_decides_each_directory_and_name_once(self, monkeypatch):
+        rules = pathfilter.PathFilter(config.SKIP_DIRS, config.SKIP_EXTENSIONS, config.SKIP_FILENAMES)
+        dirs_seen, names_seen = [], []
+        monkeypatch.setattr(rules, "keep_dir", lambda d: dirs_seen.append(d) or d != "vendor")
+        monkeypatch.setattr(rules, "keep_name", lambda n: names_seen.append(n) or not n.endswith(".lock"))
+        keep = context.entry_filter(rules)
+        entries = [{"path": f"{d}/f{i % 5}.py", "type": "blob"} for d in ("src", "vendor") for i in range(50)]
+        kept = [e["path"] for e in entries + [{"path": "src/x.lock", "type": "blob"}] if keep(e)]
+        assert len(kept) == 50
+        assert sorted(dirs_seen) == ["src", "vendor"]
+        assert sorted(names_seen) == [f"f{i}.py" for i in range(5)] + ["x.lock"]
+
+    def test_anchored_patterns_see_the_full_path(self):
+        rules = pathfilter.PathFilter(config.SKIP_DIRS, config.SKIP_EXTENSIONS, config.SKIP_FILENAMES, ["/docs/*.md"])
+        keep = context.entry_filter(rules)
+        assert not keep({"path": "docs/guide.md", "type": "blob"})
+        assert keep({"path": "tools/docs/guide.md", "type": "blob"})
+        assert keep({"path": "docs/api/guide.md", "type": "blob"})
+
 
 class TestFormatDirectoryTree:
     def test_includes_header(self, small_tree):
         result = context.format_directory_tree(small_tree)
         assert "Directory structure:" in result
 
-    def test_includes_full_paths(self, small_tree):
+    def test_lists_files_under_their_directory(self, small_tree):
         result = context.format_directory_tree(small_tree)
-        assert "README.md" in result
-        assert "src/main.py" in result
-
-    def test_truncates_large_trees(self):
-        tree = [{"path": f"src/file_{i}.py", "type": "blob", "size": 100} for i in range(1000)]
-        result = context.format_directory_tree(tree, max_size=500)
-        assert "more files" in result
-        assert len(result) < 600
+        lines = result.split("\n")
+        assert "README.md" in lines
+        assert lines.index("  main.py") > lines.index("src/")
+
+    def test_nested_directories_show_full_path(self):
+        tree = filetree.CompactTree.from_entries([{"path": "src/app/core/models.py", "type": "blob"}])
+        result = context.format_directory_tree(tree)
+        assert "    src/app/core/" in result.split("\n")
+        assert "      models.py" in result.split("\n")
+
+    def test_samples_crowded_directories(self):
+        tree = filetree.CompactTree()
+        for i in range(1000):
+            tree.append(f"src/file_{i}.py")
+        tree.append("src/main.py")
+        result = context.format_directory_tree(tree, max_files_per_dir=20, sample_files=3)
+        # Entry points are sampled first
+        assert "  main.py" in result
+        assert "... 998 more files (.py 998)" in result
+
+    def test_collapses_deep_levels_to_fit(self):
+        tree = filetree.CompactTree()
+        for top in ("api", "web", "tools"):
+            for i in range(10):
+                for j in range(10):
+                    for k in range(5):
+                        tree.append(f"{top}/pkg_{i}/mod_{j}/file_{k}.py")
+        result = context.format_directory_tree(tree, max_tokens=500)
+        assert tokens.APPROXIMATE.count(result) < 520
+        # Every top-level area survives, deeper levels are summarized
+        for top in ("api/", "web/", "tools/"):
+            assert top in result.split("\n")
+        assert "api/pkg_0/ (50 files: .py 50)" in result
+
+    def test_steps_back_when_tokens_bind_before_characters(self):
+        class _CharTokenizer(tokens.Tokenizer):
+            def count(self, text: str) -> int:
+                return len(text)
+
+        tree = filetree.CompactTree()
+        for top in ("api", "web"):
+            for i in range(10):
+                for j in range(10):
+                    tree.append(f"{top}/pkg_{i}/mod_{j}/file.py")
+        # Two levels fit in 8 characters per token but not in 1, so the tree collapses to the top level
+        result = context.format_directory_tree(tree, max_tokens=1_000, tokenizer=_CharTokenizer())
+        lines = result.split("\n")
+        assert len("\n".join(lines[2:])) <= 1_000
+        assert "  api/pkg_0/ (10 files: .py 10)" in lines
+        assert "more lines" not in result
+
+    def test_truncates_when_top_level_alone_is_too_big(self):
+        tree = filetree.CompactTree()
+        for i in range(1000):
+            tree.append(f"dir_{i}/file.py")
+        result = context.format_directory_tree(tree, max_tokens=200)
+        assert "more lines" in result
+        assert tokens.APPROXIMATE.count(result) < 230
 
 
 class TestBuildContext:
@@ -75,8 +138,9 @@ class TestBuildContext:
         assert "# My Project" in ctx
 
     def test_respects_budget(self, sample_contents):
-        ctx = context.build_context(sample_contents, budget=100, max_file_size=10_000)
-        assert len(ctx) <= 100
+        ctx = context.build_context(sample_contents, budget=30, max_file_size=10_000)
+        assert ctx
+        assert tokens.APPROXIMATE.count(ctx) <= 30
 
     def test_truncates_large_files(self):
         contents = {"big.py": "x" * 20_000}
@@ -93,6 +157,42 @@ class TestBuildContext:
         assert "Copyright" not in ctx
         assert "import foo" in ctx
 
+    def test_small_manifests_beat_one_large_file(self):
+        big = "\n".join(f"    value_{i} = compute({i}, {i * 7 % 13})" for i in range(600))
+        contents = {
+            "src/engine.py": big,
+            "package.json": '{"name": "app", "dependencies": {"react": "^18"}}',
+            "Dockerfile": "FROM python:3.12\nRUN pip install .\nCMD [\"app\"]",
+            "README.md": "# App\n\nServes things.",
+        }
+        ctx = context.build_context(contents, budget=800, max_file_size=10_000)
+        assert tokens.APPROXIMATE.count(ctx) <= 800
+        assert "--- package.json ---" in ctx
+        assert "--- Dockerfile ---" in ctx
+        assert "--- README.md ---" in ctx
+
+    def test_drops_duplicate_files(self):
+        lines = "\n".join(f"setting_{i} = {i}" for i in range(50))
+        contents = {
+            "a/config.py": lines,
+            "b/config.py": lines + "\n",
+            "c/config.py": lines.replace("setting_3 = 3", "setting_3 = 4"),
+        }
+        ctx = context.build_context(contents, budget=100_000, max_file_size=10_000)
+        assert "--- a/config.py ---" in ctx
+        assert "b/config.py" not in ctx
+        assert "c/config.py" not in ctx
+
+    def test_partial_file_keeps_declarations(self):
+        body = "\n".join(f"        total += step_{i}(x)" for i in range(400))
+        content = f"import os\n\n\ndef first(x):\n{body}\n\n\ndef second(y):\n{body}\n\n\nclass Last:\n    pass"
+        ctx = context.build_context({"mod.py": content}, budget=1_300, max_file_size=100_000)
+        assert tokens.APPROXIMATE.count(ctx) <= 1_300
+        assert "import os" in ctx
+        assert "def second(y):" in ctx
+        assert "class Last:" in ctx
+        assert "... (truncated)" in ctx
+
 
 class TestCleanContent:
     def test_collapses_blank_lines(self):
@@ -123,6 +223,20 @@ class TestCleanContent:
         assert "# Project" in result
         assert "Description" in result
 
+    def test_strips_multiline_html_blocks(self):
+        content = 'Thanks to:\n<a href="https://github.com/user">\n  <img src="avatar.png">\n</a>\n\n\nDone'
+        assert context.clean_content(content) == "Thanks to:\n\nDone"
+
+    def test_whitespace_only_lines_count_as_text_when_collapsing(self):
+        # Blank lines are collapsed before trailing whitespace is stripped, as they always have been
+        assert context.clean_content("a\n  \n\n\nb") == "a\n\n\nb"
+
+    def test_truncates_to_max_chars(self):
+        content = "word   \n" * 10_000
+        full = context.clean_content(content)
+        assert context.clean_content(content, 50) == full[:50] + "\n... (truncated)"
+        assert context.clean_content("short  \n", 50) == "short"
+
 
 class TestStripLicenseHeader:
     def test_block_comment_license(self):
@@ -145,6 +259,10 @@ class TestStripLicenseHeader:
         content = "import os\nprint('hello')\n"
         assert context.strip_license_header(content) == content
 
+    def test_only_first_block_comment_is_checked(self):
+        content = "/* helpers */\nint x; /* Copyright 2024 */\n"
+        assert context.strip_license_header(content) == content
+
     def test_mit_license_block(self):
         content = (
             "/*\n"
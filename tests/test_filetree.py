@@ -0,0 +1,85 @@
+from repo_summarizer import filetree
+
+SHA = "0123456789abcdef0123456789abcdef01234567"
+
+
+def _tree(*paths: str) -> filetree.CompactTree:
+    tree = filetree.CompactTree()
+    for p in paths:
+        tree.append(p)
+    return tree
+
+
+class TestCompactTree:
+    def test_round_trips_entries(self):
+        tree = filetree.CompactTree()
+        tree.append("src/app/main.py", SHA, 120)
+        tree.append("README.md")
+        assert list(tree) == ["src/app/main.py", "README.md"]
+        assert (tree.name(0), tree.directory(0), tree.depth(0)) == ("main.py", "src/app", 2)
+        assert (tree.sha(0), tree.size(0)) == (SHA, 120)
+        assert (tree.sha(1), tree.size(1), tree.depth(1)) == (None, None, 0)
+
+    def test_keeps_non_sha1_shas(self):
+        tree = filetree.CompactTree()
+        tree.append("a.py", "abc")
+        assert tree.sha(0) == "abc"
+
+    def test_from_entries_keeps_only_blobs(self):
+        tree = filetree.CompactTree.from_entries([
+            {"path": "src", "type": "tree"},
+            {"path": "src/a.py", "type": "blob", "sha": SHA, "size": 3},
+        ])
+        assert list(tree) == ["src/a.py"]
+
+    def test_membership(self):
+        tree = _tree("src/a.py", "b.py")
+        assert "src/a.py" in tree
+        assert "a.py" not in tree
+        tree.append("a.py")
+        assert "a.py" in tree
+
+    def test_by_directory(self):
+        tree = _tree("src/a.py", "b.py", "src/c.py")
+        assert tree.by_directory() == {"src": ["a.py", "c.py"], "": ["b.py"]}
+
+    def test_total_size(self):
+        tree = filetree.CompactTree()
+        tree.append("a.py", size=10)
+        tree.append("b.py", size=5)
+        assert tree.total_size() == 15
+        tree.append("c.py")
+        assert tree.total_size() is None
+
+    def test_extend_preserves_entries(self):
+        other = filetree.CompactTree()
+        other.append("b.py", "odd", 2)
+        other.append("src/a.py", SHA, 1)
+
+        merged = _tree("lib/c.py")
+        merged.extend(other)
+        assert list(merged) == ["lib/c.py", "b.py", "src/a.py"]
+        assert (merged.sha(1), merged.sha(2), merged.size(2)) == ("odd", SHA, 1)
+
+    def test_truncate(self):
+        tree = filetree.CompactTree()
+        tree.append("src/a.py", SHA, 1)
+        tree.append("b.py", "odd", 2)
+        tree.append("c.py", "odd", 3)
+        assert "c.py" in tree
+        tree.truncate(2)
+        assert list(tree) == ["src/a.py", "b.py"]
+        assert (tree.sha(1), tree.size(1)) == ("odd", 2)
+        assert "c.py" not in tree
+        tree.append("d.py")
+        assert tree.sha(2) is None
+
+    def test_shas_view(self):
+        tree = filetree.CompactTree()
+        tree.append("a.py", SHA)
+        tree.append("b.py")
+        shas = tree.shas()
+        assert shas.get("a.py") == SHA
+        assert shas.get("b.py") is None
+        assert shas.get("missing.py") is None
+        assert dict(shas) == {"a.py": SHA}
@@ -1,6 +1,11 @@
+import base64
+import json
+
+import httpx
 import pytest
+import respx
 
-from repo_summarizer import github
+from repo_summarizer import cache, github
 
 
 class TestParseGitHubUrl:
@@ -37,3 +42,348 @@ class TestParseGitHubUrl:
     def test_random_string(self):
         with pytest.raises(github.GitHubError):
             github.parse_github_url("not a url at all")
+
+
+class TestFetchFiles:
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_fetches_by_blob_sha_and_caches(self):
+        sha = "a" * 40
+        route = respx.get(f"https://api.github.com/repos/psf/requests/git/blobs/{sha}").mock(
+            return_value=httpx.Response(200, json={"content": base64.b64encode(b"MIT").decode(), "encoding": "base64"})
+        )
+        async with httpx.AsyncClient() as client:
+            first = await github.fetch_files(client, "psf", "requests", ["LICENSE"], blob_shas={"LICENSE": sha})
+            # Same blob in a fork is served from the cache
+            second = await github.fetch_files(client, "someone", "fork", ["LICENSE"], blob_shas={"LICENSE": sha})
+        assert first == {"LICENSE": "MIT"}
+        assert second == {"LICENSE": "MIT"}
+        assert route.call_count == 1
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_falls_back_to_contents_without_sha(self):
+        respx.get("https://api.github.com/repos/psf/requests/contents/setup.py").mock(
+            return_value=httpx.Response(200, json={"content": base64.b64encode(b"setup()").decode(), "encoding": "base64"})
+        )
+        async with httpx.AsyncClient() as client:
+            result = await github.fetch_files(client, "psf", "requests", ["setup.py"])
+        assert result == {"setup.py": "setup()"}
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_skips_failed_files(self):
+        respx.get("https://api.github.com/repos/psf/requests/contents/missing.py").mock(
+            return_value=httpx.Response(404, json={"message": "Not Found"})
+        )
+        async with httpx.AsyncClient() as client:
+            result = await github.fetch_files(client, "psf", "requests", ["missing.py"])
+        assert result == {}
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_accepts_async_iterable(self):
+        for name in ("a.py", "b.py"):
+            respx.get(f"https://api.github.com/repos/psf/requests/contents/{name}").mock(
+                return_value=httpx.Response(200, json={"content": base64.b64encode(name.encode()).decode(), "encoding": "base64"})
+            )
+
+        async def paths():
+            yield "a.py"
+            yield "b.py"
+
+        async with httpx.AsyncClient() as client:
+            result = await github.fetch_files(client, "psf", "requests", paths())
+        assert result == {"a.py": "a.py", "b.py": "b.py"}
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_requests_raw_content(self):
+        sha = "b" * 40
+        route = respx.get(f"https://api.github.com/repos/psf/requests/git/blobs/{sha}").mock(
+            return_value=httpx.Response(200, content="héllo".encode(), headers={"Content-Type": "application/vnd.github.raw"})
+        )
+        async with httpx.AsyncClient() as client:
+            result = await github.fetch_files(
+                client, "psf", "requests", ["a.py"], blob_shas={"a.py": sha}, sizes={"a.py": 6}, max_bytes=100,
+            )
+        assert result == {"a.py": "héllo"}
+        assert route.calls.last.request.headers["Accept"] == "application/vnd.github.raw+json"
+        assert "Range" not in route.calls.last.request.headers
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_fetches_only_the_head_of_large_files(self):
+        sha = "c" * 40
+        route = respx.get(f"https://api.github.com/repos/psf/requests/git/blobs/{sha}").mock(
+            return_value=httpx.Response(206, content=b"x" * 9 + "é".encode(), headers={"Content-Range": "bytes 0-9/5000"})
+        )
+        async with httpx.AsyncClient() as client:
+            result = await github.fetch_files(
+                client, "psf", "requests", ["big.js"], blob_shas={"big.js": sha}, sizes={"big.js": 5000}, max_bytes=10,
+            )
+            # The cut content is cached, but never as the whole blob
+            again = await github.fetch_blob(client, "psf", "requests", sha, max_bytes=10, size=5000)
+        # The final byte is half of "é", so it's dropped rather than decoded as garbage
+        assert result == {"big.js": "x" * 9 + "\n... (truncated)"}
+        assert again == result["big.js"]
+        assert route.call_count == 1
+        assert route.calls.last.request.headers["Range"] == "bytes=0-9"
+        assert cache.get_blob_cache().get(sha) is None
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_cuts_off_full_body_when_range_is_ignored(self):
+        sha = "d" * 40
+        respx.get(f"https://api.github.com/repos/psf/requests/git/blobs/{sha}").mock(
+            return_value=httpx.Response(200, content=b"y" * 1000)
+        )
+        async with httpx.AsyncClient() as client:
+            content = await github.fetch_blob(client, "psf", "requests", sha, max_bytes=10)
+        assert content == "y" * 10 + "\n... (truncated)"
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_unknown_size_that_fits_is_not_truncated(self):
+        sha = "e" * 40
+        respx.get(f"https://api.github.com/repos/psf/requests/git/blobs/{sha}").mock(
+            return_value=httpx.Response(206, content=b"small", headers={"Content-Range": "bytes 0-4/5"})
+        )
+        async with httpx.AsyncClient() as client:
+            content = await github.fetch_blob(client, "psf", "requests", sha, max_bytes=10)
+        assert content == "small"
+        assert cache.get_blob_cache().get(sha) == "small"
+
+
+class TestTreeParser:
+    BODY = json.dumps({
+        "sha": "abc",
+        "url": "https://api.github.com/repos/o/r/git/trees/abc",
+        "tree": [
+            {"path": "README.md", "mode": "100644", "type": "blob", "sha": "s1", "size": 12, "url": "u1"},
+            {"path": "src/\u00e9t\u00e9.py", "mode": "100644", "type": "blob", "sha": "s2", "size": 3, "url": "u2"},
+            {"path": "src", "mode": "040000", "type": "tree", "sha": "s3", "url": "u3"},
+        ],
+        "truncated": False,
+    }, ensure_ascii=False, indent=1).encode()
+
+    def test_byte_at_a_time_matches_full_parse(self):
+        parser = github.TreeParser()
+        entries = []
+        for i in range(len(self.BODY)):
+            entries.extend(parser.feed(self.BODY[i:i + 1]))
+        parser.close()
+        expected = json.loads(self.BODY)
+        assert parser.sha == "abc"
+        assert parser.truncated is False
+        assert entries == [
+            {k: e[k] for k in ("path", "type", "sha", "size") if k in e} for e in expected["tree"]
+        ]
+
+    def test_incomplete_body_raises(self):
+        parser = github.TreeParser()
+        parser.feed(self.BODY[:-10])
+        with pytest.raises(ValueError):
+            parser.close()
+
+
+class TestFetchRepoTree:
+    # sha -> (recursive listing, or None when GitHub truncates it; one-level listing)
+    TREES = {
+        "root": (None, [("README.md", "blob"), ("src", "tree"), ("lib", "tree")]),
+        "src": ([("main.py", "blob"), ("pkg", "tree"), ("pkg/a.py", "blob")], None),
+        "lib": (None, [("x.py", "blob"), ("deep", "tree")]),
+        "deep": ([("y.py", "blob")], None),
+    }
+
+    def _mock_trees(self):
+        def _respond(request: httpx.Request) -> httpx.Response:
+            sha = request.url.path.rsplit("/", 1)[1].replace("main", "root")
+            recursive_listing, shallow_listing = self.TREES[sha]
+            truncated = request.url.params.get("recursive") == "1" and recursive_listing is None
+            if truncated:
+                listing = shallow_listing[:1]
+            else:
+                listing = recursive_listing if request.url.params.get("recursive") == "1" else shallow_listing
+            tree = [{"path": p, "type": t, "sha": p if t == "tree" else "b0"} for p, t in listing]
+            return httpx.Response(200, json={"sha": sha, "tree": tree, "truncated": truncated})
+
+        return respx.get(url__regex=r"https://api\.github\.com/repos/o/r/git/trees/.*").mock(side_effect=_respond)
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_expands_truncated_tree(self):
+        route = self._mock_trees()
+        async with httpx.AsyncClient() as client:
+            tree = await github.fetch_repo_tree(client, "o", "r", "main")
+        assert tree.sha == "root"
+        assert sorted(tree.files) == [
+            "README.md", "lib/deep/y.py", "lib/x.py", "src/main.py", "src/pkg/a.py",
+        ]
+        # main, root, src and deep recursively, lib recursively then one level deep
+        assert route.call_count == 6
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_known_root_sha_is_not_expanded(self):
+        route = self._mock_trees()
+        async with httpx.AsyncClient() as client:
+            tree = await github.fetch_repo_tree(client, "o", "r", "main", known_sha="root")
+        assert tree.sha == "root"
+        assert route.call_count == 1
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_filters_and_prunes_while_streaming(self):
+        route = self._mock_trees()
+        async with httpx.AsyncClient() as client:
+            tree = await github.fetch_repo_tree(client, "o", "r", "main", keep=lambda e: e["path"] != "lib")
+        paths = set(tree.files)
+        assert "lib/x.py" not in paths
+        assert "src/main.py" in paths
+        # main, root and src — lib was never expanded
+        assert route.call_count == 3
+        assert tree.total == 6
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_revalidates_streamed_tree(self):
+        body = {"sha": "abc", "tree": [{"path": "a.py", "type": "blob", "sha": "s1"}], "truncated": False}
+
+        def _respond(request: httpx.Request) -> httpx.Response:
+            if request.headers.get("If-None-Match") == '"t1"':
+                return httpx.Response(304)
+            return httpx.Response(200, json=body, headers={"ETag": '"t1"'})
+
+        respx.get("https://api.github.com/repos/o/r/git/trees/main").mock(side_effect=_respond)
+        async with httpx.AsyncClient() as client:
+            first = await github.fetch_repo_tree(client, "o", "r", "main")
+            second = await github.fetch_repo_tree(client, "o", "r", "main")
+        assert first.sha == second.sha == "abc"
+        assert list(first.files) == list(second.files) == ["a.py"]
+        assert second.total == 1
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_revalidates_large_filtered_tree(self):
+        # Well over 4MB of JSON: the parsed listing is stored, not the body
+        tree = [{"path": f"src/m{i}.py", "mode": "100644", "type": "blob", "sha": f"{i:040x}", "size": i}
+                for i in range(50_000)]
+        tree.append({"path": "docs/x.md", "type": "blob", "sha": "f" * 40})
+        body = json.dumps({"sha": "abc", "tree": tree, "truncated": False})
+        assert len(body) > 4 * 1024 * 1024
+
+        def _respond(request: httpx.Request) -> httpx.Response:
+            if request.headers.get("If-None-Match") == '"t1"':
+                return httpx.Response(304)
+            return httpx.Response(200, text=body, headers={"ETag": '"t1"'})
+
+        route = respx.get("https://api.github.com/repos/o/r/git/trees/main").mock(side_effect=_respond)
+        def keep(entry: dict) -> bool:
+            return not entry["path"].startswith("docs/")
+
+        async with httpx.AsyncClient() as client:
+            first = await github.fetch_repo_tree(client, "o", "r", "main", keep=keep, keep_key="no-docs")
+            first.files.truncate(10)
+            second = await github.fetch_repo_tree(client, "o", "r", "main", keep=keep, keep_key="no-docs")
+        assert route.calls[1].request.headers["If-None-Match"] == '"t1"'
+        assert second.sha == "abc"
+        assert second.total == 50_001
+        assert len(second.files) == 50_000
+        assert second.files.shas()["src/m7.py"] == f"{7:040x}"
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_listing_is_stored_per_filter(self):
+        body = {"sha": "abc", "tree": [{"path": "a.py", "type": "blob", "sha": "s1"}], "truncated": False}
+        route = respx.get("https://api.github.com/repos/o/r/git/trees/main").mock(
+            return_value=httpx.Response(200, json=body, headers={"ETag": '"t1"'})
+        )
+        async with httpx.AsyncClient() as client:
+            await github.fetch_repo_tree(client, "o", "r", "main", keep=lambda e: True, keep_key="all")
+            await github.fetch_repo_tree(client, "o", "r", "main", keep=lambda e: False, keep_key="none")
+            await github.fetch_repo_tree(client, "o", "r", "main", keep=lambda e: False)
+            await github.fetch_repo_tree(client, "o", "r", "main", keep=lambda e: False)
+        assert not any("If-None-Match" in call.request.headers for call in route.calls)
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_stops_at_max_depth(self):
+        self._mock_trees()
+        async with httpx.AsyncClient() as client:
+            tree = await github.fetch_repo_tree(client, "o", "r", "main", max_depth=2)
+        paths = set(tree.files)
+        assert "lib/x.py" in paths
+        assert "lib/deep/y.py" not in paths
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_stops_at_max_entries(self):
+        route = self._mock_trees()
+        async with httpx.AsyncClient() as client:
+            tree = await github.fetch_repo_tree(client, "o", "r", "main", max_entries=1)
+        assert list(tree.files) == ["README.md"]
+        assert route.call_count == 2
+
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_max_entries_holds_within_a_level(self):
+        subtrees = [(f"pkg{i}", "tree") for i in range(20)]
+
+        def _respond(request: httpx.Request) -> httpx.Response:
+            sha = request.url.path.rsplit("/", 1)[1]
+            if sha == "main":
+                return httpx.Response(200, json={"sha": "root", "tree": [], "truncated": True})
+            listing = subtrees if sha == "root" else [(f"f{j}.py", "blob") for j in range(1000)]
+            tree = [{"path": p, "type": t, "sha": p if t == "tree" else "b0"} for p, t in listing]
+            return httpx.Response(200, json={"sha": sha, "tree": tree, "truncated": False})
+
+        route = respx.get(url__regex=r"https://api\.github\.com/repos/o/r/git/trees/.*").mock(side_effect=_respond)
+        async with httpx.AsyncClient() as client:
+            tree = await github.fetch_repo_tree(client, "o", "r", "main", max_entries=2000, concurrency=3)
+        assert len(tree.files) == 2000
+        # main and root, then at most the subtrees already in flight when the budget ran out
+        assert route.call_count <= 2 + 3
+
+
+class TestConditionalRequests:
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_reuses_body_on_304(self):
+        def _respond(request: httpx.Request) -> httpx.Response:
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, json={"default_branch": "main"}, headers={"ETag": '"v1"'})
+
+        route = respx.get("https://api.github.com/repos/psf/requests").mock(side_effect=_respond)
+        async with httpx.AsyncClient() as client:
+            first = await github.fetch_default_branch(client, "psf", "requests")
+            second = await github.fetch_default_branch(client, "psf", "requests")
+        assert first == second == "main"
+        assert route.call_count == 2
+        assert route.calls[1].request.headers["If-None-Match"] == '"v1"'
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_sends_if_modified_since(self):
+        route = respx.get("https://api.github.com/repos/psf/requests").mock(
+            return_value=httpx.Response(
+                200, json={"default_branch": "main"}, headers={"Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+            )
+        )
+        async with httpx.AsyncClient() as client:
+            await github.fetch_default_branch(client, "psf", "requests")
+            await github.fetch_default_branch(client, "psf", "requests")
+        assert route.calls[1].request.headers["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+
+    @pytest.mark.asyncio
+    @respx.mock
+    async def test_token_is_part_of_key(self):
+        route = respx.get("https://api.github.com/repos/psf/requests").mock(
+            return_value=httpx.Response(200, json={"default_branch": "main"}, headers={"ETag": '"v1"'})
+        )
+        async with httpx.AsyncClient() as client:
+            await github.fetch_default_branch(client, "psf", "requests", token="a")
+            await github.fetch_default_branch(client, "psf", "requests", token="b")
+        assert "If-None-Match" not in route.calls[1].request.headers
@@ -1,12 +1,13 @@
 import base64
 import json
+import time
 
 import httpx
 import pytest
 import respx
 from fastapi.testclient import TestClient
 
-from repo_summarizer import api
+from repo_summarizer import api, config
 
 
 @pytest.fixture
@@ -14,6 +15,13 @@ def client():
     return TestClient(api.app, raise_server_exceptions=False)
 
 
+@pytest.fixture
+def llm_selection(monkeypatch):
+    """Send even the tiny mocked repo through LLM file selection."""
+    monkeypatch.setattr(config.get_config().context, "single_pass_max_bytes", 0)
+    monkeypatch.setattr(config.get_config().ranking, "heuristic_max_entries", 0)
+
+
 FILE_SELECTION_RESPONSE = json.dumps({"files": ["setup.py"]})
 
 LLM_RESPONSE = json.dumps(
@@ -25,7 +33,7 @@ LLM_RESPONSE = json.dumps(
 )
 
 
-def _mock_github_api(owner: str = "psf", repo: str = "requests"):
+def _mock_github_api(owner: str = "psf", repo: str = "requests", tree_sha: str | None = None):
     """Set up respx mocks for GitHub API calls."""
     respx.get(f"https://api.github.com/repos/{owner}/{repo}").mock(
         return_value=httpx.Response(200, json={"default_branch": "main"})
@@ -37,6 +45,7 @@ def _mock_github_api(owner: str = "psf", repo: str = "requests"):
         return_value=httpx.Response(
             200,
             json={
+                "sha": tree_sha,
                 "tree": [
                     {"path": "README.md", "type": "blob", "size": 100},
                     {"path": "setup.py", "type": "blob", "size": 200},
@@ -49,35 +58,62 @@ def _mock_github_api(owner: str = "psf", repo: str = "requests"):
     respx.get(f"https://api.github.com/repos/{owner}/{repo}/contents/README.md").mock(
         return_value=httpx.Response(200, json={"content": readme_content, "encoding": "base64"})
     )
-    respx.get(f"https://api.github.com/repos/{owner}/{repo}/contents/setup.py").mock(
+    respx.get(f"https://api.github.com/repos/{owner}/{repo}/contents/setup.py", name="setup_py").mock(
         return_value=httpx.Response(200, json={"content": setup_content, "encoding": "base64"})
     )
 
 
-def _mock_llm_calls():
-    """Mock both LLM calls: file selection and summary."""
-    respx.post("https://api.studio.nebius.com/v1/chat/completions").mock(
-        side_effect=[
-            httpx.Response(
-                200,
-                json={
-                    "choices": [{"message": {"content": FILE_SELECTION_RESPONSE}, "index": 0}],
-                    "model": "moonshotai/Kimi-K2.5",
-                },
-            ),
-            httpx.Response(
-                200,
-                json={
-                    "choices": [{"message": {"content": LLM_RESPONSE}, "index": 0}],
-                    "model": "moonshotai/Kimi-K2.5",
-                },
-            ),
-        ]
+def _chat_completion(content: str, stream: bool = False) -> httpx.Response:
+    """A chat completion response, as SSE chunks when the request asked to stream."""
+    if not stream:
+        return httpx.Response(
+            200,
+            json={
+                "choices": [{"message": {"content": content}, "index": 0}],
+                "model": "moonshotai/Kimi-K2.5",
+            },
+        )
+    chunks = [content[i:i + 20] for i in range(0, len(content), 20)]
+    body = "".join(
+        "data: " + json.dumps(
+            {
+                "id": "chunk",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": "moonshotai/Kimi-K2.5",
+                "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}],
+            }
+        ) + "\n\n"
+        for chunk in chunks
     )
+    return httpx.Response(200, text=body + "data: [DONE]\n\n", headers={"Content-Type": "text/event-stream"})
+
+
+def _mock_llm_calls(selection_status: int = 200):
+    """Mock both LLM calls, told apart by model: file selection and summary."""
+    selection_model = config.get_config().llm.file_selection_model
+
+    def _respond(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if body["model"] != selection_model:
+            return _chat_completion(LLM_RESPONSE, body.get("stream", False))
+        if selection_status != 200:
+            return httpx.Response(selection_status, json={"error": "Internal Server Error"})
+        return _chat_completion(FILE_SELECTION_RESPONSE, body.get("stream", False))
+
+    return respx.post("https://api.studio.nebius.com/v1/chat/completions").mock(side_effect=_respond)
+
+
+def _parse_sse(text: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
 
 
 @respx.mock
-def test_successful_summarize(client, monkeypatch):
+def test_successful_summarize(client, monkeypatch, llm_selection):
     monkeypatch.setenv("NEBIUS_API_KEY", "test-key")
     _mock_github_api()
     _mock_llm_calls()
@@ -89,6 +125,168 @@ def test_successful_summarize(client, monkeypatch):
     assert "technologies" in data
     assert "structure" in data
     assert isinstance(data["technologies"], list)
+    # setup.py is prefetched during file selection and reused, not fetched twice
+    assert respx.routes["setup_py"].call_count == 1
+
+
+@respx.mock
+def test_lifespan_shares_one_client(monkeypatch):
+    monkeypatch.setenv("NEBIUS_API_KEY", "test-key")
+    _mock_github_api()
+    _mock_llm_calls()
+
+    with TestClient(api.app) as client:
+        shared = api.app.state.http_client
+        resp = client.post("/summarize", json={"github_url": "https://github.com/psf/requests"})
+        assert resp.status_code == 200
+        assert not shared.is_closed
+    assert shared.is_closed
+
+
+@respx.mock
+def test_summary_cache_hit(client, monkeypatch):
+    monkeypatch.setenv("NEBIUS_API_KEY", "test-key")
+    _mock_github_api(tree_sha="abc123")
+    route = _mock_llm_calls()
+
+    first = client.post("/summarize", json={"github_url": "https://github.com/psf/requests"})
+    second = client.post("/summarize", json={"github_url": "https://github.com/psf/requests"})
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    # The second request is served from the cache without another LLM call
+    assert route.call_count == 1
+
+
+@respx.mock
+def test_summary_cache_invalidated_by_new_tree_sha(client, monkeypatch):
+    monkeypatch.setenv("NEBIUS_API_KEY", "test-key")
+    _mock_github_api(tree_sha="abc123")
+    _mock_llm_calls()
+    assert client.post("/summarize", json={"github_url": "https://github.com/psf/requests"}).status_code == 200
+
+    respx.reset()
+    _mock_github_api(tree_sha="def456")
+    respx.post("https://api.studio.nebius.com/v1/chat/completions").mock(
+        return_value=httpx.Response(500, json={"error": "Internal Server Error"})
+    )
+    resp = client.post("/summarize", json={"github_url": "https://github.com/psf/requests"})
+    assert resp.status_code == 502
+
+
+@respx.mock
+def test_streaming_summarize(client, monkeypatch, llm_selection):
+    monkeypatch.setenv("NEBIUS_API_KEY", "test-key")
+    _mock_github_api()
+    _mock_llm_calls()
+
+    resp = client.post("/summarize/stream", json={"github_url": "https://github.com/psf/requests"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+
+    events = _parse_sse(resp.text)
+    names = [name for name, _ in events]
+    assert names[:3] == ["tree_fetched", "files_selected", "files_fetched"]
+    assert names[-1] == "result"
+    assert events[1][1]["paths"] == ["setup.py"]
+    tokens = "".join(data["text"] for name, data in events if name == "token")
+    assert json.loads(tokens) == json.loads(LLM_RESPONSE)
+    assert events[-1][1]["summary"] == "A popular HTTP library for Python."
+
+
+@respx.mock
+def test_streaming_reports_errors_as_events(client, monkeypatch):
+    monkeypatch.setenv("NEBIUS_API_KEY", "test-key")
+    respx.get("https://api.github.com/repos/nonexist/nonexist").mock(
+        return_value=httpx.Response(404, json={"message": "Not Found"})
+    )
+
+    resp = client.post("/summarize/stream", json={"github_url": "https://github.com/nonexist/nonexist"})
+    assert resp.status_code == 200
+    events = _parse_sse(resp.text)
+    assert events == [("error", {"status": "error", "status_code": 404, "message": events[0][1]["message"]})]
+
+
+def test_streaming_invalid_url(client):
+    resp = client.post("/summarize/stream", json={"github_url": "https://gitlab.com/user/repo"})
+    assert resp.status_code == 400
+    assert resp.json()["status"] == "error"
+
+
+@respx.mock
+def test_batch_summarize(client, monkeypatch):
+    monkeypatch.setenv("NEBIUS_API_KEY", "test-key")
+    _mock_github_api()
+    _mock_llm_calls()
+
+    resp = client.post(
+        "/summarize/batch",
+        json={"github_urls": ["https://github.com/psf/requests", "https://gitlab.com/user/repo"]},
+    )
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = {line["github_url"]: line for line in map(json.loads, resp.text.strip().split("\n"))}
+    assert lines["https://github.com/psf/requests"]["status"] == "ok"
+    assert lines["https://github.com/psf/requests"]["result"]["summary"] == "A popular HTTP library for Python."
+    assert lines["https://gitlab.com/user/repo"] == {
+        "github_url": "https://gitlab.com/user/repo",
+        "status": "error",
+        "status_code": 400,
+        "message": "Not a GitHub URL",
+    }
+
+
+def test_batch_requires_urls(client):
+    resp = client.post("/summarize/batch", json={"github_urls": []})
+    assert resp.status_code == 422
+
+
+def _wait_for_job(client: TestClient, job_id: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+@respx.mock
+def test_job_lifecycle(monkeypatch):
+    monkeypatch.setenv("NEBIUS_API_KEY", "test-key")
+    _mock_github_api()
+    _mock_llm_calls()
+
+    with TestClient(api.app) as client:
+        resp = client.post("/jobs", json={"github_url": "https://github.com/psf/requests"})
+        assert resp.status_code == 202
+        assert resp.json()["status"] in ("queued", "running")
+
+        job = _wait_for_job(client, resp.json()["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["result"]["summary"] == "A popular HTTP library for Python."
+    assert set(job["stage_timings"]) == {"tree", "selection", "fetch", "summary"}
+
+
+@respx.mock
+def test_job_failure_is_reported(monkeypatch):
+    monkeypatch.setenv("NEBIUS_API_KEY", "test-key")
+    respx.get("https://api.github.com/repos/nonexist/nonexist").mock(
+        return_value=httpx.Response(404, json={"message": "Not Found"})
+    )
+
+    with TestClient(api.app) as client:
+        job_id = client.post("/jobs", json={"github_url": "https://github.com/nonexist/nonexist"}).json()["job_id"]
+        job = _wait_for_job(client, job_id)
+    assert job["status"] == "failed"
+    assert job["error_status_code"] == 404
+
+
+def test_unknown_job():
+    with TestClient(api.app) as client:
+        resp = client.get("/jobs/does-not-exist")
+    assert resp.status_code == 404
+    assert resp.json()["status"] == "error"
 
 
 def test_invalid_url(client):
@@ -118,12 +316,76 @@ def test_repo_not_found(client, monkeypatch):
     assert resp.status_code == 404
 
 
+@respx.mock
+def test_tiny_repo_runs_single_pass(client, monkeypatch):
+    monkeypatch.setenv("NEBIUS_API_KEY", "test-key")
+    _mock_github_api()
+    route = _mock_llm_calls()
+
+    resp = client.post("/summarize", json={"github_url": "https://github.com/psf/requests"})
+    assert resp.status_code == 200
+    # One summary call, with every file already in its context
+    assert route.call_count == 1
+    prompt = json.loads(route.calls[0].request.content)["messages"][-1]["content"]
+    assert 'setup(name="requests")' in prompt
+    assert "HTTP for Humans." in prompt
+
+
+@respx.mock
+def test_small_repo_skips_selection_llm(client, monkeypatch):
+    monkeypatch.setenv("NEBIUS_API_KEY", "test-key")
+    monkeypatch.setattr(config.get_config().context, "single_pass_max_bytes", 0)
+    _mock_github_api()
+    route = _mock_llm_calls()
+
+    resp = client.post("/summarize", json={"github_url": "https://github.com/psf/requests"})
+    assert resp.status_code == 200
+    # Only the summary call — the heuristic picked the files
+    assert route.call_count == 1
+    assert respx.routes["setup_py"].call_count == 1
+
+
+@respx.mock
+def test_selection_failure_falls_back_to_heuristic(client, monkeypatch, llm_selection):
+    monkeypatch.setenv("NEBIUS_API_KEY", "test-key")
+    _mock_github_api()
+    _mock_llm_calls(selection_status=500)
+
+    resp = client.post("/summarize", json={"github_url": "https://github.com/psf/requests"})
+    assert resp.status_code == 200
+    assert resp.json()["summary"] == "A popular HTTP library for Python."
+    assert respx.routes["setup_py"].call_count == 1
+
+
+@respx.mock
+def test_hallucinated_selection_falls_back_to_summary_model(client, monkeypatch, llm_selection):
+    monkeypatch.setenv("NEBIUS_API_KEY", "test-key")
+    _mock_github_api()
+    llm_cfg = config.get_config().llm
+    selection_models = []
+
+    def _respond(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if "select the files" not in body["messages"][0]["content"]:
+            return _chat_completion(LLM_RESPONSE, body.get("stream", False))
+        selection_models.append(body["model"])
+        # The selection model invents paths; the summary model names a real one
+        files = ["src/nope.py", "lib/missing.py"] if body["model"] == llm_cfg.file_selection_model else ["setup.py"]
+        return _chat_completion(json.dumps({"files": files}), body.get("stream", False))
+
+    respx.post("https://api.studio.nebius.com/v1/chat/completions").mock(side_effect=_respond)
+
+    resp = client.post("/summarize", json={"github_url": "https://github.com/psf/requests"})
+    assert resp.status_code == 200
+    assert selection_models == [llm_cfg.file_selection_model, llm_cfg.model_name]
+
+
 @respx.mock
 def test_llm_error(client, monkeypatch):
     monkeypatch.setenv("NEBIUS_API_KEY", "test-key")
     _mock_github_api()
 
-    # File selection LLM call fails
+    # Summary LLM call fails
     respx.post("https://api.studio.nebius.com/v1/chat/completions").mock(
         return_value=httpx.Response(500, json={"error": "Internal Server Error"})
     )
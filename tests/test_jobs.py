@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from repo_summarizer import config, core, github, jobs, models
+
+
+def _manager(**overrides) -> jobs.JobManager:
+    return jobs.JobManager(config.JobsConfig(**overrides))
+
+
+class TestJobManager:
+    @pytest.mark.asyncio
+    async def test_rejects_when_queue_full(self):
+        manager = _manager(job_workers=0, job_queue_size=1)
+        await manager.start()
+        try:
+            manager.submit("https://github.com/psf/requests")
+            with pytest.raises(jobs.JobError) as exc_info:
+                manager.submit("https://github.com/psf/requests")
+            assert exc_info.value.status_code == 503
+        finally:
+            await manager.stop()
+
+    @pytest.mark.asyncio
+    async def test_rejects_invalid_url(self):
+        manager = _manager(job_workers=0)
+        await manager.start()
+        try:
+            with pytest.raises(github.GitHubError):
+                manager.submit("https://gitlab.com/user/repo")
+        finally:
+            await manager.stop()
+
+    @pytest.mark.asyncio
+    async def test_queued_job_is_pollable(self):
+        manager = _manager(job_workers=0)
+        await manager.start()
+        try:
+            job = manager.submit("https://github.com/psf/requests")
+            assert manager.get(job.job_id).status == "queued"
+        finally:
+            await manager.stop()
+
+    def test_unknown_job(self):
+        with pytest.raises(jobs.JobError) as exc_info:
+            _manager().get("missing")
+        assert exc_info.value.status_code == 404
+
+    def test_submit_before_start(self):
+        with pytest.raises(jobs.JobError) as exc_info:
+            _manager().submit("https://github.com/psf/requests")
+        assert exc_info.value.status_code == 503
+
+    @pytest.mark.asyncio
+    async def test_jobs_for_one_repo_share_a_run(self, monkeypatch):
+        runs = []
+        release = asyncio.Event()
+
+        async def _pipeline(client, owner, repo, on_event):
+            runs.append(repo)
+            on_event("tree_fetched", {"entries": 2, "filtered": 2})
+            await release.wait()
+            on_event("files_selected", {"paths": []})
+            on_event("files_fetched", {"count": 0})
+            return models.SummaryResponse(summary="A library.", technologies=["Python"], structure="Flat.")
+
+        monkeypatch.setattr(core, "_run_pipeline", _pipeline)
+        manager = _manager(job_workers=2)
+        await manager.start()
+        try:
+            first = manager.submit("https://github.com/psf/requests")
+            second = manager.submit("https://github.com/PSF/requests")
+            while second.status != "running":
+                await asyncio.sleep(0.01)
+            release.set()
+            while manager.get(first.job_id).status == "running" or manager.get(second.job_id).status == "running":
+                await asyncio.sleep(0.01)
+        finally:
+            await manager.stop()
+
+        assert runs == ["requests"]
+        for job in (first, second):
+            assert job.status == "succeeded"
+            assert job.result.summary == "A library."
+            # The second job joined after the tree was fetched, and still sees every stage
+            assert set(job.stage_timings) == {"tree", "selection", "fetch", "summary"}
@@ -0,0 +1,47 @@
+import json
+
+from repo_summarizer import config, llm, router
+
+
+def _feed_in_chunks(text: str, size: int) -> list[str]:
+    parser = llm.FilesArrayParser()
+    found = []
+    for i in range(0, len(text), size):
+        found += parser.feed(text[i:i + size])
+    return found
+
+
+class TestFilesArrayParser:
+    def test_yields_paths_as_they_close(self):
+        parser = llm.FilesArrayParser()
+        assert parser.feed('{"files": ["src/ma') == []
+        assert parser.feed('in.py", "setup') == ["src/main.py"]
+        assert parser.feed('.py"]}') == ["setup.py"]
+
+    def test_any_chunking_gives_same_result(self):
+        doc = json.dumps({"files": ["a.py", "b/c.ts", "d e.md"]})
+        for size in (1, 2, 5, len(doc)):
+            assert _feed_in_chunks(doc, size) == ["a.py", "b/c.ts", "d e.md"]
+
+    def test_decodes_escapes(self):
+        doc = json.dumps({"files": ['we"ird.py', "café.py"]}, ensure_ascii=True)
+        assert _feed_in_chunks(doc, 3) == ['we"ird.py', "café.py"]
+
+    def test_ignores_other_keys_and_nested_values(self):
+        doc = json.dumps({
+            "reason": "files: [x]",
+            "other": ["not-a-file.py"],
+            "files": ["keep.py", {"path": "nested.py"}, ["deeper.py"], "also.py"],
+        })
+        assert _feed_in_chunks(doc, 4) == ["keep.py", "also.py"]
+
+    def test_no_files_key(self):
+        assert _feed_in_chunks('{"paths": ["a.py"]}', 3) == []
+
+
+class TestHedgePolicy:
+    def test_selection_hedges_well_before_fallback(self):
+        fallback = config.get_config().ranking.selection_fallback_timeout
+        for call in (router.SELECTION, router.SELECTION_FALLBACK):
+            assert llm._get_hedge_policy(call).delay() <= fallback / 2
+        assert llm._get_hedge_policy(router.SUMMARY).delay() == config.get_config().hedge.hedge_initial_delay
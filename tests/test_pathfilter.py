@@ -0,0 +1,124 @@
+import pytest
+
+from repo_summarizer import config, pathfilter
+
+PATHS = [
+    "README.md",
+    "src/main.py",
+    "src/app.min.js",
+    "src/styles.MIN.CSS",
+    "node_modules/lodash/index.js",
+    "packages/web/node_modules/react/index.js",
+    "lib/node_modules.py",
+    "assets/Logo.PNG",
+    ".png",
+    "docs/trailing.",
+    "Cargo.lock",
+    "crates/core/Cargo.lock",
+    "build",
+    "docs/api/index.md",
+    "docs/guide.md",
+    "tools/docs/notes.md",
+    "generated/proto/a_pb2.py",
+    "src/generated/b.py",
+    "logs/2024/run.log",
+    "a.log",
+]
+
+
+def _rules(*patterns: str) -> pathfilter.PathFilter:
+    return pathfilter.PathFilter(config.SKIP_DIRS, config.SKIP_EXTENSIONS, config.SKIP_FILENAMES,
+                                 [*config.SKIP_PATTERNS, *patterns])
+
+
+def _kept(rules: pathfilter.PathFilter, paths: list[str]) -> list[str]:
+    return [p for p in paths if rules.keep(p)]
+
+
+class TestPathFilter:
+    def test_builtin_rules(self):
+        assert _kept(_rules(), PATHS) == [
+            "README.md",
+            "src/main.py",
+            "src/styles.MIN.CSS",
+            "lib/node_modules.py",
+            ".png",
+            "docs/trailing.",
+            "build",
+            "docs/api/index.md",
+            "docs/guide.md",
+            "tools/docs/notes.md",
+            "generated/proto/a_pb2.py",
+            "src/generated/b.py",
+            "logs/2024/run.log",
+            "a.log",
+        ]
+
+    def test_extensions_ignore_case_but_patterns_dont(self):
+        rules = _rules()
+        assert not rules.keep("assets/Logo.PNG")
+        assert rules.keep("src/styles.MIN.CSS")
+        assert not rules.keep("src/styles.min.css")
+
+    def test_unanchored_pattern_matches_at_any_depth(self):
+        rules = _rules("*.log")
+        assert not rules.keep("a.log")
+        assert not rules.keep("logs/2024/run.log")
+        assert rules.keep("src/main.py")
+
+    def test_unanchored_pattern_matches_directories(self):
+        rules = _rules("generated")
+        assert not rules.keep("generated/proto/a_pb2.py")
+        assert not rules.keep("src/generated/b.py")
+        assert not rules.keep_dir("src/generated")
+
+    def test_anchored_pattern(self):
+        rules = _rules("/docs/*.md")
+        assert not rules.keep("docs/guide.md")
+        assert rules.keep("docs/api/index.md")
+        assert rules.keep("tools/docs/notes.md")
+        assert rules.keep_dir("docs")
+
+    def test_double_star(self):
+        rules = _rules("docs/**/*.md")
+        assert not rules.keep("docs/guide.md")
+        assert not rules.keep("docs/api/index.md")
+        assert rules.keep("tools/docs/notes.md")
+        assert not _rules("**/proto").keep("generated/proto/a_pb2.py")
+        assert not _rules("logs/**").keep("logs/2024/run.log")
+
+    def test_directory_only_pattern(self):
+        rules = _rules("build/")
+        assert rules.keep("build")
+        assert not rules.keep("x/build/out.txt")
+        assert not rules.keep_dir("x/build")
+
+    def test_question_mark_and_classes(self):
+        rules = _rules("?.log", "[!a-m]*.md")
+        assert not rules.keep("a.log")
+        assert rules.keep("ab.log")
+        assert rules.keep("docs/guide.md")
+        assert not rules.keep("README.md")
+        assert rules.keep("docs/api/index.md")
+
+    def test_rejects_negated_patterns(self):
+        with pytest.raises(ValueError, match="Negated"):
+            _rules("!keep.log")
+
+    def test_split_checks_match_keep(self):
+        rules = _rules("*.log", "/docs/*.md", "generated/", "tools/**")
+        assert rules.has_anchored
+        split = [
+            p for p in PATHS
+            if rules.keep_dir(p.rpartition("/")[0]) and rules.keep_name(p.rpartition("/")[2]) and rules.keep_anchored(p)
+        ]
+        assert split == _kept(rules, PATHS)
+        assert not _rules("build/").has_anchored
+
+    def test_keep_dir(self):
+        rules = _rules()
+        assert rules.keep_dir("")
+        assert rules.keep_dir("src")
+        assert not rules.keep_dir("node_modules")
+        assert not rules.keep_dir("packages/web/node_modules/react")
+        assert rules.keep_dir("lib/node_modules.d")
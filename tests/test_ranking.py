@@ -0,0 +1,69 @@
+import random
+
+from repo_summarizer import filetree, ranking
+
+
+class TestScorePath:
+    def test_manifest_beats_entry_point(self):
+        assert ranking.score_path("pyproject.toml") > ranking.score_path("main.py")
+
+    def test_txt_manifests_are_not_docs(self):
+        assert ranking.score_path("requirements.txt") == ranking.score_path("pyproject.toml")
+        assert ranking.score_path("CMakeLists.txt") > ranking.score_path("NOTES.txt")
+
+    def test_deeper_scores_lower(self):
+        assert ranking.score_path("package.json") > ranking.score_path("packages/web/package.json")
+
+    def test_tests_and_docs_score_lower(self):
+        assert ranking.score_path("src/utils.py") > ranking.score_path("tests/test_utils.py")
+        assert ranking.score_path("src/utils.py") > ranking.score_path("src/NOTES.md")
+
+    def test_crowded_directory_scores_lower(self):
+        assert ranking.score_path("src/utils.py") > ranking.score_path("src/utils.py", siblings=64)
+
+    def test_size_outside_useful_band_scores_lower(self):
+        assert ranking.score_path("main.py", size=2_000) > ranking.score_path("main.py", size=10)
+        assert ranking.score_path("main.py", size=2_000) > ranking.score_path("main.py", size=5_000_000)
+
+
+class TestRankFiles:
+    def test_orders_by_score(self, large_tree):
+        ranked = ranking.rank_files(large_tree, limit=10)
+        assert ranked[:2] == ["Dockerfile", "package.json"]
+        assert "src/index.ts" in ranked
+        assert "src/components/Header.tsx" not in ranked
+
+    def test_txt_manifest_ranks_as_manifest(self):
+        tree = filetree.CompactTree()
+        for path in ("NOTES.txt", "app.py", "requirements.txt"):
+            tree.append(path)
+        assert ranking.rank_files(tree, limit=3) == ["requirements.txt", "app.py", "NOTES.txt"]
+
+    def test_respects_limit(self, large_tree):
+        assert len(ranking.rank_files(large_tree, limit=1)) == 1
+
+    def test_zero_limit(self, small_tree):
+        assert ranking.rank_files(small_tree, limit=0) == []
+
+    def test_matches_exhaustive_scoring(self):
+        rng = random.Random(0)
+        dirs = ["", "src/", "src/core/", "tests/", "docs/", "pkg/a/b/", "cmd/tool/"]
+        names = ["main.go", "index.ts", "util.py", "README.md", "package.json", "Cargo.toml", "x.rs"]
+        paths = {rng.choice(dirs) + rng.choice(names) for _ in range(500)}
+        paths |= {f"src/gen/f{i}.py" for i in range(50)}
+        entries = [{"path": p, "type": "blob", "size": rng.randint(0, 200_000)} for p in sorted(paths)]
+
+        siblings = {}
+        for e in entries:
+            d = e["path"].rpartition("/")[0]
+            siblings[d] = siblings.get(d, 0) + 1
+        expected = sorted(
+            entries,
+            key=lambda e: (
+                -ranking.score_path(e["path"], e["size"], siblings[e["path"].rpartition("/")[0]]),
+                e["path"].count("/"),
+                e["path"],
+            ),
+        )
+        tree = filetree.CompactTree.from_entries(entries)
+        assert ranking.rank_files(tree, limit=20) == [e["path"] for e in expected[:20]]
@@ -0,0 +1,250 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+import respx
+
+from repo_summarizer import config, llm, router
+
+A = router.Route("a", "http://llm-a.test/v1", "key", "model-a")
+B = router.Route("b", "http://llm-b.test/v1", "key", "model-b")
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _router(clock: _Clock | None = None) -> router.Router:
+    return router.Router({router.SUMMARY: [A, B]}, failure_threshold=2, reset_seconds=10.0, clock=clock or _Clock())
+
+
+class TestRouter:
+    def test_untimed_routes_first_in_configured_order(self):
+        routes = _router()
+        assert routes.candidates(router.SUMMARY) == [A, B]
+        routes.success(A, 2.0)
+        assert routes.candidates(router.SUMMARY) == [B, A]
+
+    def test_prefers_faster_route(self):
+        routes = _router()
+        routes.success(A, 5.0)
+        routes.success(B, 1.0)
+        assert routes.candidates(router.SUMMARY) == [B, A]
+
+    def test_errors_weigh_against_a_route(self):
+        routes = _router()
+        routes.success(A, 1.0)
+        routes.success(B, 2.0)
+        routes.failure(A)
+        assert routes.stats(A).error_rate == 0.5
+        assert routes.candidates(router.SUMMARY) == [B, A]
+
+    def test_circuit_opens_then_half_opens(self):
+        clock = _Clock()
+        routes = _router(clock)
+        routes.failure(A)
+        assert A in routes.candidates(router.SUMMARY)
+        routes.failure(A)
+        assert routes.candidates(router.SUMMARY) == [B]
+
+        clock.now = 10.0
+        assert A in routes.candidates(router.SUMMARY)
+        routes.begin(A)
+        # Only one trial call while half open
+        assert A not in routes.candidates(router.SUMMARY)
+        routes.failure(A)
+        assert A not in routes.candidates(router.SUMMARY)
+
+        clock.now = 20.0
+        routes.begin(A)
+        routes.success(A, 1.0)
+        assert A in routes.candidates(router.SUMMARY)
+
+    def test_falls_back_to_longest_open_circuit(self):
+        clock = _Clock()
+        routes = _router(clock)
+        for route in (A, A):
+            routes.failure(route)
+        clock.now = 1.0
+        for route in (B, B):
+            routes.failure(route)
+        assert routes.candidates(router.SUMMARY) == [A]
+
+    def test_single_route_is_never_left_out(self):
+        routes = router.Router({router.SUMMARY: [A]}, failure_threshold=1, reset_seconds=10.0, clock=_Clock())
+        routes.failure(A)
+        assert routes.stats(A).opened_at is not None
+        assert routes.candidates(router.SUMMARY) == [A]
+
+    def test_abandoned_trial_frees_the_route(self):
+        clock = _Clock()
+        routes = _router(clock)
+        routes.failure(A)
+        routes.failure(A)
+        clock.now = 10.0
+        routes.begin(A)
+        routes.abandon(A)
+        assert A in routes.candidates(router.SUMMARY)
+
+    def test_unreported_trial_lapses(self):
+        clock = _Clock()
+        routes = _router(clock)
+        routes.failure(A)
+        routes.failure(A)
+        clock.now = 10.0
+        assert routes.begin(A)
+        assert not routes.begin(A)
+        clock.now = 20.0
+        assert A in routes.candidates(router.SUMMARY)
+
+    def test_routes_from_config(self):
+        cfg = config.LLMConfig(nebius_api_key="nebius-key")
+        routes = router.routes_from_config(cfg)
+        assert [r.model for r in routes[router.SELECTION]] == [cfg.file_selection_model]
+        assert routes[router.SELECTION_FALLBACK] == routes[router.SUMMARY]
+
+        cfg.llm_backends = [
+            config.LLMBackend(name="a", base_url=A.base_url, summary_models=["m1", "m2"]),
+            config.LLMBackend(name="b", base_url=B.base_url, api_key="b-key", selection_models=["s"]),
+        ]
+        routes = router.routes_from_config(cfg)
+        assert [(r.backend, r.model, r.api_key) for r in routes[router.SUMMARY]] == [
+            ("a", "m1", "nebius-key"), ("a", "m2", "nebius-key"),
+        ]
+        assert [(r.backend, r.model, r.api_key) for r in routes[router.SELECTION]] == [("b", "s", "b-key")]
+
+
+SUMMARY = {"summary": "A library.", "technologies": ["Python"], "structure": "Flat."}
+
+
+def _stream(content: str) -> httpx.Response:
+    chunk = {
+        "id": "chunk", "object": "chat.completion.chunk", "created": 0, "model": "m",
+        "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+    }
+    body = f"data: {json.dumps(chunk)}\n\ndata: [DONE]\n\n"
+    return httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+
+
+class TestRoutedSummary:
+    @pytest.fixture
+    def two_backends(self, monkeypatch):
+        cfg = config.get_config().llm
+        monkeypatch.setattr(cfg, "llm_backends", [
+            config.LLMBackend(name="a", base_url=A.base_url, summary_models=[A.model]),
+            config.LLMBackend(name="b", base_url=B.base_url, summary_models=[B.model]),
+        ])
+        monkeypatch.setattr(cfg, "circuit_failure_threshold", 1)
+        monkeypatch.setattr(config.get_config().hedge, "hedge_requests", False)
+        router.get_router.cache_clear()
+        llm._get_hedge_policy.cache_clear()
+        yield
+        router.get_router.cache_clear()
+
+    @respx.mock
+    @pytest.mark.asyncio
+    async def test_fails_over_and_opens_circuit(self, two_backends):
+        down = respx.post(f"{A.base_url}/chat/completions").mock(return_value=httpx.Response(503))
+        up = respx.post(f"{B.base_url}/chat/completions").mock(side_effect=lambda _: _stream(json.dumps(SUMMARY)))
+
+        result = await llm.generate_summary("context")
+        assert result.summary == "A library."
+        assert down.call_count == 1
+        assert up.call_count == 1
+
+        # A's circuit is open, so the next call goes straight to B
+        await llm.generate_summary("context")
+        assert down.call_count == 1
+        assert up.call_count == 2
+        assert json.loads(up.calls.last.request.content)["model"] == B.model
+
+    @respx.mock
+    @pytest.mark.asyncio
+    async def test_single_backend_is_retried_with_its_circuit_open(self, monkeypatch):
+        cfg = config.get_config().llm
+        monkeypatch.setattr(cfg, "llm_backends", [
+            config.LLMBackend(name="a", base_url=A.base_url, summary_models=[A.model]),
+        ])
+        monkeypatch.setattr(cfg, "circuit_failure_threshold", 1)
+        monkeypatch.setattr(config.get_config().hedge, "hedge_requests", False)
+        router.get_router.cache_clear()
+        llm._get_hedge_policy.cache_clear()
+        responses = iter([httpx.Response(503), _stream(json.dumps(SUMMARY))])
+        route = respx.post(f"{A.base_url}/chat/completions").mock(side_effect=lambda _: next(responses))
+
+        # The first attempt opens the only circuit; the retry still goes to the backend
+        result = await llm.generate_summary("context")
+        assert result.summary == "A library."
+        assert route.call_count == 2
+        assert router.get_router().stats(router.get_router().routes[router.SUMMARY][0]).opened_at is None
+
+    def test_opener_claims_the_trial(self, two_backends, monkeypatch):
+        routes = router.get_router()
+        route_a, route_b = routes.routes[router.SUMMARY]
+        routes.success(route_a, 0.1)
+        routes.success(route_b, 1.0)
+        routes.failure(route_a)
+        stats = routes.stats(route_a)
+        stats.opened_at -= stats.reset_seconds
+        monkeypatch.setattr(llm, "_iter_deltas", lambda route, **kwargs: route)
+
+        # Both calls see the half-open route as a candidate before either stream is read,
+        # but only the first gets its trial
+        first, second = llm._opener(router.SUMMARY), llm._opener(router.SUMMARY)
+        assert first() == route_a
+        assert second() == route_b
+
+    @staticmethod
+    def _hanging(requests: list):
+        async def hang(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            await asyncio.sleep(30)
+            return httpx.Response(503)
+
+        return hang
+
+    @respx.mock
+    @pytest.mark.asyncio
+    async def test_hung_backend_opens_circuit(self, two_backends, monkeypatch):
+        monkeypatch.setattr(llm, "SUMMARY_TIMEOUT", 0.2)
+        routes = router.get_router()
+        route_a, route_b = routes.routes[router.SUMMARY]
+        routes.success(route_a, 1.0)
+        routes.success(route_b, 2.0)
+        hung = []
+        respx.post(f"{A.base_url}/chat/completions").mock(side_effect=self._hanging(hung))
+        up = respx.post(f"{B.base_url}/chat/completions").mock(side_effect=lambda _: _stream(json.dumps(SUMMARY)))
+
+        result = await llm.generate_summary("context")
+        assert result.summary == "A library."
+        assert len(hung) == 1
+        assert up.call_count == 1
+        stats = routes.stats(route_a)
+        assert stats.consecutive_failures == 1
+        assert stats.latency > 1.0 * 0.7
+        assert routes.candidates(router.SUMMARY) == [route_b]
+
+    @respx.mock
+    @pytest.mark.asyncio
+    async def test_hedge_loser_without_first_token_is_recorded(self, two_backends, monkeypatch):
+        monkeypatch.setattr(config.get_config().hedge, "hedge_requests", True)
+        monkeypatch.setattr(config.get_config().hedge, "hedge_initial_delay", 0.1)
+        monkeypatch.setattr(config.get_config().llm, "circuit_failure_threshold", 3)
+        router.get_router.cache_clear()
+        llm._get_hedge_policy.cache_clear()
+        routes = router.get_router()
+        route_a, route_b = routes.routes[router.SUMMARY]
+        routes.success(route_a, 0.05)
+        routes.success(route_b, 0.5)
+        respx.post(f"{A.base_url}/chat/completions").mock(side_effect=self._hanging([]))
+        respx.post(f"{B.base_url}/chat/completions").mock(side_effect=lambda _: _stream(json.dumps(SUMMARY)))
+
+        await llm.generate_summary("context")
+        stats = routes.stats(route_a)
+        assert stats.error_rate == 0.5
+        assert stats.latency > 0.05
@@ -0,0 +1,169 @@
+from repo_summarizer import context, skeleton
+
+PYTHON = '''"""Service entry point."""
+import os
+from app import (
+    routes,
+)
+
+TIMEOUT = 30
+
+
+@app.get("/items")
+async def list_items(limit: int = 10) -> list[str]:
+    """List items."""
+    items = load()
+    return items[:limit]
+
+
+class Store(Base):
+    """Item storage."""
+    name: str = "items"
+
+    def load(self):
+        with open(self.name) as f:
+            return f.read()
+
+    def size(self): return 0
+'''
+
+TYPESCRIPT = '''import { serve } from "./server";
+
+export interface Options {
+  port: number;
+}
+
+export class App {
+  private name = "}";
+
+  start(opts: Options) {
+    const banner = `{
+      ${this.name}`;
+    serve(opts.port);
+  }
+}
+
+export function main()
+{
+  new App().start({ port: 80 });
+}
+'''
+
+RUST = """use std::fmt;
+
+pub struct Config<'a> {
+    pub name: &'a str,
+}
+
+impl<'a> Config<'a> {
+    pub fn new(name: &'a str) -> Self {
+        let brace = '{';
+        Config { name }
+    }
+}
+"""
+
+
+class TestSkeletonize:
+    def test_python_keeps_declarations_and_docstrings(self):
+        assert skeleton.skeletonize("app/main.py", PYTHON) == '''"""Service entry point."""
+import os
+from app import (
+    routes,
+)
+TIMEOUT = 30
+
+@app.get("/items")
+async def list_items(limit: int = 10) -> list[str]:
+    """List items."""
+    ...
+
+class Store(Base):
+    """Item storage."""
+    name: str = "items"
+    def load(self):
+        ...
+    def size(self): return 0'''
+
+    def test_unparsable_python_keeps_declaration_lines(self):
+        truncated = PYTHON[:PYTHON.index("with open")] + "\n... (truncated)"
+        result = skeleton.skeletonize("main.py", truncated)
+        assert "async def list_items(limit: int = 10) -> list[str]:" in result
+        assert "class Store(Base):" in result
+        assert "items = load()" not in result
+
+    def test_deeply_nested_python_keeps_declaration_lines(self):
+        # Overflows the parser's stack (MemoryError) rather than raising SyntaxError
+        source = "import os\n" + ("x = " + "(" * 199 + "1" + ")" * 199) * 2
+        assert skeleton.skeletonize("deep.py", source) == "import os"
+
+    def test_typescript_keeps_members_and_drops_bodies(self):
+        assert skeleton.skeletonize("src/app.ts", TYPESCRIPT) == '''import { serve } from "./server";
+
+export interface Options {
+  port: number;
+}
+
+export class App {
+  private name = "}";
+
+  start(opts: Options) {
+    ...
+  }
+}
+
+export function main()
+{
+  ...
+}
+'''
+
+    def test_rust_lifetimes_and_char_literals(self):
+        assert skeleton.skeletonize("src/lib.rs", RUST) == """use std::fmt;
+
+pub struct Config<'a> {
+    pub name: &'a str,
+}
+
+impl<'a> Config<'a> {
+    pub fn new(name: &'a str) -> Self {
+        ...
+    }
+}
+"""
+
+    def test_javascript_regex_literals_hide_braces(self):
+        source = (
+            'const open = /[{]/g;\n'
+            'const close = s.replace(/\\}/, "");\n'
+            "export function f(a, b) {\n"
+            "  const ratio = a / b / 2;\n"
+            "  return /{/.test(ratio);\n"
+            "}\n"
+            "export const g = 1;\n"
+        )
+        assert skeleton.skeletonize("src/re.js", source) == (
+            'const open = /[{]/g;\n'
+            'const close = s.replace(/\\}/, "");\n'
+            "export function f(a, b) {\n"
+            "  ...\n"
+            "}\n"
+            "export const g = 1;\n"
+        )
+
+    def test_unclosed_block_leaves_file_unchanged(self):
+        truncated = TYPESCRIPT[:TYPESCRIPT.index("serve(opts.port)")] + "\n... (truncated)"
+        assert skeleton.skeletonize("src/app.ts", truncated) == truncated
+
+    def test_unsupported_or_disabled_types_unchanged(self):
+        assert skeleton.skeletonize("notes.md", PYTHON) == PYTHON
+        assert skeleton.skeletonize("main.py", PYTHON, extensions=["ts"]) == PYTHON
+
+    def test_build_context_outlines_long_source_files(self):
+        ctx = context.build_context(
+            {"main.py": PYTHON, "pyproject.toml": "[project]\n" + "x = 1\n" * 100},
+            budget=100_000, max_file_size=10_000, skeleton_min_chars=100,
+        )
+        assert "--- main.py (outline) ---" in ctx
+        assert "items = load()" not in ctx
+        assert "--- pyproject.toml ---" in ctx
@@ -0,0 +1,47 @@
+from repo_summarizer import config, tokens
+
+
+class _WordTokenizer(tokens.Tokenizer):
+    def count(self, text: str) -> int:
+        return len(text.split())
+
+
+class TestApproximate:
+    def test_counts_words_numbers_and_punctuation(self):
+        count = tokens.APPROXIMATE.count
+        assert count("the quick brown fox") == 4
+        assert count("getUserById(42)") == 7
+        assert count("1234567") == 3
+        assert count("这是中文") == 4
+
+    def test_dense_text_costs_more_per_char(self):
+        prose = "A service that summarizes repositories for readers. " * 20
+        minified = '{"a":[1,2,3],"b":{"c":null}}' * 20
+        count = tokens.APPROXIMATE.count
+        assert len(minified) / count(minified) < len(prose) / count(prose)
+
+    def test_truncate_returns_prefix_within_budget(self):
+        text = "alpha beta gamma delta epsilon"
+        cut = tokens.APPROXIMATE.truncate(text, 3)
+        assert text.startswith(cut)
+        assert tokens.APPROXIMATE.count(cut) == 3
+        assert tokens.APPROXIMATE.truncate(text, 100) == text
+
+
+class TestGetTokenizer:
+    def test_approximate_without_tokenizer_dir(self):
+        tokens.get_tokenizer.cache_clear()
+        assert tokens.get_tokenizer(config.get_config().llm.model_name) is tokens.APPROXIMATE
+
+    def test_missing_tokenizer_file_falls_back(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config.get_config().context, "tokenizer_dir", str(tmp_path))
+        tokens.get_tokenizer.cache_clear()
+        assert tokens.get_tokenizer("org/model") is tokens.APPROXIMATE
+        tokens.get_tokenizer.cache_clear()
+
+    def test_registered_tokenizer_wins(self, monkeypatch):
+        monkeypatch.setattr(tokens, "_registered", {})
+        words = _WordTokenizer()
+        tokens.register_tokenizer("org/model", words)
+        assert tokens.get_tokenizer("org/model") is words
+        tokens.get_tokenizer.cache_clear()